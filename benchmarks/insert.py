@@ -0,0 +1,58 @@
+"""
+Microbenchmark of inserting keys into BTrees.
+
+Run it with ``python benchmarks/insert.py`` against a build of the C
+extensions.  It times ``tree[key] = value`` into one large tree, with
+sequential and random keys, and into many small trees, each of whose
+nodes looks up its class's node sizes afresh.
+"""
+import random
+import sys
+import timeit
+
+from BTrees import LLBTree
+from BTrees import OOBTree
+
+
+def bench(label, func, n, repeat=5):
+    t = min(timeit.repeat(func, number=1, repeat=repeat))
+    print('%-28s %6.1f ns per insert' % (label, t / n * 1e9))
+
+
+def fill(tree_type, keys):
+    def run():
+        tree = tree_type()
+        for key in keys:
+            tree[key] = key
+    return run
+
+
+def fill_many(tree_type, keys, count):
+    def run():
+        for _ in range(count):
+            tree = tree_type()
+            for key in keys:
+                tree[key] = key
+    return run
+
+
+def main(argv):
+    rnd = random.Random(42)
+    print('%s %s' % (LLBTree.LLBTree.__module__, sys.version.split()[0]))
+    sequential = list(range(200000))
+    shuffled = sequential[:]
+    rnd.shuffle(shuffled)
+    for module in LLBTree, OOBTree:
+        name = module.BTree.__name__
+        bench('%s/sequential' % name, fill(module.BTree, sequential),
+              len(sequential))
+        bench('%s/random' % name, fill(module.BTree, shuffled),
+              len(shuffled))
+        bench('%s/small trees' % name,
+              fill_many(module.BTree, shuffled[:300], 1000), 300 * 1000)
+        bench('%s/tiny trees' % name,
+              fill_many(module.BTree, shuffled[:10], 30000), 10 * 30000)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
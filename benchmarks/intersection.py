@@ -0,0 +1,50 @@
+"""
+Microbenchmark of intersecting and subtracting sets of skewed sizes.
+
+Run it with ``python benchmarks/intersection.py`` against a build of the
+C extensions.  It times ``intersection`` and ``difference`` of a small
+Set with a large TreeSet, as a selective catalog query does, and of two
+Sets of the same size, for the C and the pure-Python implementations.
+"""
+import random
+import sys
+import timeit
+
+from BTrees import IIBTree
+
+
+def bench(label, func, repeat=5):
+    number = 1
+    while True:
+        t = min(timeit.repeat(func, number=number, repeat=repeat)) / number
+        if t * number > 0.05 or number >= 10000:
+            break
+        number *= 10
+    print('%-44s %12.1f us' % (label, t * 1e6))
+
+
+def main(argv):
+    large_size = int(argv[0]) if argv else 1000000
+    rnd = random.Random(42)
+    print('%s %s' % (IIBTree.IIBTree.__module__, sys.version.split()[0]))
+    universe = range(large_size * 4)
+    large_keys = rnd.sample(universe, large_size)
+    for suffix in '', 'Py':
+        ns = vars(IIBTree)
+        intersection = ns['intersection' + suffix]
+        difference = ns['difference' + suffix]
+        large = ns['IITreeSet' + suffix](large_keys)
+        for small_size in 10, 1000, large_size // 10:
+            small = ns['IISet' + suffix](rnd.sample(universe, small_size))
+            name = 'IISet%s(%d)' % (suffix, small_size)
+            bench('intersection(%s, large)' % name,
+                  lambda: intersection(small, large))
+            bench('difference(%s, large)' % name,
+                  lambda: difference(small, large))
+        other = ns['IITreeSet' + suffix](rnd.sample(universe, large_size))
+        bench('intersection(large%s, large%s)' % (suffix, suffix),
+              lambda: intersection(large, other))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
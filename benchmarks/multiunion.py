@@ -0,0 +1,54 @@
+"""
+Microbenchmark of ``multiunion``.
+
+Run it with ``python benchmarks/multiunion.py`` against a build of the C
+extensions.  It times the C ``multiunion`` and the pure-Python
+``multiunionPy`` on the same inputs: many small sets, a few large
+TreeSets, and lists of integers.
+"""
+import random
+import sys
+import timeit
+
+from BTrees import LLBTree
+
+
+def bench(label, func, repeat=5):
+    t = min(timeit.repeat(func, number=1, repeat=repeat))
+    print('%-36s %8.2f ms' % (label, t * 1e3))
+    return t
+
+
+def workloads(rnd):
+    universe = 1000000
+    yield 'small sets', lambda mod: [
+        mod(rnd.sample(range(universe), 20)) for _ in range(10000)]
+    yield 'large treesets', lambda mod: [
+        mod(rnd.sample(range(universe), 100000)) for _ in range(5)]
+    yield 'lists', lambda mod: [
+        rnd.sample(range(universe), 1000) for _ in range(200)]
+
+
+def main(argv):
+    rnd = random.Random(42)
+    print('%s %s' % (LLBTree.LLBTree.__module__, sys.version.split()[0]))
+    c_set, py_set = LLBTree.LLSet, LLBTree.LLSetPy
+    c_tree_set, py_tree_set = LLBTree.LLTreeSet, LLBTree.LLTreeSetPy
+    for name, make in workloads(rnd):
+        state = rnd.getstate()
+        if name == 'large treesets':
+            c_inputs = make(c_tree_set)
+            rnd.setstate(state)
+            py_inputs = make(py_tree_set)
+        else:
+            c_inputs = make(c_set)
+            rnd.setstate(state)
+            py_inputs = make(py_set)
+        c = bench('C/%s' % name, lambda: LLBTree.multiunion(c_inputs))
+        py = bench('Python/%s' % name,
+                   lambda: LLBTree.multiunionPy(py_inputs))
+        print('%-36s %8.1fx' % ('Python/C', py / c))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
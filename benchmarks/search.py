@@ -0,0 +1,63 @@
+"""
+Microbenchmark of key lookups in integer-keyed BTrees and buckets.
+
+Run it with ``python benchmarks/search.py`` against a build of the C
+extensions.  It times ``get`` and ``in`` for keys laid out densely (like
+sequential document ids), uniformly at random (like hashes), and
+clustered (which defeats interpolation), in full-size buckets and in
+large trees, and in buckets of increasing size, which shows where small
+buckets stop being scanned linearly.
+"""
+import random
+import sys
+import timeit
+
+from BTrees import IIBTree
+from BTrees import LLBTree
+
+
+def key_layouts(n, rnd):
+    return {
+        'dense': [i * 3 for i in range(n)],
+        'uniform': sorted(rnd.sample(range(2 ** 40), n)),
+        'clustered': sorted({int(rnd.paretovariate(0.5)) * 1000 + i % 1000
+                             for i in range(n)}),
+    }
+
+
+def bench(label, container, probes, repeat=5):
+    get = container.get
+    contains = container.__contains__
+    n = len(probes)
+    t_get = min(timeit.repeat(lambda: [get(k) for k in probes],
+                              number=1, repeat=repeat))
+    t_in = min(timeit.repeat(lambda: [contains(k) for k in probes],
+                             number=1, repeat=repeat))
+    print('%-28s get %6.1f ns   in %6.1f ns' % (
+        label, t_get / n * 1e9, t_in / n * 1e9))
+
+
+def main(argv):
+    rnd = random.Random(42)
+    bucket_size = LLBTree.LLBTree.max_leaf_size
+    print('%s %s' % (LLBTree.LLBTree.__module__, sys.version.split()[0]))
+    for name, keys in key_layouts(bucket_size, rnd).items():
+        keys = keys[:bucket_size]
+        bucket = LLBTree.LLBucket(dict(zip(keys, keys)))
+        probes = [rnd.choice(keys) + rnd.randrange(2) for _ in range(100000)]
+        bench('bucket/%s' % name, bucket, probes)
+    for name, keys in key_layouts(1000000, rnd).items():
+        tree = LLBTree.LLBTree.fromSorted(list(zip(keys, keys)))
+        probes = [rnd.choice(keys) + rnd.randrange(2) for _ in range(200000)]
+        bench('tree/%s' % name, tree, probes)
+    for module in IIBTree, LLBTree:
+        for size in (8, 16, 32, 48, 64, 96, 128, 129, 160, 250):
+            keys = [k % 2 ** 31 for k in key_layouts(size, rnd)['uniform']]
+            bucket = module.Bucket(dict(zip(keys, keys)))
+            probes = [rnd.choice(keys) + rnd.randrange(2)
+                      for _ in range(100000)]
+            bench('%s/%d' % (module.Bucket.__name__, size), bucket, probes)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,40 @@
+"""
+Microbenchmark of lazy set operation results.
+
+Run it with ``python benchmarks/setop_view.py`` against a build of the C
+extensions.  It compares building the full result of ``union`` and
+``intersection`` with counting it, taking its first keys, and
+materializing a prefix of it through ``out='view'``.
+"""
+import itertools
+import sys
+import timeit
+
+from BTrees import LLBTree
+
+
+def bench(label, func, repeat=5):
+    t = min(timeit.repeat(func, number=1, repeat=repeat))
+    print('%-40s %8.2f ms' % (label, t * 1e3))
+
+
+def main(argv):
+    size = int(argv[0]) if argv else 1000000
+    print('%s %s' % (LLBTree.LLBTree.__module__, sys.version.split()[0]))
+    a = LLBTree.LLTreeSet(range(0, size * 2, 2))
+    b = LLBTree.LLTreeSet(range(0, size * 3, 3))
+    for name in 'union', 'intersection':
+        op = getattr(LLBTree, name)
+        bench('%s()' % name, lambda: op(a, b))
+        bench('len(%s())' % name, lambda: len(op(a, b)))
+        bench('len(%s(out=view))' % name,
+              lambda: len(op(a, b, out='view')))
+        bench('%s()[:10]' % name, lambda: list(op(a, b))[:10])
+        bench('islice(%s(out=view), 10)' % name,
+              lambda: list(itertools.islice(op(a, b, out='view'), 10)))
+        bench('%s(out=view).materialize(10)' % name,
+              lambda: op(a, b, out='view').materialize(10))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
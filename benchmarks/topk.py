@@ -0,0 +1,39 @@
+"""
+Microbenchmark of finding the items with the largest values.
+
+Run it with ``python benchmarks/topk.py`` against a build of the C
+extensions.  It compares ``topk(k)`` and ``byValue(min, limit=k)`` with
+sorting all the items with ``byValue(min)`` and slicing the result.
+"""
+import random
+import sys
+import timeit
+
+from BTrees import IFBTree
+from BTrees import LLBTree
+
+
+def bench(label, func, repeat=5):
+    t = min(timeit.repeat(func, number=1, repeat=repeat))
+    print('%-32s %8.2f ms' % (label, t * 1e3))
+
+
+def main(argv):
+    size = int(argv[0]) if argv else 1000000
+    rnd = random.Random(42)
+    print('%s %s' % (LLBTree.LLBTree.__module__, sys.version.split()[0]))
+    for module in LLBTree, IFBTree:
+        name = module.BTree.__name__
+        tree = module.BTree()
+        for key in range(size):
+            tree[key] = rnd.randrange(size)
+        for k in 10, 1000:
+            bench('%s/byValue()[:%d]' % (name, k),
+                  lambda: tree.byValue(0)[:k])
+            bench('%s/byValue(limit=%d)' % (name, k),
+                  lambda: tree.byValue(0, limit=k))
+            bench('%s/topk(%d)' % (name, k), lambda: tree.topk(k))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
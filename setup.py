@@ -87,7 +87,11 @@ FLAVORS = {
     "I": "int",  # Signed 32-bit
     "L": "int",  # Signed 64-bit
     "U": "int",  # Unsigned 32-bit
-    "Q": "int"  # Unsigned 64-bit (from the printf "q" modifier for quad_t)
+    "Q": "int",  # Unsigned 64-bit (from the printf "q" modifier for quad_t)
+    "b": "bytes",  # 8 bytes
+    "g": "bytes",  # 16 bytes
+    "S": "str",
+    "D": "double",
 }
 # XXX should 'fs' be in ZODB instead?
 FAMILIES = (
@@ -117,6 +121,20 @@ FAMILIES = (
     "OU",  # 32-bit unsigned
     "OL",  # 64-bit signed
     "OQ",  # 64-bit unsigned
+    # Fixed-size bytes keys
+    "bO",  # 8 bytes, object value
+    "gO",  # 16 bytes, object value
+    # str keys
+    "SO",  # object value
+    "SI",  # 32-bit signed
+    # Double keys
+    "DO",  # object value
+    "DD",  # self value
+    "DI",  # 32-bit signed
+    "DL",  # 64-bit signed
+    # Double values
+    "ID",  # 32-bit signed key
+    "LD",  # 64-bit signed key
     "fs",
 )
 
@@ -40,6 +40,10 @@
  * Calling it with consecutive smaller positions is more efficient than if
  * a search finger weren't being used at all, but is still quadratic time
  * in the number of buckets in the slice.
+ *
+ * If the slice was taken from a counted BTree, tree holds a reference to it
+ * and is used to find the length and to seek to positions outside the
+ * current bucket by rank, in logarithmic time.  Otherwise tree is NULL.
  */
 typedef struct
 {
@@ -52,6 +56,7 @@ typedef struct
     int first;              /* Start offset in firstbucket    */
     int last;               /* End offset in lastbucket       */
     char kind;              /* 'k', 'v', 'i'                  */
+    BTree *tree;            /* Counted BTree, or NULL         */
 } BTreeItems;
 
 #define ITEMS(O)((BTreeItems*)(O))
@@ -61,15 +66,84 @@ newBTreeItems(char kind,
               Bucket *lowbucket, int lowoffset,
               Bucket *highbucket, int highoffset);
 
+/* forward declarations, from BTreeTemplate.c */
+static Py_ssize_t
+_BTree_rank(BTree *self, KEY_TYPE key, int or_equal);
+static int
+_BTree_select(BTree *self, Py_ssize_t index, Bucket **bucket, int *offset);
+static int
+BTree_findRangeEnd(BTree *self, PyObject *keyarg, int low, int exclude_equal,
+                   Bucket **bucket, int *offset);
+
 static void
 BTreeItems_dealloc(BTreeItems *self)
 {
     Py_XDECREF(self->firstbucket);
     Py_XDECREF(self->lastbucket);
     Py_XDECREF(self->currentbucket);
+    Py_XDECREF(self->tree);
     PyObject_DEL(self);
 }
 
+/* Find the ranks in self->tree of the first element of the slice and of
+ * the element just past its end.  Return 0 on success, 1 if the endpoints
+ * no longer exist because the buckets were mutated, and -1 on error.
+ */
+static int
+BTreeItems_treeBounds(BTreeItems *self, Py_ssize_t *start, Py_ssize_t *end)
+{
+    KEY_TYPE first;
+    KEY_TYPE last;
+    int status = 1;
+
+    assert(self->tree && self->firstbucket);
+    PER_USE_OR_RETURN(self->firstbucket, -1);
+    if (self->first < self->firstbucket->len)
+    {
+        COPY_KEY(first, self->firstbucket->keys[self->first]);
+        INCREF_KEY(first);
+        status = 0;
+    }
+    PER_UNUSE(self->firstbucket);
+    if (status)
+        return status;
+
+    status = 1;
+    if (! PER_USE(self->lastbucket))
+    {
+        DECREF_KEY(first);
+        return -1;
+    }
+    if (self->last < self->lastbucket->len)
+    {
+        COPY_KEY(last, self->lastbucket->keys[self->last]);
+        INCREF_KEY(last);
+        status = 0;
+    }
+    PER_UNUSE(self->lastbucket);
+    if (status)
+    {
+        DECREF_KEY(first);
+        return status;
+    }
+
+    if (! PER_USE(self->tree))
+        status = -1;
+    else
+    {
+        *start = _BTree_rank(self->tree, first, 0);
+        *end = *start < 0 ? -1 : _BTree_rank(self->tree, last, 1);
+        PER_UNUSE(self->tree);
+        if (*end < 0)
+            status = -1;
+        else if (*end < *start)
+            *end = *start;
+    }
+    DECREF_KEY(first);
+    DECREF_KEY(last);
+    return status;
+}
+
 static Py_ssize_t
 BTreeItems_length_or_nonzero(BTreeItems *self, int nonzero)
 {
@@ -80,6 +154,16 @@ BTreeItems_length_or_nonzero(BTreeItems *self, int nonzero)
     if (b == NULL)
         return 0;
 
+    if (self->tree && ! nonzero)
+    {
+        Py_ssize_t start, end;
+        int status = BTreeItems_treeBounds(self, &start, &end);
+        if (status < 0)
+            return -1;
+        if (status == 0)
+            return end - start;
+    }
+
     r = self->last + 1 - self->first;
 
     if (nonzero && r > 0)
@@ -147,6 +231,41 @@ BTreeItems_seek(BTreeItems *self, Py_ssize_t i)
         goto no_match;
 
     delta = i - pseudoindex;
+    if (self->tree && i >= 0)
+    {
+        /* Unless the target is in the current bucket, look it up by rank
+         * instead of walking the buckets.
+         */
+        Py_ssize_t start, end;
+        Bucket *found;
+        int offset, status;
+
+        PER_USE_OR_RETURN(currentbucket, -1);
+        status = (currentoffset + delta >= 0
+                  && currentoffset + delta < currentbucket->len);
+        PER_UNUSE(currentbucket);
+        if (! status)
+        {
+            status = BTreeItems_treeBounds(self, &start, &end);
+            if (status < 0)
+                return -1;
+            if (status == 0)
+            {
+                if (i >= end - start)
+                    goto no_match;
+                PER_USE_OR_RETURN(self->tree, -1);
+                status = _BTree_select(self->tree, start + i, &found, &offset);
+                PER_UNUSE(self->tree);
+                if (status < 0)
+                    return -1;
+                Py_DECREF(self->currentbucket);
+                self->currentbucket = found;
+                self->currentoffset = offset;
+                self->pseudoindex = i;
+                return 0;
+            }
+        }
+    }
     while (delta > 0) /* move right */
     {
         int max;
@@ -336,6 +455,7 @@ BTreeItems_slice(BTreeItems *self, Py_ssize_t ilow, Py_ssize_t ihigh)
     int lowoffset;
     int highoffset;
     Py_ssize_t length = -1;  /* len(self), but computed only if needed */
+    PyObject *result;
 
     /* Complications:
      * A Python slice never raises IndexError, but BTreeItems_seek does.
@@ -404,8 +524,14 @@ BTreeItems_slice(BTreeItems *self, Py_ssize_t ilow, Py_ssize_t ihigh)
         highbucket = self->currentbucket;
         highoffset = self->currentoffset;
     }
-    return newBTreeItems(self->kind,
-                         lowbucket, lowoffset, highbucket, highoffset);
+    result = newBTreeItems(self->kind,
+                           lowbucket, lowoffset, highbucket, highoffset);
+    if (result != NULL && ITEMS(result)->firstbucket && self->tree)
+    {
+        Py_INCREF(self->tree);
+        ITEMS(result)->tree = self->tree;
+    }
+    return result;
 }
 
 static PyObject *
@@ -546,6 +672,7 @@ newBTreeItems(char kind,
 
     self->currentoffset = lowoffset;
     self->pseudoindex = 0;
+    self->tree = NULL;
 
     return OBJECT(self);
 }
@@ -595,46 +722,6 @@ nextBTreeItems(SetIteration *i)
     return 0;
 }
 
-static int
-nextTreeSetItems(SetIteration *i)
-{
-    if (i->position >= 0)
-    {
-        if (i->position)
-        {
-            DECREF_KEY(i->key);
-        }
-
-        if (BTreeItems_seek(ITEMS(i->set), i->position) >= 0)
-        {
-            Bucket *currentbucket;
-
-            currentbucket = BUCKET(ITEMS(i->set)->currentbucket);
-            UNLESS(PER_USE(currentbucket))
-            {
-                /* Mark iteration terminated, so that finiSetIteration doesn't
-                * try to redundantly decref the key and value
-                */
-                i->position = -1;
-                return -1;
-            }
-
-            COPY_KEY(i->key, currentbucket->keys[ITEMS(i->set)->currentoffset]);
-            INCREF_KEY(i->key);
-
-            i->position ++;
-
-            PER_UNUSE(currentbucket);
-        }
-        else
-        {
-            i->position = -1;
-            PyErr_Clear();
-        }
-    }
-    return 0;
-}
-
 /* Support for the iteration protocol */
 
 static PyTypeObject BTreeIter_Type;
@@ -649,13 +736,20 @@ typedef struct
      *     2. We don't bother keeping pseudoindex in synch.
      */
     BTreeItems *pitems;
+    /* The BTree or TreeSet iterated, searched from the root by seek() to
+     * skip buckets, or NULL for a bucket or set.
+     */
+    BTree *tree;
 } BTreeIter;
 
+#define BTREEITER(O) ((BTreeIter *)(O))
+
 /* Return a new iterator object, to traverse the keys and/or values
- * represented by pitems.  pitems must not be NULL.  Returns NULL if error.
+ * represented by pitems, which are those of tree if it isn't NULL.
+ * pitems must not be NULL.  Returns NULL if error.
  */
 static BTreeIter *
-BTreeIter_new(BTreeItems *pitems)
+BTreeIter_new(BTreeItems *pitems, BTree *tree)
 {
     BTreeIter *result;
 
@@ -665,6 +759,8 @@ BTreeIter_new(BTreeItems *pitems)
     {
         Py_INCREF(pitems);
         result->pitems = pitems;
+        Py_XINCREF(tree);
+        result->tree = tree;
     }
     return result;
 }
@@ -674,6 +770,7 @@ static void
 BTreeIter_dealloc(BTreeIter *bi)
 {
     Py_DECREF(bi->pitems);
+    Py_XDECREF(bi->tree);
     PyObject_Del(bi);
 }
 
@@ -733,6 +830,272 @@ Done:
     return result;
 }
 
+/* Return the index of the first key of b at or after lo that is >= key,
+ * or b->len if there is none, setting *found to whether it's equal to
+ * key.  Galloping (doubling the step from lo before a binary search)
+ * makes a skip over d keys cost O(log d).  Return -1 on error.
+ */
+static int
+_bucket_gallop(Bucket *b, int lo, KEY_TYPE key, int *found)
+{
+    int step = 1, hi = lo, mid, cmp;
+
+    *found = 0;
+    while (hi < b->len)
+    {
+        TEST_KEY_SET_OR(cmp, b->keys[hi], key) return -1;
+        if (cmp >= 0)
+        {
+            *found = cmp == 0;
+            if (*found || hi == lo)
+                return hi;
+            break;
+        }
+        lo = hi + 1;
+        hi = (step < b->len - hi) ? hi + step : b->len;
+        if (step <= INT_MAX / 2)
+            step <<= 1;
+    }
+    /* The key at lo - 1 is < key, and the key at hi (if any) is > key. */
+    while (lo < hi)
+    {
+        mid = lo + (hi - lo) / 2;
+        TEST_KEY_SET_OR(cmp, b->keys[mid], key) return -1;
+        if (cmp < 0)
+            lo = mid + 1;
+        else
+        {
+            if (cmp == 0)
+                *found = 1;
+            hi = mid;
+        }
+    }
+    return lo;
+}
+
+/* Advance bi so that the next item it returns is the first one whose key
+ * is >= key, or so that it's exhausted if there is none.  It never moves
+ * back.  The search gallops through the current bucket, then tries the
+ * next bucket, and only then searches the tree from the root, with
+ * BTree_findRangeEnd.  So seeking past d keys costs O(log d), and the
+ * buckets skipped aren't visited.
+ * Return 1 if the next key is equal to key, 0 if not, or -1 on error.
+ */
+static int
+_BTreeIter_seek(BTreeIter *bi, KEY_TYPE key)
+{
+    BTreeItems *items = bi->pitems;
+    Bucket *b, *next;
+    PyObject *keyarg;
+    int cmp, found, offset, status;
+
+    if (items->currentbucket == NULL)
+        return 0;
+
+    /* If key is past the end of the range, the iteration is done. */
+    b = items->lastbucket;
+    PER_USE_OR_RETURN(b, -1);
+    cmp = -1;
+    if (items->last < b->len)
+        TEST_KEY_SET_OR(cmp, b->keys[items->last], key)
+        {
+            PER_UNUSE(b);
+            return -1;
+        }
+    PER_UNUSE(b);
+    if (cmp < 0)
+    {
+        Py_CLEAR(items->currentbucket);
+        return 0;
+    }
+
+    /* So the first key >= key is in the range, and we stop there. */
+    for (;;)
+    {
+        b = items->currentbucket;
+        PER_USE_OR_RETURN(b, -1);
+        if (items->currentoffset < b->len)
+        {
+            TEST_KEY_SET_OR(cmp, b->keys[b->len - 1], key)
+            {
+                PER_UNUSE(b);
+                return -1;
+            }
+            if (cmp >= 0)
+            {
+                offset = _bucket_gallop(b, items->currentoffset, key, &found);
+                PER_UNUSE(b);
+                if (offset < 0)
+                    return -1;
+                items->currentoffset = offset;
+                return found;
+            }
+        }
+        next = b->next;
+        Py_XINCREF(next);
+        PER_UNUSE(b);
+        if (next == NULL || b == items->lastbucket)
+        {
+            /* Only if the buckets changed under us. */
+            Py_XDECREF(next);
+            Py_CLEAR(items->currentbucket);
+            return 0;
+        }
+        offset = 0;
+
+        if (bi->tree != NULL)
+        {
+            /* If key is past the next bucket too, search from the root. */
+            UNLESS (PER_USE(next))
+            {
+                Py_DECREF(next);
+                return -1;
+            }
+            cmp = 0;
+            if (next->len)
+                TEST_KEY_SET_OR(cmp, next->keys[next->len - 1], key)
+                {
+                    PER_UNUSE(next);
+                    Py_DECREF(next);
+                    return -1;
+                }
+            PER_UNUSE(next);
+            if (cmp < 0)
+            {
+                Py_CLEAR(next);
+                COPY_KEY_TO_OBJECT(keyarg, key);
+                if (keyarg == NULL)
+                    return -1;
+                status = -1;
+                if (PER_USE(bi->tree))
+                {
+                    status = BTree_findRangeEnd(bi->tree, keyarg, 1, 0,
+                                                &next, &offset);
+                    PER_UNUSE(bi->tree);
+                }
+                Py_DECREF(keyarg);
+                if (status < 0)
+                    return -1;
+                if (status == 0)
+                {
+                    Py_CLEAR(items->currentbucket);
+                    return 0;
+                }
+            }
+        }
+        Py_DECREF(items->currentbucket);
+        items->currentbucket = next;
+        items->currentoffset = offset;
+    }
+}
+
+/* The implementation of the iterator's seek() method. */
+static PyObject *
+BTreeIter_seek(BTreeIter *bi, PyObject *keyarg)
+{
+    KEY_TYPE key;
+    int copied = 1;
+
+    COPY_KEY_FROM_ARG(key, keyarg, copied);
+    UNLESS (copied)
+        return NULL;
+    if (_BTreeIter_seek(bi, key) < 0)
+        return NULL;
+    Py_RETURN_NONE;
+}
+
+/* The SetIteration next() for a BTreeIter over a BTree or TreeSet.  Like
+ * BTreeIter_next, but the key, and the value if i->usesValue, are copied
+ * into i instead of building an object.
+ */
+static int
+nextBTreeIter(SetIteration *i)
+{
+    BTreeItems *items;
+    Bucket *bucket;
+    int offset;
+
+    if (i->position < 0)
+        return 0;
+
+    if (i->position)
+    {
+        DECREF_KEY(i->key);
+        if (i->usesValue)
+            DECREF_VALUE(i->value);
+    }
+
+    items = BTREEITER(i->set)->pitems;
+    bucket = items->currentbucket;
+    if (bucket == NULL)
+    {
+        i->position = -1;
+        return 0;
+    }
+    UNLESS (PER_USE(bucket))
+    {
+        /* Mark iteration terminated, so that finiSetIteration doesn't
+         * try to redundantly decref the key and value
+         */
+        i->position = -1;
+        return -1;
+    }
+    offset = items->currentoffset;
+    if (offset >= bucket->len)
+    {
+        PyErr_SetString(PyExc_RuntimeError,
+                        "the bucket being iterated changed size");
+        PER_UNUSE(bucket);
+        i->position = -1;
+        return -1;
+    }
+
+    COPY_KEY(i->key, bucket->keys[offset]);
+    INCREF_KEY(i->key);
+    if (i->usesValue)
+    {
+        COPY_VALUE(i->value, bucket->values[offset]);
+        INCREF_VALUE(i->value);
+    }
+    /* Only the sign matters, so don't count past INT_MAX. */
+    i->position = 1;
+
+    if (bucket == items->lastbucket && offset >= items->last)
+        items->currentbucket = NULL;
+    else if (++offset >= bucket->len)
+    {
+        Py_XINCREF(bucket->next);
+        items->currentbucket = bucket->next;
+        offset = 0;
+    }
+    items->currentoffset = offset;
+    PER_UNUSE(bucket);
+    if (items->currentbucket != bucket)
+        Py_DECREF(bucket);
+    return 0;
+}
+
+/* The SetIteration seek() for a BTreeIter:  make the current key the first
+ * one >= key, unless it already is.
+ */
+static int
+seekBTreeIter(SetIteration *i, KEY_TYPE key)
+{
+    int cmp;
+
+    if (i->position < 0)
+        return 0;
+    if (i->position > 0)
+    {
+        TEST_KEY_SET_OR(cmp, i->key, key) return -1;
+        if (cmp >= 0)
+            return 0;
+    }
+    if (_BTreeIter_seek(BTREEITER(i->set), key) < 0)
+        return -1;
+    return i->next(i);
+}
+
 static PyObject *
 BTreeIter_getiter(PyObject *it)
 {
@@ -740,6 +1103,15 @@ BTreeIter_getiter(PyObject *it)
     return it;
 }
 
+static struct PyMethodDef BTreeIter_methods[] = {
+    {"seek", (PyCFunction)BTreeIter_seek, METH_O,
+     "seek(key)\n\n"
+     "Skip ahead to the first key that is not less than key.\n"
+     "The iterator never moves back."},
+
+    {NULL, NULL}        /* sentinel */
+};
+
 static PyTypeObject BTreeIter_Type = {
     PyVarObject_HEAD_INIT(NULL, 0)
     MODULE_NAME MOD_NAME_PREFIX "TreeIterator", /* tp_name */
@@ -769,7 +1141,7 @@ static PyTypeObject BTreeIter_Type = {
     0,                                          /* tp_weaklistoffset */
     (getiterfunc)BTreeIter_getiter,             /* tp_iter */
     (iternextfunc)BTreeIter_next,               /* tp_iternext */
-    0,                                          /* tp_methods */
+    BTreeIter_methods,                          /* tp_methods */
     0,                                          /* tp_members */
     0,                                          /* tp_getset */
     0,                                          /* tp_base */
@@ -53,6 +53,8 @@
 
 static PyObject *sort_str, *reverse_str, *__setstate___str;
 static PyObject *_bucket_type_str, *max_internal_size_str, *max_leaf_size_str;
+static PyObject *counted_str, *state_format_str, *packed_str, *delta_str;
+static PyObject *prefix_str;
 static PyObject *__slotnames__str;
 static PyObject *ConflictError = NULL;
 
@@ -215,6 +217,36 @@ ulonglong_convert(PyObject *ob, unsigned PY_LONG_LONG *value)
 
 #endif  /* NEED_LONG_LONG_SUPPORT */
 
+#if defined(NEED_DOUBLE_CONVERT)
+/* Helper code used to support double keys and values. */
+
+static int
+double_convert(PyObject *ob, double *value, const char *what)
+{
+    double val;
+
+    if (!PyFloat_Check(ob) && !PyLong_Check(ob))
+    {
+        PyErr_Format(PyExc_TypeError, "expected float or int %s", what);
+        return 0;
+    }
+    val = PyFloat_AsDouble(ob);
+    if (val == -1.0 && PyErr_Occurred())
+    {
+        if (PyErr_ExceptionMatches(PyExc_OverflowError))
+        {
+            PyErr_Clear();
+            PyErr_SetString(PyExc_TypeError,
+                            "couldn't convert integer to C double");
+        }
+        return 0;
+    }
+    (*value) = val;
+    return 1;
+}
+
+#endif /* defined(NEED_DOUBLE_CONVERT) */
+
 
 /* Various kinds of BTree and Bucket structs are instances of
  * "sized containers", and have a common initial layout:
@@ -272,6 +304,7 @@ typedef struct Bucket_s {
 typedef struct BTreeItem_s {
   KEY_TYPE key;
   Sized *child; /* points to another BTree, or to a Bucket of some sort */
+  Py_ssize_t count; /* number of elements under child, if counted */
 } BTreeItem;
 
 typedef struct BTree_s {
@@ -291,12 +324,41 @@ typedef struct BTree_s {
    * data[len].key is positive infinity.
    */
   BTreeItem *data;
+
+  /* Whether the "count" fields of the data array are maintained, as
+   * decided by the class's "counted" attribute.  0 until looked up, then
+   * COUNTED_NO or COUNTED_YES.  See _BTree_counted().
+   */
+  int counted;
+} BTree;
+
+#define COUNTED_NO 1
+#define COUNTED_YES 2
+
+/* The node sizes of a BTree or TreeSet class, from its max_internal_size
+ * and max_leaf_size attributes.  0 until looked up.  They're only valid
+ * while the class has the version tag they were looked up under:  Python
+ * gives a class a new tag when it or any of its bases (including mixins
+ * that aren't BTrees) is modified.
+ */
+typedef struct {
   long max_internal_size;
   long max_leaf_size;
-} BTree;
+  unsigned int version_tag;
+} BTreeSizes;
+
+/* Classes of BTrees and TreeSets are instances of BTreeTypeType.  Apart
+ * from the static BTreeType and TreeSetType, they are heap types with room
+ * for their node sizes.  See _BTree_type_sizes().
+ */
+typedef struct {
+  PyHeapTypeObject head;
+  BTreeSizes sizes;
+} BTreeTypeObject;
 
 static PyTypeObject BTreeTypeType;
 static PyTypeObject BTreeType;
+static PyTypeObject TreeSetType;
 static PyTypeObject BucketType;
 
 #define BTREE(O) ((BTree*)(O))
@@ -327,6 +389,276 @@ static PyTypeObject BucketType;
     (RESULT) = _i;                                          \
 }
 
+#ifdef KEY_TYPE_IS_INTEGER
+/* Integer keys can be compared directly and the distances between them
+ * computed, so searches over them are specialized.
+ *
+ * Key arrays with at least INTERPOLATION_MIN_LEN keys are first checked
+ * for uniformity:  if the middle key is within INTERPOLATION_WINDOW keys'
+ * spacing of where it would be if all keys were evenly spaced, as for
+ * dense or roughly uniform keys such as sequential document ids or
+ * timestamps, the key is probed where it would be if evenly spaced, and
+ * if it is within INTERPOLATION_WINDOW keys of that, only that window
+ * remains to be searched.  Otherwise the middle key serves as the first
+ * probe of a binary search.
+ *
+ * The binary search branches on each comparison while the range is wide,
+ * which lets the processor speculatively load the cache lines of the next
+ * probes, and finishes without data-dependent branches once at most
+ * BRANCHLESS_SEARCH_LEN keys remain, avoiding mispredictions.
+ */
+#define INTERPOLATION_MIN_LEN 16
+#define INTERPOLATION_WINDOW 4
+#define BRANCHLESS_SEARCH_LEN 8
+
+/* Return the smallest index i in [lo, hi] such that i == hi or the key
+ * at i is >= key, among the increasing keys stored stride bytes apart
+ * starting at base.
+ */
+static int
+_BTree_lower_bound(const char *base, size_t stride, int lo, int hi,
+                   KEY_TYPE key)
+{
+#define KEY_AT(I) (*(const KEY_TYPE *)(base + (size_t)(I) * stride))
+    int n, half;
+
+    if (hi - lo >= INTERPOLATION_MIN_LEN)
+    {
+        KEY_TYPE first = KEY_AT(lo), last = KEY_AT(hi - 1);
+        int mid = (lo + hi) >> 1, guess, a, b;
+        double spacing, offset;
+
+        if (key <= first)
+            return lo;
+        if (key > last)
+            return hi;
+        /* Compute distances as doubles, which can't overflow. */
+        spacing = ((double)last - (double)first) / (hi - 1 - lo);
+        offset = (double)KEY_AT(mid) - (double)first - spacing * (mid - lo);
+        /* Distinct 64-bit keys can round to spacings below 1 (even 0),
+         * where interpolating isn't meaningful.
+         */
+        if (!(spacing >= 1)
+            || offset > INTERPOLATION_WINDOW * spacing
+            || -offset > INTERPOLATION_WINDOW * spacing)
+        {
+            if (KEY_AT(mid) < key)
+                lo = mid + 1;
+            else
+                hi = mid;
+        }
+        else
+        {
+            offset = ((double)key - (double)first) / spacing;
+            guess = offset < hi - 1 - lo ? lo + (int)offset : hi - 1;
+            /* The answer is in [lo + 1, hi - 1]. */
+            lo++;
+            hi--;
+            if (guess < lo)
+                guess = lo;
+            a = guess - INTERPOLATION_WINDOW;
+            b = guess + INTERPOLATION_WINDOW;
+            if (a > lo && KEY_AT(a - 1) >= key)
+                hi = a - 1;
+            else if (b < hi && KEY_AT(b) < key)
+                lo = b + 1;
+            else
+            {
+                if (a > lo)
+                    lo = a;
+                if (b < hi)
+                    hi = b;
+            }
+        }
+    }
+
+    while (hi - lo > BRANCHLESS_SEARCH_LEN)
+    {
+        half = (lo + hi) >> 1;
+        if (KEY_AT(half) < key)
+            lo = half + 1;
+        else
+            hi = half;
+    }
+    n = hi - lo;
+    if (n <= 0)
+        return lo;
+    while (n > 1)
+    {
+        half = n >> 1;
+        lo = KEY_AT(lo + half) < key ? lo + half : lo;
+        n -= half;
+    }
+    return lo + (KEY_AT(lo) < key);
+#undef KEY_AT
+}
+
+/* Small buckets are searched by counting the keys less than the key,
+ * which is its lower bound, in one pass over the keys array.  Unlike a
+ * binary search, the pass has no data-dependent branches or loads, so
+ * it can be vectorized.  The kernel is selected when the module is
+ * initialized, with the largest bucket it searches (see
+ * benchmarks/search.py):
+ *
+ * - With AVX2 (x86-64, GCC or Clang), 4 or 8 keys per comparison, for
+ *   buckets of up to 128 keys.
+ * - With SSE2, which all x86-64 processors have, 4 32-bit keys per
+ *   comparison (SSE2 can't compare 64-bit integers), for buckets of up
+ *   to 64 keys.
+ * - Otherwise, a scalar loop (which the compiler may vectorize), for
+ *   buckets of up to 32 keys.
+ */
+typedef int (*bucket_scan_func)(const KEY_TYPE *keys, int len, KEY_TYPE key);
+
+#define KEY_IS_UNSIGNED ((KEY_TYPE)-1 > 0)
+
+static int
+_bucket_scan(const KEY_TYPE *keys, int len, KEY_TYPE key)
+{
+    int i, n = 0;
+
+    for (i = 0; i < len; i++)
+        n += keys[i] < key;
+    return n;
+}
+
+#if defined(__x86_64__) || defined(_M_X64)
+#include <immintrin.h>
+
+/* SSE2 and AVX2 only compare signed integers; unsigned keys are
+ * compared with their sign bits flipped. */
+static int
+_bucket_scan_sse2(const KEY_TYPE *keys, int len, KEY_TYPE key)
+{
+    int i = 0, n = 0;
+
+    if (sizeof(KEY_TYPE) == 4)
+    {
+        __m128i bias = _mm_set1_epi32(KEY_IS_UNSIGNED ? INT_MIN : 0);
+        __m128i vkey = _mm_xor_si128(_mm_set1_epi32((int)key), bias);
+        __m128i count = _mm_setzero_si128();
+        int lanes[4];
+
+        for (; i + 4 <= len; i += 4)
+        {
+            __m128i v = _mm_loadu_si128((const __m128i *)(keys + i));
+            /* Each lane is -1 where the key is less than the search key. */
+            count = _mm_sub_epi32(
+                count, _mm_cmpgt_epi32(vkey, _mm_xor_si128(v, bias)));
+        }
+        _mm_storeu_si128((__m128i *)lanes, count);
+        n = lanes[0] + lanes[1] + lanes[2] + lanes[3];
+    }
+    return n + _bucket_scan(keys + i, len - i, key);
+}
+
+#if defined(__GNUC__)
+#define HAVE_BUCKET_SCAN_AVX2
+
+__attribute__((target("avx2")))
+static int
+_bucket_scan_avx2(const KEY_TYPE *keys, int len, KEY_TYPE key)
+{
+    int i = 0, n = 0;
+
+    if (sizeof(KEY_TYPE) == 8)
+    {
+        __m256i bias = _mm256_set1_epi64x(KEY_IS_UNSIGNED ? LLONG_MIN : 0);
+        __m256i vkey = _mm256_xor_si256(
+            _mm256_set1_epi64x((long long)key), bias);
+        __m256i count = _mm256_setzero_si256();
+        long long lanes[4];
+
+        for (; i + 4 <= len; i += 4)
+        {
+            __m256i v = _mm256_loadu_si256((const __m256i *)(keys + i));
+            count = _mm256_sub_epi64(
+                count, _mm256_cmpgt_epi64(vkey, _mm256_xor_si256(v, bias)));
+        }
+        _mm256_storeu_si256((__m256i *)lanes, count);
+        n = (int)(lanes[0] + lanes[1] + lanes[2] + lanes[3]);
+    }
+    else
+    {
+        __m256i bias = _mm256_set1_epi32(KEY_IS_UNSIGNED ? INT_MIN : 0);
+        __m256i vkey = _mm256_xor_si256(_mm256_set1_epi32((int)key), bias);
+        __m256i count = _mm256_setzero_si256();
+        int lanes[8], j;
+
+        for (; i + 8 <= len; i += 8)
+        {
+            __m256i v = _mm256_loadu_si256((const __m256i *)(keys + i));
+            count = _mm256_sub_epi32(
+                count, _mm256_cmpgt_epi32(vkey, _mm256_xor_si256(v, bias)));
+        }
+        _mm256_storeu_si256((__m256i *)lanes, count);
+        for (j = 0; j < 8; j++)
+            n += lanes[j];
+    }
+    return n + _bucket_scan(keys + i, len - i, key);
+}
+#endif /* __GNUC__ */
+#endif /* x86-64 */
+
+static bucket_scan_func bucket_scan = _bucket_scan;
+static int bucket_scan_max_len = 32;
+
+static void
+init_bucket_scan(void)
+{
+#ifdef HAVE_BUCKET_SCAN_AVX2
+    __builtin_cpu_init();
+    if (__builtin_cpu_supports("avx2"))
+    {
+        bucket_scan = _bucket_scan_avx2;
+        bucket_scan_max_len = 128;
+        return;
+    }
+#endif
+#if defined(__x86_64__) || defined(_M_X64)
+    if (sizeof(KEY_TYPE) == 4)
+    {
+        bucket_scan = _bucket_scan_sse2;
+        bucket_scan_max_len = 64;
+    }
+#endif
+}
+
+/* Return the index at which key belongs among a bucket's keys, as
+ * BUCKET_SEARCH does. */
+static int
+_bucket_lower_bound(const KEY_TYPE *keys, int len, KEY_TYPE key)
+{
+    if (len <= bucket_scan_max_len)
+        return bucket_scan(keys, len, key);
+    return _BTree_lower_bound((const char *)keys, sizeof(KEY_TYPE),
+                              0, len, key);
+}
+
+/* Return the index of the child of the BTree node self to search for key,
+ * as BTREE_SEARCH does. */
+static int
+_BTree_child_index(BTree *self, KEY_TYPE key)
+{
+    int i;
+
+    if (self->len <= 1)
+        return 0;
+    /* The first key in a node is unused. */
+    i = _BTree_lower_bound((const char *)&self->data[0].key,
+                           sizeof(BTreeItem), 1, self->len, key);
+    if (i == self->len || self->data[i].key != key)
+        i--;
+    return i;
+}
+
+#undef BTREE_SEARCH
+#define BTREE_SEARCH(RESULT, SELF, KEY, ONERROR) {          \
+    (RESULT) = _BTree_child_index((SELF), (KEY));           \
+    if (0) { ONERROR; }                                     \
+}
+#endif /* KEY_TYPE_IS_INTEGER */
+
 /* SetIteration structs are used in the internal set iteration protocol.
  * When you want to iterate over a set or bucket or BTree (even an
  * individual key!),
@@ -352,6 +684,12 @@ static PyTypeObject BucketType;
  *            do something with si.key and/or si.value;
  *            if (si.next(&si) < 0) { there was an error; }
  *        }
+ *    To skip ahead instead, when si.seek isn't NULL:
+ *        if (si.seek(&si, key) < 0) { there was an error }
+ *    makes si.key the first key >= key, unless it already is (so seek()
+ *    never moves back), or sets si.position to -1 if there is none.
+ *    Buckets, sets, BTrees and TreeSets find it without visiting the
+ *    keys skipped.
  * 5. Finalize the SetIterator:
  *        finiSetIteration(&si);
  *    This is mandatory!  si may contain references to iterator objects,
@@ -367,6 +705,8 @@ typedef struct SetIteration_s
   KEY_TYPE key;     /* next() sets to next key */
   VALUE_TYPE value; /* next() may set to next value */
   int (*next)(struct SetIteration_s*);  /* function to get next key+value */
+  /* function to skip to a key, or NULL */
+  int (*seek)(struct SetIteration_s*, KEY_TYPE);
 } SetIteration;
 
 /* Finish the set iteration protocol.  This MUST be called by everyone
@@ -507,6 +847,411 @@ BTree_ShouldSuppressKeyError()
     return 0;
 }
 
+#ifdef KEY_TYPECODE
+/* Buffer support for the families that store native C numbers.
+ *
+ * A typecode is one of the format characters shared by the struct and
+ * array modules.  A buffer can be read as items of a typecode if its
+ * format has the same kind (signed, unsigned or floating point) and the
+ * same item size; untyped byte buffers are reinterpreted as items of the
+ * typecode.
+ */
+static char
+_typecode_kind(char c)
+{
+    if (c == '\0')
+        return 0;
+    if (strchr("bhilqn", c))
+        return 'i';
+    if (strchr("BHILQN", c))
+        return 'u';
+    if (strchr("efd", c))
+        return 'f';
+    return 0;
+}
+
+/* Return the single format character of view, or '\0' if its format
+ * describes anything more than one native item.
+ */
+static char
+_buffer_format(Py_buffer *view)
+{
+    const char *format;
+
+    format = view->format ? view->format : "B";
+    if (*format == '@' || *format == '=')
+        format++;
+    if (format[0] != '\0' && format[1] == '\0')
+        return format[0];
+    return '\0';
+}
+
+/* Get a C-contiguous view of obj holding items of the given typecode and
+ * size.  Return 0 on success, after which the caller must release the
+ * view, or -1 with an exception set.
+ */
+static int
+BTree_GetNativeBuffer(PyObject *obj, Py_buffer *view,
+                      char typecode, Py_ssize_t itemsize)
+{
+    char format;
+
+    if (PyObject_GetBuffer(obj, view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) < 0)
+        return -1;
+    format = _buffer_format(view);
+    if (format != '\0')
+    {
+        if (strchr("Bbc", format))
+        {
+            if (view->len % itemsize == 0)
+                return 0;
+        }
+        else if (view->itemsize == itemsize
+                 && _typecode_kind(format) == _typecode_kind(typecode))
+            return 0;
+    }
+    PyErr_Format(PyExc_TypeError, "expected a buffer of '%c' items, not '%s'",
+                 typecode, view->format ? view->format : "B");
+    PyBuffer_Release(view);
+    return -1;
+}
+
+#if defined(KEY_TYPECODE) && defined(VALUE_TYPECODE)
+/* Return the items of a view from BTree_GetNativeBuffer as an array
+ * aligned for items of the given size.  That's the buffer itself if it's
+ * aligned, and otherwise a copy, which is also stored in *copy for the
+ * caller to free.  Byte buffers, such as memoryview slices, needn't be
+ * aligned.  Return NULL with an exception set on error.
+ */
+static void *
+BTree_AlignedItems(Py_buffer *view, Py_ssize_t itemsize, void **copy)
+{
+    *copy = NULL;
+    if ((Py_uintptr_t)view->buf % itemsize == 0)
+        return view->buf;
+    *copy = BTree_Malloc(view->len ? view->len : 1);
+    if (*copy != NULL)
+        memcpy(*copy, view->buf, view->len);
+    return *copy;
+}
+#endif
+
+#ifdef MULTI_INT_UNION
+/* Like BTree_GetNativeBuffer, but only accept buffers whose format is
+ * explicitly typed as items of the given typecode and size; untyped byte
+ * buffers are not reinterpreted.  Return 1 on success, after which the
+ * caller must release the view, 0 without setting an exception if obj
+ * isn't such a buffer, or -1 with an exception set.
+ */
+static int
+BTree_GetTypedBuffer(PyObject *obj, Py_buffer *view,
+                     char typecode, Py_ssize_t itemsize)
+{
+    char format;
+
+    if (!PyObject_CheckBuffer(obj))
+        return 0;
+    if (PyObject_GetBuffer(obj, view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) < 0)
+    {
+        if (!PyErr_ExceptionMatches(PyExc_BufferError))
+            return -1;
+        PyErr_Clear();
+        return 0;
+    }
+    format = _buffer_format(view);
+    if (format != '\0'
+        && !strchr("Bbc", format)
+        && view->itemsize == itemsize
+        && _typecode_kind(format) == _typecode_kind(typecode))
+        return 1;
+    PyBuffer_Release(view);
+    return 0;
+}
+#endif /* MULTI_INT_UNION */
+#endif
+
+#if defined(KEY_TYPECODE) || defined(VALUE_TYPECODE)
+/* Return a new array.array of the given typecode holding a copy of the
+ * bytes object bytes, or of the nbytes bytes at data.
+ */
+static PyObject *
+BTree_BytesToArray(char typecode, PyObject *bytes)
+{
+    PyObject *module, *result;
+
+    module = PyImport_ImportModule("array");
+    if (module == NULL)
+        return NULL;
+    result = PyObject_CallMethod(module, "array", "CO", typecode, bytes);
+    Py_DECREF(module);
+    return result;
+}
+
+static PyObject *
+BTree_NewArray(char typecode, const char *data, Py_ssize_t nbytes)
+{
+    PyObject *bytes, *result;
+
+    bytes = PyBytes_FromStringAndSize(data, nbytes);
+    if (bytes == NULL)
+        return NULL;
+    result = BTree_BytesToArray(typecode, bytes);
+    Py_DECREF(bytes);
+    return result;
+}
+
+/* Return a new read-only memoryview of the given typecode over a copy of
+ * the nbytes bytes at data.
+ */
+static PyObject *
+BTree_NewView(char typecode, const char *data, Py_ssize_t nbytes)
+{
+    PyObject *bytes, *view, *result;
+
+    bytes = PyBytes_FromStringAndSize(data, nbytes);
+    if (bytes == NULL)
+        return NULL;
+    view = PyMemoryView_FromObject(bytes);
+    Py_DECREF(bytes);
+    if (view == NULL)
+        return NULL;
+    result = PyObject_CallMethod(view, "cast", "C", typecode);
+    Py_DECREF(view);
+    return result;
+}
+#endif
+
+/* The formats of bucket state, chosen by the "state_format" attribute of
+ * the bucket's class.  See _BTree_state_format().
+ */
+#define STATE_TUPLES 0
+#define STATE_PACKED 1
+#define STATE_DELTA 2
+#define STATE_PREFIX 3
+
+/* Return the state format chosen by the "state_format" attribute of the
+ * class of self:  STATE_TUPLES for None (or no attribute), STATE_PACKED
+ * for "packed", STATE_DELTA for "delta", STATE_PREFIX for "prefix", or
+ * -1 with an exception set.
+ */
+static int
+_BTree_state_format(PyObject *self)
+{
+    PyObject *format;
+    int result = -1;
+
+    format = PyObject_GetAttr(OBJECT(Py_TYPE(self)), state_format_str);
+    if (format == NULL)
+    {
+        if (! PyErr_ExceptionMatches(PyExc_AttributeError))
+            return -1;
+        PyErr_Clear();
+        return STATE_TUPLES;
+    }
+    if (format == Py_None)
+        result = STATE_TUPLES;
+    else if (PyUnicode_Check(format)
+             && PyUnicode_Compare(format, packed_str) == 0)
+        result = STATE_PACKED;
+    else if (PyUnicode_Check(format)
+             && PyUnicode_Compare(format, delta_str) == 0)
+        result = STATE_DELTA;
+    else if (PyUnicode_Check(format)
+             && PyUnicode_Compare(format, prefix_str) == 0)
+        result = STATE_PREFIX;
+    else if (! PyErr_Occurred())
+        PyErr_Format(PyExc_ValueError, "unknown state_format %R", format);
+    Py_DECREF(format);
+    return result;
+}
+
+#ifdef KEY_TYPECODE
+#if PY_BIG_ENDIAN
+static void
+_BTree_byteswap(char *data, Py_ssize_t n, Py_ssize_t itemsize)
+{
+    Py_ssize_t i, j;
+    char c;
+
+    for (i = 0; i < n; i++, data += itemsize)
+        for (j = 0; j < itemsize / 2; j++)
+        {
+            c = data[j];
+            data[j] = data[itemsize - 1 - j];
+            data[itemsize - 1 - j] = c;
+        }
+}
+#endif
+
+/* Return a new bytes object holding the n items of the given size at data
+ * in little-endian byte order, as used by packed state.
+ */
+static PyObject *
+BTree_PackItems(const void *data, Py_ssize_t n, Py_ssize_t itemsize)
+{
+    PyObject *result;
+
+    result = PyBytes_FromStringAndSize((const char *)data, n * itemsize);
+#if PY_BIG_ENDIAN
+    if (result != NULL)
+        _BTree_byteswap(PyBytes_AS_STRING(result), n, itemsize);
+#endif
+    return result;
+}
+
+/* Copy the n items of the given size packed by BTree_PackItems in bytes
+ * to dest.  Return 0 on success, or -1 with an exception set if bytes
+ * isn't a bytes object holding exactly n items.
+ */
+static int
+BTree_UnpackItems(PyObject *bytes, void *dest, Py_ssize_t n,
+                  Py_ssize_t itemsize)
+{
+    if (! PyBytes_Check(bytes) || PyBytes_GET_SIZE(bytes) != n * itemsize)
+    {
+        PyErr_SetString(PyExc_TypeError,
+                        "packed state has the wrong number of bytes");
+        return -1;
+    }
+    memcpy(dest, PyBytes_AS_STRING(bytes), n * itemsize);
+#if PY_BIG_ENDIAN
+    _BTree_byteswap((char *)dest, n, itemsize);
+#endif
+    return 0;
+}
+
+#ifdef KEY_IS_NAN
+/* Return 0 if none of the n keys read from a buffer is NaN, or -1 with
+ * the TypeError COPY_KEY_FROM_ARG raises for NaN keys.
+ */
+static int
+BTree_CheckNaNKeys(const KEY_TYPE *keys, Py_ssize_t n)
+{
+    Py_ssize_t i;
+
+    for (i = 0; i < n; i++)
+        if (KEY_IS_NAN(keys[i]))
+        {
+            PyErr_SetString(PyExc_TypeError, "NaN is not a valid key");
+            return -1;
+        }
+    return 0;
+}
+#endif
+#endif
+
+#if defined(KEY_TYPE_IS_INTEGER) || defined(KEY_TYPE_IS_PYOBJECT)
+/* Write v at p as an unsigned LEB128 varint:  7 bits per byte, least
+ * significant first, with the high bit set on all but the last byte.
+ * This takes at most 10 bytes.  Return the end of the varint.
+ */
+static unsigned char *
+_BTree_put_varint(unsigned char *p, unsigned PY_LONG_LONG v)
+{
+    while (v >= 0x80)
+    {
+        *p++ = (unsigned char)(v & 0x7f) | 0x80;
+        v >>= 7;
+    }
+    *p++ = (unsigned char)v;
+    return p;
+}
+
+/* Read the varint written by _BTree_put_varint at p, which must be before
+ * end, into *v.  Return the end of the varint, or NULL if it is truncated
+ * or too large.
+ */
+static const unsigned char *
+_BTree_get_varint(const unsigned char *p, const unsigned char *end,
+                  unsigned PY_LONG_LONG *v)
+{
+    int shift = 0;
+
+    *v = 0;
+    do
+    {
+        if (p == end || shift > 63)
+            return NULL;
+        *v |= (unsigned PY_LONG_LONG)(*p & 0x7f) << shift;
+        shift += 7;
+    } while (*p++ & 0x80);
+    return p;
+}
+#endif
+
+#ifdef KEY_TYPE_IS_PYOBJECT
+/* Decode the n keys of prefix state (see _bucket_prefix_state) into keys,
+ * as new references.  Key i is the first shared[i] characters of key i-1
+ * followed by items[i * step].  Return 0 on success, or -1 with an
+ * exception set if the state is malformed.
+ */
+static int
+BTree_PrefixKeys(PyObject *items, int step, PyObject *shared,
+                 PyObject **keys, int n)
+{
+    const unsigned char *p, *end;
+    unsigned PY_LONG_LONG length;
+    PyObject *prev = NULL, *suffix, *head, *key;
+    int i = 0;
+
+    if (! PyBytes_Check(shared))
+        goto Malformed;
+    p = (const unsigned char *)PyBytes_AS_STRING(shared);
+    end = p + PyBytes_GET_SIZE(shared);
+    for (; i < n; i++)
+    {
+        p = _BTree_get_varint(p, end, &length);
+        if (p == NULL)
+            goto Malformed;
+        suffix = PyTuple_GET_ITEM(items, i * step);
+        if (prev ? Py_TYPE(suffix) != Py_TYPE(prev)
+                 : ! (PyBytes_CheckExact(suffix)
+                      || PyUnicode_CheckExact(suffix)))
+            goto Malformed;
+        if (length == 0)
+        {
+            key = suffix;
+            Py_INCREF(key);
+        }
+        else if (prev == NULL || length > (unsigned PY_LONG_LONG)
+                 (PyBytes_Check(prev) ? PyBytes_GET_SIZE(prev)
+                                      : PyUnicode_GET_LENGTH(prev)))
+            goto Malformed;
+        else if (PyBytes_Check(prev))
+        {
+            key = PyBytes_FromStringAndSize(
+                NULL, (Py_ssize_t)length + PyBytes_GET_SIZE(suffix));
+            if (key == NULL)
+                goto Error;
+            memcpy(PyBytes_AS_STRING(key), PyBytes_AS_STRING(prev),
+                   (size_t)length);
+            memcpy(PyBytes_AS_STRING(key) + length,
+                   PyBytes_AS_STRING(suffix), PyBytes_GET_SIZE(suffix));
+        }
+        else
+        {
+            head = PyUnicode_Substring(prev, 0, (Py_ssize_t)length);
+            if (head == NULL)
+                goto Error;
+            key = PyUnicode_Concat(head, suffix);
+            Py_DECREF(head);
+            if (key == NULL)
+                goto Error;
+        }
+        keys[i] = prev = key;
+    }
+    if (p == end)
+        return 0;
+
+Malformed:
+    PyErr_SetString(PyExc_TypeError, "prefix state is malformed");
+Error:
+    while (--i >= 0)
+        Py_DECREF(keys[i]);
+    return -1;
+}
+#endif
+
 #include "BTreeItemsTemplate.c"
 #include "BucketTemplate.c"
 #include "SetTemplate.c"
@@ -516,16 +1261,22 @@ BTree_ShouldSuppressKeyError()
 #include "MergeTemplate.c"
 
 static struct PyMethodDef module_methods[] = {
-  {"difference", (PyCFunction) difference_m,    METH_VARARGS,
-   "difference(o1, o2)\n"
-   "compute the difference between o1 and o2"
+  {"difference", (PyCFunction) difference_m,    METH_VARARGS | METH_KEYWORDS,
+   "difference(o1, o2, out=None)\n"
+   "compute the difference between o1 and o2\n"
+   "\n"
+   "With out='view', return a lazy view of the result."
   },
-  {"union", (PyCFunction) union_m,      METH_VARARGS,
-   "union(o1, o2)\ncompute the union of o1 and o2\n"
+  {"union", (PyCFunction) union_m,      METH_VARARGS | METH_KEYWORDS,
+   "union(o1, o2, out=None)\ncompute the union of o1 and o2\n"
+   "\n"
+   "With out='view', return a lazy view of the result."
   },
-  {"intersection", (PyCFunction) intersection_m,        METH_VARARGS,
-   "intersection(o1, o2)\n"
-   "compute the intersection of o1 and o2"
+  {"intersection", (PyCFunction) intersection_m,        METH_VARARGS | METH_KEYWORDS,
+   "intersection(o1, o2, out=None)\n"
+   "compute the intersection of o1 and o2\n"
+   "\n"
+   "With out='view', return a lazy view of the result."
   },
 #ifdef MERGE
   {"weightedUnion", (PyCFunction) wunion_m,     METH_VARARGS,
@@ -539,11 +1290,28 @@ static struct PyMethodDef module_methods[] = {
   },
 #endif
 #ifdef MULTI_INT_UNION
-  {"multiunion", (PyCFunction) multiunion_m, METH_VARARGS,
-   "multiunion(seq)\ncompute union of a sequence of integer sets.\n"
+  {"multiunion", (PyCFunction) multiunion_m, METH_VARARGS | METH_KEYWORDS,
+   "multiunion(seq, out=None)\ncompute union of a sequence of integer sets.\n"
    "\n"
-   "Each element of seq must be an integer set, or convertible to one\n"
-   "via the set iteration protocol.  The union returned is an IISet."
+   "Each element of seq must be an integer set, a buffer of native\n"
+   "integers of the key type, or convertible to an integer set via the\n"
+   "set iteration protocol.  The union returned is an IISet, or, if out\n"
+   "is 'buffer', a read-only memoryview of the sorted keys."
+  },
+  {"multiintersection", (PyCFunction) multiintersection_m, METH_VARARGS,
+   "multiintersection(seq)\ncompute intersection of a sequence of integer"
+   " sets.\n"
+   "\n"
+   "Each element of seq is converted to an integer set as for multiunion.\n"
+   "The intersection returned is an IISet."
+  },
+  {"multidifference", (PyCFunction) multidifference_m, METH_VARARGS,
+   "multidifference(base, seq)\ncompute difference of an integer set and a"
+   " sequence of integer sets.\n"
+   "\n"
+   "base and each element of seq are converted to integer sets as for\n"
+   "multiunion.  The difference returned is an IISet of the keys of base\n"
+   "that aren't in any element of seq."
   },
 #endif
   {NULL,                NULL}           /* sentinel */
@@ -630,6 +1398,9 @@ module_init(void)
     if (object_ == NULL)
       return NULL;
 #endif
+#ifdef KEY_TYPE_IS_INTEGER
+    init_bucket_scan();
+#endif
 
     sort_str = PyUnicode_InternFromString("sort");
     if (!sort_str)
@@ -650,15 +1421,31 @@ module_init(void)
     max_leaf_size_str = PyUnicode_InternFromString("max_leaf_size");
     if (! max_leaf_size_str)
         return NULL;
+    counted_str = PyUnicode_InternFromString("counted");
+    if (! counted_str)
+        return NULL;
+    state_format_str = PyUnicode_InternFromString("state_format");
+    if (! state_format_str)
+        return NULL;
+    packed_str = PyUnicode_InternFromString("packed");
+    if (! packed_str)
+        return NULL;
+    delta_str = PyUnicode_InternFromString("delta");
+    if (! delta_str)
+        return NULL;
+    prefix_str = PyUnicode_InternFromString("prefix");
+    if (! prefix_str)
+        return NULL;
     __slotnames__str = PyUnicode_InternFromString("__slotnames__");
     if (!__slotnames__str)
         return NULL;
 
     BTreeType_setattro_allowed_names = PyTuple_Pack(
-        5,
+        6,
         /* BTree attributes  */
         max_internal_size_str,
         max_leaf_size_str,
+        counted_str,
         /* zope.interface attributes */
         /*
           Technically, INTERNING directly here leaks references,
@@ -705,6 +1492,13 @@ module_init(void)
     _SET_TYPE(BTreeItemsType);
     _SET_TYPE(BTreeIter_Type);
     BTreeIter_Type.tp_getattro = PyObject_GenericGetAttr;
+    /* Fill in tp_dict, for the seek() method. */
+    if (PyType_Ready(&BTreeIter_Type) < 0)
+        return NULL;
+    if (PyType_Ready(&SetOpViewType) < 0)
+        return NULL;
+    if (PyType_Ready(&SetOpViewIterType) < 0)
+        return NULL;
     BucketType.tp_new = PyType_GenericNew;
     SetType.tp_new = PyType_GenericNew;
     BTreeType.tp_new = PyType_GenericNew;
@@ -712,6 +1506,8 @@ module_init(void)
 
     if (!init_persist_type(&BucketType))
             return NULL;
+    if (PyDict_SetItem(BucketType.tp_dict, state_format_str, Py_None) < 0)
+        return NULL;
 
     if (!init_type_with_meta_base(&BTreeTypeType, &PyType_Type, &PyType_Type)) {
         return NULL;
@@ -723,6 +1519,8 @@ module_init(void)
 
     if (!init_persist_type(&SetType))
         return NULL;
+    if (PyDict_SetItem(SetType.tp_dict, state_format_str, Py_None) < 0)
+        return NULL;
 
     if (!init_tree_type(&TreeSetType, &SetType)) {
         return NULL;
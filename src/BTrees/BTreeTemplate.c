@@ -15,12 +15,25 @@
 
 #define BTREETEMPLATE_C "$Id$\n"
 
+static BTreeSizes BTreeType_sizes, TreeSetType_sizes;
+
+/* Return where the node sizes of type, a BTree or TreeSet class, are kept. */
+static BTreeSizes *
+_BTree_type_sizes(PyTypeObject *type)
+{
+  if (type == &BTreeType)
+    return &BTreeType_sizes;
+  if (type == &TreeSetType)
+    return &TreeSetType_sizes;
+  return &((BTreeTypeObject *)type)->sizes;
+}
+
 static long
-_get_max_size(BTree *self, PyObject *name, long default_max)
+_get_max_size(PyTypeObject *type, PyObject *name, long default_max)
 {
   PyObject *size;
   long isize;
-  size = PyObject_GetAttr(OBJECT(OBJECT(self)->ob_type), name);
+  size = PyObject_GetAttr(OBJECT(type), name);
   if (size == NULL) {
       PyErr_Clear();
       return default_max;
@@ -38,26 +51,109 @@ _get_max_size(BTree *self, PyObject *name, long default_max)
   return isize;
 }
 
+/* Return the version tag of type, or 0 if it has none. */
+static unsigned int
+_BTree_type_version(PyTypeObject *type)
+{
+  if (type->tp_flags & Py_TPFLAGS_VALID_VERSION_TAG)
+    return type->tp_version_tag;
+  return 0;
+}
+
+/* Return the node sizes of type, forgetting them if the class (or one of
+ * its bases) has been modified since they were looked up.
+ */
+static BTreeSizes *
+_BTree_current_sizes(PyTypeObject *type)
+{
+  BTreeSizes *sizes = _BTree_type_sizes(type);
+  unsigned int version_tag = _BTree_type_version(type);
+
+  if (version_tag == 0 || version_tag != sizes->version_tag)
+    {
+      sizes->max_internal_size = 0;
+      sizes->max_leaf_size = 0;
+    }
+  return sizes;
+}
+
 static int
 _max_internal_size(BTree *self)
 {
-  long isize;
+  BTreeSizes *sizes = _BTree_current_sizes(Py_TYPE(self));
 
-  if (self->max_internal_size > 0) return self->max_internal_size;
-  isize = _get_max_size(self, max_internal_size_str, -1);
-  self->max_internal_size = isize;
-  return isize;
+  if (sizes->max_internal_size <= 0)
+    {
+      sizes->max_internal_size = _get_max_size(Py_TYPE(self),
+                                               max_internal_size_str, -1);
+      /* Looking up the attribute assigns a tag if the class had none. */
+      sizes->version_tag = _BTree_type_version(Py_TYPE(self));
+    }
+  return sizes->max_internal_size;
 }
 
 static int
 _max_leaf_size(BTree *self)
 {
-  long isize;
+  BTreeSizes *sizes = _BTree_current_sizes(Py_TYPE(self));
 
-  if (self->max_leaf_size > 0) return self->max_leaf_size;
-  isize = _get_max_size(self, max_leaf_size_str, -1);
-  self->max_leaf_size = isize;
-  return isize;
+  if (sizes->max_leaf_size <= 0)
+    {
+      sizes->max_leaf_size = _get_max_size(Py_TYPE(self),
+                                           max_leaf_size_str, -1);
+      sizes->version_tag = _BTree_type_version(Py_TYPE(self));
+    }
+  return sizes->max_leaf_size;
+}
+
+/* Return 1 if self's class keeps per-child element counts (its "counted"
+ * attribute is true), 0 if not, or -1 on error.
+ */
+static int
+_BTree_counted(BTree *self)
+{
+  PyObject *flag;
+  int counted;
+
+  if (self->counted) return self->counted == COUNTED_YES;
+  flag = PyObject_GetAttr(OBJECT(Py_TYPE(self)), counted_str);
+  if (flag == NULL) {
+      PyErr_Clear();
+      counted = 0;
+  }
+  else {
+      counted = PyObject_IsTrue(flag);
+      Py_DECREF(flag);
+      if (counted < 0)
+        return -1;
+  }
+  self->counted = counted ? COUNTED_YES : COUNTED_NO;
+  return counted;
+}
+
+/* Return the number of elements under the counted BTree node self, which
+ * must be activated.
+ */
+static Py_ssize_t
+_BTree_countSum(BTree *self)
+{
+  Py_ssize_t total = 0;
+  int i;
+
+  for (i = 0; i < self->len; i++)
+    total += self->data[i].count;
+  return total;
+}
+
+/* Return the number of elements under child, an activated child of the
+ * counted BTree node self.
+ */
+static Py_ssize_t
+_BTree_childCount(BTree *self, Sized *child)
+{
+  if (SameType_Check(self, child))
+    return _BTree_countSum(BTREE(child));
+  return child->len;
 }
 
 /* Sanity-check a BTree.  This is a private helper for BTree_check.  Return:
@@ -78,6 +174,7 @@ BTree_check_inner(BTree *self, Bucket *nextbucket)
     char *errormsg = "internal error";  /* someone should have overriden */
     Sized *activated_child = NULL;
     int result = -1;    /* until proved innocent */
+    int counted;
 
 #define CHECK(CONDITION, ERRORMSG)              \
   if (!(CONDITION)) {                           \
@@ -116,6 +213,9 @@ BTree_check_inner(BTree *self, Bucket *nextbucket)
     {
         CHECK(self->data[i].child != NULL, "BTree has NULL child");
     }
+    counted = _BTree_counted(self);
+    if (counted < 0)
+        goto Done;
 
     if (SameType_Check(self, self->data[0].child))
     {
@@ -146,6 +246,16 @@ BTree_check_inner(BTree *self, Bucket *nextbucket)
             }
             if (BTree_check_inner(BTREE(child), bucketafter) < 0)
                 goto Done;
+            if (counted)
+            {
+                UNLESS (PER_USE(child))
+                    goto Done;
+                activated_child = child;
+                CHECK(self->data[i].count == _BTree_countSum(BTREE(child)),
+                      "BTree child count is wrong");
+                PER_ALLOW_DEACTIVATION(child);
+                activated_child = NULL;
+            }
         }
     }
     else /* Our children are buckets. */
@@ -173,6 +283,8 @@ BTree_check_inner(BTree *self, Bucket *nextbucket)
                 bucketafter = BUCKET(self->data[i+1].child);
             CHECK(BUCKET(child)->next == bucketafter,
                     "Bucket next pointer is damaged");
+            CHECK(!counted || self->data[i].count == child->len,
+                  "BTree child count is wrong");
             PER_ALLOW_DEACTIVATION(child);
             activated_child = NULL;
         }
@@ -360,6 +472,7 @@ BTree_split(BTree *self, int index, BTree *next)
         return -1;
     memcpy(next->data, self->data + index, sizeof(BTreeItem) * next_size);
     next->size = next_size;  /* but don't set len until we succeed */
+    next->counted = self->counted; /* the counts came along */
 
     /* Set next's firstbucket.  self->firstbucket is still correct. */
     child = next->data[0].child;
@@ -414,6 +527,7 @@ BTree_split_root(BTree *self, int noval)
     child->size = self->size;
     child->len = self->len;
     child->data = self->data;
+    child->counted = self->counted;
     child->firstbucket = self->firstbucket;
     Py_INCREF(child->firstbucket);
 
@@ -450,6 +564,11 @@ BTree_grow(BTree *self, int index, int noval)
     int i;
     Sized *v, *e = 0;
     BTreeItem *d;
+    Py_ssize_t vcount = 0, ecount = 0;
+    int counted = _BTree_counted(self);
+
+    if (counted < 0)
+        return -1;
 
     if (self->len == self->size)
     {
@@ -494,6 +613,11 @@ BTree_grow(BTree *self, int index, int noval)
             i = BTree_split((BTree *)v, -1, (BTree *)e);
         else
             i = bucket_split((Bucket *)v, -1, (Bucket *)e);
+        if (i >= 0 && counted)
+        {
+            vcount = _BTree_childCount(self, v);
+            ecount = _BTree_childCount(self, e);
+        }
         PER_ALLOW_DEACTIVATION(v);
 
         if (i < 0)
@@ -523,6 +647,8 @@ BTree_grow(BTree *self, int index, int noval)
             INCREF_KEY(d->key);
         }
         d->child = e;
+        d->count = ecount;
+        d[-1].count = vcount;
         self->len++;
 
         if (self->len >= max_size * 2)    /* the root is huge */
@@ -538,6 +664,7 @@ BTree_grow(BTree *self, int index, int noval)
         d->child = BTree_newBucket(self);
         if (d->child == NULL)
             return -1;
+        d->count = 0;
         self->len = 1;
         Py_INCREF(d->child);
         self->firstbucket = (Bucket *)d->child;
@@ -715,6 +842,7 @@ _BTree_set(BTree *self, PyObject *keyarg, PyObject *value,
     int childlength;    /* len(self->data[min].child) */
     int status;         /* our return value; and return value from callee */
     int self_was_empty; /* was self empty at entry? */
+    int counted;        /* do we keep per-child counts? */
 
     KEY_TYPE key;
     int copied = 1;
@@ -782,6 +910,16 @@ _BTree_set(BTree *self, PyObject *keyarg, PyObject *value,
         goto Error;
     assert(status == 1 || status == 2);
 
+    /* The child gained or lost exactly one element. */
+    counted = _BTree_counted(self);
+    if (counted < 0)
+        goto Error;
+    if (counted)
+    {
+        d->count += value ? 1 : -1;
+        changed = 1;
+    }
+
     /* The child changed size.  Get its new size.  Note that since the tree
     * rooted at the child changed size, so did the tree rooted at self:
     * our status must be >= 1 too.
@@ -1031,14 +1169,6 @@ BTree__p_deactivate(BTree *self, PyObject *args, PyObject *keywords)
         }
     }
 
-    /*
-      Always clear our node size cache, whether we're in a jar or not. It is
-      only read from the type anyway, and we'll do so on the next write after
-      we get activated.
-    */
-    self->max_internal_size = 0;
-    self->max_leaf_size = 0;
-
     if (self->jar && self->oid)
     {
         ghostify = self->state == cPersistent_UPTODATE_STATE;
@@ -1111,13 +1241,20 @@ err:
  *     )
  *
  * In the above, key[i] means self->data[i].key, and similarly for child[i].
+ *
+ * If the class is counted, a third element follows:  a tuple of the
+ * number of elements under each child, (count[0], ..., count[len-1]).
  */
 static PyObject *
 BTree_getstate(BTree *self)
 {
     PyObject *r = NULL;
-    PyObject *o;
+    PyObject *o, *counts = NULL;
     int i, l;
+    int counted = _BTree_counted(self);
+
+    if (counted < 0)
+        return NULL;
 
     UNLESS (PER_USE(self))
         return NULL;
@@ -1157,7 +1294,23 @@ BTree_getstate(BTree *self)
                 PyTuple_SET_ITEM(r,l,o);
                 l++;
             }
-            ASSIGN(r, Py_BuildValue("OO", r, self->firstbucket));
+            if (counted)
+            {
+                counts = PyTuple_New(self->len);
+                if (counts == NULL)
+                    goto err;
+                for (i = 0; i < self->len; i++)
+                {
+                    o = PyLong_FromSsize_t(self->data[i].count);
+                    if (o == NULL)
+                        goto err;
+                    PyTuple_SET_ITEM(counts, i, o);
+                }
+                ASSIGN(r, Py_BuildValue("OOO", r, self->firstbucket, counts));
+                Py_DECREF(counts);
+            }
+            else
+                ASSIGN(r, Py_BuildValue("OO", r, self->firstbucket));
         }
 
     }
@@ -1174,15 +1327,61 @@ BTree_getstate(BTree *self)
 err:
     PER_UNUSE(self);
     Py_XDECREF(r);
+    Py_XDECREF(counts);
     return NULL;
 }
 
+/* Fill in the counts of self, a counted BTree node whose state has just
+ * been set, from the counts tuple in its state, if any, or else by asking
+ * each child.  The latter loads the children, and happens only for state
+ * written before the class was counted.
+ */
+static int
+_BTree_setcounts(BTree *self, PyObject *counts)
+{
+    int i;
+    Sized *child;
+
+    if (counts != NULL)
+    {
+        if (!PyTuple_Check(counts) || PyTuple_GET_SIZE(counts) != self->len)
+        {
+            PyErr_SetString(PyExc_TypeError,
+                            "counts must be a tuple with one int per child");
+            return -1;
+        }
+        for (i = 0; i < self->len; i++)
+        {
+            self->data[i].count =
+                PyLong_AsSsize_t(PyTuple_GET_ITEM(counts, i));
+            if (self->data[i].count < 0)
+            {
+                if (!PyErr_Occurred())
+                    PyErr_SetString(PyExc_ValueError, "negative count");
+                return -1;
+            }
+        }
+        return 0;
+    }
+
+    for (i = 0; i < self->len; i++)
+    {
+        child = self->data[i].child;
+        UNLESS (PER_USE(child))
+            return -1;
+        self->data[i].count = _BTree_childCount(self, child);
+        PER_UNUSE(child);
+    }
+    return 0;
+}
+
 static int
 _BTree_setstate(BTree *self, PyObject *state, int noval)
 {
-    PyObject *items, *firstbucket = NULL;
+    PyObject *items, *firstbucket = NULL, *counts = NULL;
     BTreeItem *d;
     int len, l, i, copied=1;
+    int counted;
     PyTypeObject *leaftype = (noval ? &SetType : &BucketType);
 
     if (_BTree_clear(self) < 0)
@@ -1192,13 +1391,15 @@ _BTree_setstate(BTree *self, PyObject *state, int noval)
         None -- an empty BTree
         A one-tuple -- a single bucket btree
         A two-tuple -- a BTree with more than one bucket
+        A three-tuple -- the same, with the counts of a counted BTree
         See comments for BTree_getstate() for the details.
     */
 
     if (state == Py_None)
         return 0;
 
-    if (!PyArg_ParseTuple(state, "O|O:__setstate__", &items, &firstbucket))
+    if (!PyArg_ParseTuple(state, "O|OO:__setstate__",
+                          &items, &firstbucket, &counts))
         return -1;
 
     if (!PyTuple_Check(items))
@@ -1288,6 +1489,11 @@ _BTree_setstate(BTree *self, PyObject *state, int noval)
 #endif
     self->len = len;
 
+    counted = _BTree_counted(self);
+    if (counted < 0)
+        return -1;
+    if (counted)
+        return _BTree_setcounts(self, counts);
     return 0;
 }
 
@@ -1669,52 +1875,263 @@ BTree_maxKey(BTree *self, PyObject *args)
 }
 
 /*
-** BTree_rangeSearch
+** _BTree_rank
 **
-** Generates a BTreeItems object based on the two indexes passed in,
-** being the range between them.
+** Return the number of keys in the BTree less than key, or less than or
+** equal to key if or_equal is true, or -1 on error.  self must be
+** activated.  A counted BTree only visits one node per level; otherwise
+** the buckets to the left of the one that would hold key are walked.
+*/
+static Py_ssize_t
+_BTree_rank(BTree *self, KEY_TYPE key, int or_equal)
+{
+    BTree *root = self;
+    Bucket *bucket, *b;
+    Py_ssize_t result = 0;
+    int counted, i, cmp;
+
+    counted = _BTree_counted(self);
+    if (counted < 0)
+        return -1;
+    if (self->len == 0)
+        return 0;
+
+    for (;;)
+    {
+        Sized *child;
+
+        BTREE_SEARCH(i, self, key, goto err);
+        if (counted)
+        {
+            int j;
+            for (j = 0; j < i; j++)
+                result += self->data[j].count;
+        }
+        child = self->data[i].child;
+        if (SameType_Check(self, child))
+        {
+            if (self != root)
+                PER_UNUSE(self);
+            self = BTREE(child);
+            PER_USE_OR_RETURN(self, -1);
+        }
+        else
+        {
+            bucket = BUCKET(child);
+            break;
+        }
+    }
+    if (self != root)
+        PER_UNUSE(self);
+
+    if (! counted)
+    {
+        for (b = root->firstbucket; b != bucket; b = b->next)
+        {
+            if (b == NULL)
+            {
+                PyErr_SetString(PyExc_AssertionError,
+                                "BTree bucket chain is damaged");
+                return -1;
+            }
+            PER_USE_OR_RETURN(b, -1);
+            result += b->len;
+            PER_UNUSE(b);
+        }
+    }
+
+    PER_USE_OR_RETURN(bucket, -1);
+    BUCKET_SEARCH(i, cmp, bucket, key, goto bucket_err);
+    PER_UNUSE(bucket);
+    return result + i + (cmp == 0 && or_equal);
+
+bucket_err:
+    PER_UNUSE(bucket);
+    return -1;
+
+err:
+    if (self != root)
+        PER_UNUSE(self);
+    return -1;
+}
+
+/*
+** _BTree_select
+**
+** Find the key at position index (0 <= index) of the BTree.  On success
+** return 0 and store a new reference to its bucket in *bucket and its
+** offset in *offset; otherwise return -1, with IndexError set if index is
+** out of range.  self must be activated.  A counted BTree only visits one
+** node per level; otherwise the buckets are walked from the first one.
+*/
+static int
+_BTree_select(BTree *self, Py_ssize_t index, Bucket **bucket, int *offset)
+{
+    BTree *root = self;
+    Bucket *b = NULL;
+    Py_ssize_t remaining = index;
+    int counted, found;
+
+    counted = _BTree_counted(self);
+    if (counted < 0)
+        return -1;
+
+    if (counted)
+    {
+        while (self->len)
+        {
+            Sized *child;
+            int i;
+
+            for (i = 0; i < self->len - 1; i++)
+            {
+                if (remaining < self->data[i].count)
+                    break;
+                remaining -= self->data[i].count;
+            }
+            child = self->data[i].child;
+            if (! SameType_Check(self, child))
+            {
+                b = BUCKET(child);
+                break;
+            }
+            if (self != root)
+                PER_UNUSE(self);
+            self = BTREE(child);
+            PER_USE_OR_RETURN(self, -1);
+        }
+        if (self != root)
+            PER_UNUSE(self);
+    }
+    else
+        b = self->firstbucket;
+
+    while (b != NULL)
+    {
+        Bucket *next;
+
+        PER_USE_OR_RETURN(b, -1);
+        found = remaining < b->len;
+        if (! found)
+            remaining -= b->len;
+        next = b->next;
+        PER_UNUSE(b);
+        if (found)
+        {
+            Py_INCREF(b);
+            *bucket = b;
+            *offset = (int)remaining;
+            return 0;
+        }
+        if (counted)
+            break;
+        b = next;
+    }
+
+    IndexError((int)index);
+    return -1;
+}
+
+/*
+** BTree_rank
 **
+** Return the number of keys in the BTree less than key, which is the
+** position of key in the sorted keys if it's present.
 */
 static PyObject *
-BTree_rangeSearch(BTree *self, PyObject *args, PyObject *kw, char type)
+BTree_rank(BTree *self, PyObject *keyarg)
+{
+    KEY_TYPE key;
+    Py_ssize_t result;
+    int copied = 1;
+
+    COPY_KEY_FROM_ARG(key, keyarg, copied);
+    UNLESS (copied)
+        return NULL;
+
+    PER_USE_OR_RETURN(self, NULL);
+    result = _BTree_rank(self, key, 0);
+    PER_UNUSE(self);
+    if (result < 0)
+        return NULL;
+    return PyLong_FromSsize_t(result);
+}
+
+/* forward declaration */
+static Py_ssize_t
+BTree_length_or_nonzero(BTree *self, int nonzero);
+
+/*
+** BTree_select
+**
+** Return the key at the given position, indexing the sorted keys as a
+** Python sequence would.
+*/
+static PyObject *
+BTree_select(BTree *self, PyObject *args)
+{
+    Py_ssize_t index;
+    Bucket *bucket;
+    int offset;
+    PyObject *result = NULL;
+
+    if (! PyArg_ParseTuple(args, "n", &index))
+        return NULL;
+
+    if (index < 0)
+    {
+        Py_ssize_t len = BTree_length_or_nonzero(self, 0);
+        if (len < 0)
+            return NULL;
+        index += len;
+        if (index < 0)
+            return IndexError((int)(index - len));
+    }
+
+    PER_USE_OR_RETURN(self, NULL);
+    if (_BTree_select(self, index, &bucket, &offset) == 0)
+    {
+        if (PER_USE(bucket))
+        {
+            COPY_KEY_TO_OBJECT(result, bucket->keys[offset]);
+            PER_UNUSE(bucket);
+        }
+        Py_DECREF(bucket);
+    }
+    PER_UNUSE(self);
+    return result;
+}
+
+/*
+** _BTree_findRange
+**
+** Find the endpoints of the range selected by min, max, excludemin and
+** excludemax, as for keys().  self must be activated.  If the range is
+** non-empty, return 1 and store new references to its first and last
+** buckets, and the offsets in them, through the pointer arguments.  If
+** it's empty return 0, and on error return -1.
+*/
+static int
+_BTree_findRange(BTree *self, PyObject *min, PyObject *max,
+                 int excludemin, int excludemax,
+                 Bucket **lowbucket_p, int *lowoffset_p,
+                 Bucket **highbucket_p, int *highoffset_p)
 {
-    PyObject *min = Py_None;
-    PyObject *max = Py_None;
-    int excludemin = 0;
-    int excludemax = 0;
     int rc;
     Bucket *lowbucket = NULL;
     Bucket *highbucket = NULL;
     int lowoffset;
     int highoffset;
-    PyObject *result;
-
-    if (args)
-    {
-        if (! PyArg_ParseTupleAndKeywords(args, kw, "|OOii", search_keywords,
-                                        &min,
-                                        &max,
-                                        &excludemin,
-                                        &excludemax))
-        return NULL;
-    }
-
-    UNLESS (PER_USE(self))
-        return NULL;
 
     UNLESS (self->data && self->len)
-        goto empty;
+        return 0;
 
     /* Find the low range */
     if (min != Py_None)
     {
         if ((rc = BTree_findRangeEnd(self, min, 1, excludemin,
                                     &lowbucket, &lowoffset)) <= 0)
-        {
-            if (rc < 0)
-                goto err;
-            goto empty;
-        }
+            return rc;
     }
     else
     {
@@ -1724,18 +2141,18 @@ BTree_rangeSearch(BTree *self, PyObject *args, PyObject *kw, char type)
         {
             int bucketlen;
             UNLESS (PER_USE(lowbucket))
-                goto err;
+                return -1;
             bucketlen = lowbucket->len;
             PER_UNUSE(lowbucket);
             if (bucketlen > 1)
                 lowoffset = 1;
             else if (self->len < 2)
-                goto empty;
+                return 0;
             else
             {    /* move to first item in next bucket */
                 Bucket *next;
                 UNLESS (PER_USE(lowbucket))
-                    goto err;
+                    return -1;
                 next = lowbucket->next;
                 PER_UNUSE(lowbucket);
                 assert(next != NULL);
@@ -1754,9 +2171,7 @@ BTree_rangeSearch(BTree *self, PyObject *args, PyObject *kw, char type)
                                     &highbucket, &highoffset)) <= 0)
         {
             Py_DECREF(lowbucket);
-            if (rc < 0)
-                goto err;
-            goto empty;
+            return rc;
         }
     }
     else
@@ -1784,7 +2199,7 @@ BTree_rangeSearch(BTree *self, PyObject *args, PyObject *kw, char type)
                 if (status < 0)
                 {
                     Py_DECREF(lowbucket);
-                    goto err;
+                    return -1;
                 }
                 assert(status > 0);
                 Py_INCREF(highbucket);
@@ -1834,28 +2249,303 @@ BTree_rangeSearch(BTree *self, PyObject *args, PyObject *kw, char type)
                 goto empty_and_decref_buckets;
     }
 
+    *lowbucket_p = lowbucket;
+    *lowoffset_p = lowoffset;
+    *highbucket_p = highbucket;
+    *highoffset_p = highoffset;
+    return 1;
+
+err_and_decref_buckets:
+    Py_DECREF(lowbucket);
+    Py_DECREF(highbucket);
+    return -1;
+
+empty_and_decref_buckets:
+    Py_DECREF(lowbucket);
+    Py_DECREF(highbucket);
+    return 0;
+}
+
+/*
+** BTree_rangeSearch
+**
+** Generates a BTreeItems object based on the two indexes passed in,
+** being the range between them.
+**
+*/
+static PyObject *
+BTree_rangeSearch(BTree *self, PyObject *args, PyObject *kw, char type)
+{
+    PyObject *min = Py_None;
+    PyObject *max = Py_None;
+    int excludemin = 0;
+    int excludemax = 0;
+    int rc;
+    Bucket *lowbucket = NULL;
+    Bucket *highbucket = NULL;
+    int lowoffset;
+    int highoffset;
+    PyObject *result;
+
+    if (args)
+    {
+        if (! PyArg_ParseTupleAndKeywords(args, kw, "|OOii", search_keywords,
+                                        &min,
+                                        &max,
+                                        &excludemin,
+                                        &excludemax))
+        return NULL;
+    }
+
+    UNLESS (PER_USE(self))
+        return NULL;
+
+    rc = _BTree_findRange(self, min, max, excludemin, excludemax,
+                          &lowbucket, &lowoffset, &highbucket, &highoffset);
     PER_UNUSE(self);
+    if (rc < 0)
+        return NULL;
+    if (rc == 0)
+        return newBTreeItems(type, 0, 0, 0, 0);
 
     result = newBTreeItems(type, lowbucket, lowoffset, highbucket, highoffset);
     Py_DECREF(lowbucket);
     Py_DECREF(highbucket);
+    if (result != NULL && ITEMS(result)->firstbucket)
+    {
+        /* Let a slice of a counted tree seek by rank. */
+        rc = _BTree_counted(self);
+        if (rc < 0)
+        {
+            Py_DECREF(result);
+            return NULL;
+        }
+        if (rc)
+        {
+            Py_INCREF(self);
+            ITEMS(result)->tree = self;
+        }
+    }
     return result;
+}
+
+/*
+** BTree_count
+**
+** Return the number of keys that keys() would return for the same
+** arguments, without creating the items.  A counted BTree computes this
+** from the ranks of the endpoints; otherwise the buckets in the range are
+** walked.
+*/
+static PyObject *
+BTree_count(BTree *self, PyObject *args, PyObject *kw)
+{
+    PyObject *min = Py_None;
+    PyObject *max = Py_None;
+    int excludemin = 0;
+    int excludemax = 0;
+    int rc;
+    Bucket *lowbucket = NULL;
+    Bucket *highbucket = NULL;
+    Bucket *b, *next;
+    int lowoffset;
+    int highoffset;
+    Py_ssize_t start, end;
+
+    if (! PyArg_ParseTupleAndKeywords(args, kw, "|OOii", search_keywords,
+                                      &min,
+                                      &max,
+                                      &excludemin,
+                                      &excludemax))
+        return NULL;
+
+    rc = _BTree_counted(self);
+    if (rc < 0)
+        return NULL;
+
+    PER_USE_OR_RETURN(self, NULL);
+
+    if (rc && self->len)
+    {
+        KEY_TYPE key;
+        int copied = 1;
+
+        if (min == Py_None)
+            start = excludemin ? 1 : 0;
+        else
+        {
+            COPY_KEY_FROM_ARG(key, min, copied);
+            UNLESS (copied)
+                goto err;
+            start = _BTree_rank(self, key, excludemin);
+            if (start < 0)
+                goto err;
+        }
+        if (max == Py_None)
+        {
+            end = _BTree_countSum(self);
+            if (excludemax && end)
+                end--;
+        }
+        else
+        {
+            COPY_KEY_FROM_ARG(key, max, copied);
+            UNLESS (copied)
+                goto err;
+            end = _BTree_rank(self, key, ! excludemax);
+            if (end < 0)
+                goto err;
+        }
+        PER_UNUSE(self);
+        return PyLong_FromSsize_t(end > start ? end - start : 0);
+    }
+
+    rc = _BTree_findRange(self, min, max, excludemin, excludemax,
+                          &lowbucket, &lowoffset, &highbucket, &highoffset);
+    PER_UNUSE(self);
+    if (rc <= 0)
+        return rc < 0 ? NULL : PyLong_FromLong(0);
+
+    end = highoffset + 1 - lowoffset;
+    for (b = lowbucket; b != highbucket; b = next)
+    {
+        if (b == NULL)
+        {
+            PyErr_SetString(PyExc_AssertionError,
+                            "BTree bucket chain is damaged");
+            goto err_and_decref_buckets;
+        }
+        UNLESS (PER_USE(b))
+            goto err_and_decref_buckets;
+        end += b->len;
+        next = b->next;
+        PER_UNUSE(b);
+    }
+    Py_DECREF(lowbucket);
+    Py_DECREF(highbucket);
+    return PyLong_FromSsize_t(end);
 
 err_and_decref_buckets:
     Py_DECREF(lowbucket);
     Py_DECREF(highbucket);
+    return NULL;
 
 err:
     PER_UNUSE(self);
     return NULL;
+}
 
-empty_and_decref_buckets:
-    Py_DECREF(lowbucket);
-    Py_DECREF(highbucket);
+/*
+** BTree_to_arrays
+**
+** Return a 2-tuple of array.array objects holding the keys and values
+** that items() would return for the same arguments.  Each bucket in the
+** range is copied with memcpy instead of creating an object per item.
+** Only families with native keys and values support this.
+*/
+static PyObject *
+BTree_to_arrays(BTree *self, PyObject *args, PyObject *kw)
+{
+#if defined(KEY_TYPECODE) && defined(VALUE_TYPECODE)
+    PyObject *min = Py_None;
+    PyObject *max = Py_None;
+    int excludemin = 0;
+    int excludemax = 0;
+    int rc;
+    Bucket *lowbucket = NULL;
+    Bucket *highbucket = NULL;
+    Bucket *b, *next;
+    int lowoffset;
+    int highoffset;
+    Py_ssize_t n = 0, filled = 0;
+    PyObject *keys = NULL, *values = NULL, *result = NULL;
+
+    if (! PyArg_ParseTupleAndKeywords(args, kw, "|OOii", search_keywords,
+                                      &min,
+                                      &max,
+                                      &excludemin,
+                                      &excludemax))
+        return NULL;
 
-empty:
+    PER_USE_OR_RETURN(self, NULL);
+    rc = _BTree_findRange(self, min, max, excludemin, excludemax,
+                          &lowbucket, &lowoffset, &highbucket, &highoffset);
     PER_UNUSE(self);
-    return newBTreeItems(type, 0, 0, 0, 0);
+    if (rc < 0)
+        return NULL;
+
+    if (rc)
+    {
+        /* Size the result, then copy a slice of each bucket into it. */
+        n = highoffset + 1 - lowoffset;
+        for (b = lowbucket; b != highbucket; b = next)
+        {
+            if (b == NULL)
+            {
+                PyErr_SetString(PyExc_AssertionError,
+                                "BTree bucket chain is damaged");
+                goto done;
+            }
+            UNLESS (PER_USE(b))
+                goto done;
+            n += b->len;
+            next = b->next;
+            PER_UNUSE(b);
+        }
+    }
+
+    keys = PyBytes_FromStringAndSize(NULL, n * sizeof(KEY_TYPE));
+    values = PyBytes_FromStringAndSize(NULL, n * sizeof(VALUE_TYPE));
+    if (keys == NULL || values == NULL)
+        goto done;
+
+    for (b = rc ? lowbucket : NULL; b != NULL; b = next)
+    {
+        int start = b == lowbucket ? lowoffset : 0;
+        int end;
+
+        UNLESS (PER_USE(b))
+            goto done;
+        end = b == highbucket ? highoffset + 1 : b->len;
+        if (end > b->len || filled + (end - start) > n)
+        {
+            PER_UNUSE(b);
+            PyErr_SetString(PyExc_RuntimeError,
+                            "the bucket being copied changed size");
+            goto done;
+        }
+        if (end > start)
+        {
+            memcpy(PyBytes_AS_STRING(keys) + filled * sizeof(KEY_TYPE),
+                   b->keys + start, (end - start) * sizeof(KEY_TYPE));
+            memcpy(PyBytes_AS_STRING(values) + filled * sizeof(VALUE_TYPE),
+                   b->values + start, (end - start) * sizeof(VALUE_TYPE));
+            filled += end - start;
+        }
+        next = b == highbucket ? NULL : b->next;
+        PER_UNUSE(b);
+    }
+
+    result = PyTuple_New(2);
+    if (result == NULL)
+        goto done;
+    PyTuple_SET_ITEM(result, 0, BTree_BytesToArray(KEY_TYPECODE, keys));
+    PyTuple_SET_ITEM(result, 1, BTree_BytesToArray(VALUE_TYPECODE, values));
+    if (PyTuple_GET_ITEM(result, 0) == NULL
+        || PyTuple_GET_ITEM(result, 1) == NULL)
+        Py_CLEAR(result);
+
+done:
+    Py_XDECREF(keys);
+    Py_XDECREF(values);
+    Py_XDECREF(lowbucket);
+    Py_XDECREF(highbucket);
+    return result;
+#else
+    PyErr_SetString(PyExc_TypeError,
+                    "keys and values must be native numbers");
+    return NULL;
+#endif
 }
 
 /*
@@ -1886,21 +2576,15 @@ BTree_items(BTree *self, PyObject *args, PyObject *kw)
 }
 
 static PyObject *
-BTree_byValue(BTree *self, PyObject *omin)
+_BTree_byValue(BTree *self, VALUE_TYPE min)
 {
     PyObject *r=0, *o=0, *item=0;
-    VALUE_TYPE min;
     VALUE_TYPE v;
-    int copied=1;
     SetIteration it = {0, 0, 1};
 
     UNLESS (PER_USE(self))
         return NULL;
 
-    COPY_VALUE_FROM_ARG(min, omin, copied);
-    UNLESS(copied)
-        return NULL;
-
     UNLESS (r=PyList_New(0))
         goto err;
 
@@ -1913,7 +2597,11 @@ BTree_byValue(BTree *self, PyObject *omin)
 
     while (it.position >= 0)
     {
-        if (TEST_VALUE(it.value, min) >= 0)
+        if (TEST_VALUE(it.value, min) >= 0
+#ifdef VALUE_IS_NAN
+            && !VALUE_IS_NAN(it.value)
+#endif
+            )
         {
             UNLESS (item = PyTuple_New(2))
                 goto err;
@@ -1966,6 +2654,71 @@ err:
     return NULL;
 }
 
+static PyObject *
+_BTree_top(BTree *self, PyObject *args, PyObject *kw, int is_topk)
+{
+    TopHeap heap = {NULL, 0, 0, 0};
+    VALUE_TYPE min;
+    int has_min, rc = 0;
+    Bucket *bucket, *next;
+    PyObject *r = NULL;
+
+    if (_parse_top_args(args, kw, is_topk, &min, &has_min, &heap.limit) < 0)
+        return NULL;
+    if (heap.limit < 0)
+    {
+        /* byValue without a limit */
+        r = _BTree_byValue(self, min);
+        DECREF_VALUE(min);
+        return r;
+    }
+
+    UNLESS (PER_USE(self))
+        goto done;
+    bucket = self->firstbucket;
+    Py_XINCREF(bucket);
+    PER_UNUSE(self);
+
+    while (bucket != NULL && rc >= 0)
+    {
+        UNLESS (PER_USE(bucket))
+        {
+            Py_DECREF(bucket);
+            goto done;
+        }
+        rc = _bucket_offer_values(bucket, &heap,
+                                  has_min ? &min : NULL, !is_topk);
+        next = bucket->next;
+        Py_XINCREF(next);
+        PER_UNUSE(bucket);
+        Py_DECREF(bucket);
+        bucket = next;
+    }
+    Py_XDECREF(bucket);
+    if (rc >= 0)
+        r = _TopHeap_result(&heap);
+
+done:
+    _TopHeap_clear(&heap);
+    if (has_min)
+    {
+        DECREF_VALUE(min);
+    }
+    return r;
+}
+
+static PyObject *
+BTree_byValue(BTree *self, PyObject *args, PyObject *kw)
+{
+    return _BTree_top(self, args, kw, 0);
+}
+
+static PyObject *
+BTree_topk(BTree *self, PyObject *args, PyObject *kw)
+{
+    return _BTree_top(self, args, kw, 1);
+}
+
 /*
 ** BTree_getm
 */
@@ -1985,6 +2738,451 @@ BTree_getm(BTree *self, PyObject *args)
     return d;
 }
 
+/*
+** Batch lookups: get_many() and contains_many()
+**
+** The keys to look up are gathered into an array of probes.  For the
+** families with C keys the probes are sorted, so that each lookup usually
+** lands in the bucket already in hand, or the one after it, instead of
+** descending from the root again.  The bucket walk is also correct for
+** unsorted probes, just slower.
+*/
+
+typedef struct {
+    KEY_TYPE key;
+    Py_ssize_t index;   /* position of the key in the input */
+} BatchProbe;
+
+typedef struct {
+    BatchProbe *probes;
+    Py_ssize_t nprobes;
+    Py_ssize_t len;         /* number of keys in the input */
+    int native;             /* true if the input was a buffer of C keys */
+    PyObject *seq;          /* keeps the input keys alive */
+    /* Where results go; each is optional. */
+    char *found;            /* found[index] = 1 */
+    PyObject *list;         /* list[index] = value */
+#ifdef VALUE_TYPECODE
+    VALUE_TYPE *values;     /* values[index] = value */
+#endif
+} BatchLookup;
+
+#ifndef KEY_TYPE_IS_PYOBJECT
+static int
+_batch_probe_compare(const void *a, const void *b)
+{
+    int cmp;
+
+    TEST_KEY_SET_OR(cmp, ((const BatchProbe *)a)->key,
+                    ((const BatchProbe *)b)->key) {}
+    return cmp;
+}
+#endif
+
+/* Gather the probes for keys, which may be a buffer of C keys (for the
+ * families that have them) or any iterable.  Keys that can't be converted
+ * to the key type can't be present, so they get no probe.  Return 0 on
+ * success, -1 on error.
+ */
+static int
+_batch_init(BatchLookup *batch, PyObject *keys)
+{
+    Py_ssize_t i;
+    int copied;
+
+#ifdef KEY_TYPECODE
+    if (PyObject_CheckBuffer(keys))
+    {
+        Py_buffer view;
+
+        if (BTree_GetNativeBuffer(keys, &view, KEY_TYPECODE,
+                                  sizeof(KEY_TYPE)) < 0)
+            return -1;
+        batch->native = 1;
+        batch->len = view.len / sizeof(KEY_TYPE);
+        batch->probes = BTree_Malloc(
+            sizeof(BatchProbe) * (batch->len ? batch->len : 1));
+        if (batch->probes == NULL)
+        {
+            PyBuffer_Release(&view);
+            return -1;
+        }
+        for (i = 0; i < batch->len; i++)
+        {
+            BatchProbe *probe = batch->probes + batch->nprobes;
+
+            /* Byte buffers needn't be aligned for KEY_TYPE. */
+            memcpy(&probe->key,
+                   (char *)view.buf + i * sizeof(KEY_TYPE), sizeof(KEY_TYPE));
+#ifdef KEY_IS_NAN
+            /* Like keys that can't be converted, NaN can't be present. */
+            if (KEY_IS_NAN(probe->key))
+                continue;
+#endif
+            probe->index = i;
+            batch->nprobes++;
+        }
+        PyBuffer_Release(&view);
+    }
+    else
+#endif
+    {
+        batch->seq = PySequence_Fast(keys, "expected an iterable of keys");
+        if (batch->seq == NULL)
+            return -1;
+        batch->len = PySequence_Fast_GET_SIZE(batch->seq);
+        batch->probes = BTree_Malloc(
+            sizeof(BatchProbe) * (batch->len ? batch->len : 1));
+        if (batch->probes == NULL)
+            return -1;
+        for (i = 0; i < batch->len; i++)
+        {
+            BatchProbe *probe = batch->probes + batch->nprobes;
+
+            copied = 1;
+            COPY_KEY_FROM_ARG(probe->key,
+                              PySequence_Fast_GET_ITEM(batch->seq, i),
+                              copied);
+            UNLESS (copied)
+            {
+                if (!PyErr_ExceptionMatches(PyExc_TypeError))
+                    return -1;
+                PyErr_Clear();
+                continue;
+            }
+            probe->index = i;
+            batch->nprobes++;
+        }
+    }
+#ifndef KEY_TYPE_IS_PYOBJECT
+    qsort(batch->probes, batch->nprobes, sizeof(BatchProbe),
+          _batch_probe_compare);
+#endif
+    return 0;
+}
+
+static void
+_batch_fini(BatchLookup *batch)
+{
+    if (batch->probes)
+        free(batch->probes);
+    Py_XDECREF(batch->seq);
+}
+
+/* Look up probe in the activated bucket, recording the value if found.
+ * Return 0 on success, -1 on error.
+ */
+static int
+_batch_search_bucket(BatchLookup *batch, BatchProbe *probe, Bucket *bucket)
+{
+    int i, cmp;
+
+    BUCKET_SEARCH(i, cmp, bucket, probe->key, return -1);
+    if (cmp != 0)
+        return 0;
+    if (batch->found)
+        batch->found[probe->index] = 1;
+    if (batch->list)
+    {
+        PyObject *value;
+
+        COPY_VALUE_TO_OBJECT(value, bucket->values[i]);
+        if (value == NULL)
+            return -1;
+        if (PyList_SetItem(batch->list, probe->index, value) < 0)
+            return -1;
+    }
+#ifdef VALUE_TYPECODE
+    if (batch->values)
+        COPY_VALUE(batch->values[probe->index], bucket->values[i]);
+#endif
+    return 0;
+}
+
+static int
+_bucket_lookupBatch(Bucket *self, BatchLookup *batch)
+{
+    Py_ssize_t i;
+    int result = 0;
+
+    PER_USE_OR_RETURN(self, -1);
+    for (i = 0; i < batch->nprobes; i++)
+    {
+        if (_batch_search_bucket(batch, batch->probes + i, self) < 0)
+        {
+            result = -1;
+            break;
+        }
+    }
+    PER_UNUSE(self);
+    return result;
+}
+
+/* Return the bucket of the non-empty BTree self that would hold key,
+ * activated and with a new reference, or NULL on error.
+ */
+static Bucket *
+_BTree_bucketFor(BTree *self, KEY_TYPE key)
+{
+    Sized *child;
+    int i;
+
+    PER_USE_OR_RETURN(self, NULL);
+    for (;;)
+    {
+        BTREE_SEARCH(i, self, key, goto err);
+        child = self->data[i].child;
+        if (!SameType_Check(self, child))
+            break;
+        PER_UNUSE(self);
+        self = BTREE(child);
+        PER_USE_OR_RETURN(self, NULL);
+    }
+    Py_INCREF(child);
+    PER_UNUSE(self);
+    if (!PER_USE(child))
+    {
+        Py_DECREF(child);
+        return NULL;
+    }
+    return BUCKET(child);
+
+err:
+    PER_UNUSE(self);
+    return NULL;
+}
+
+/* Compare key with the keys of the activated bucket: -1 if it sorts
+ * before the first key (or the bucket is empty), 1 if after the last, 0
+ * otherwise.  Return -2 on error.
+ */
+static int
+_batch_bucket_compare(Bucket *bucket, KEY_TYPE key)
+{
+    int cmp;
+
+    if (bucket->len == 0)
+        return -1;
+    TEST_KEY_SET_OR(cmp, key, bucket->keys[0]) return -2;
+    if (cmp < 0)
+        return -1;
+    TEST_KEY_SET_OR(cmp, key, bucket->keys[bucket->len - 1]) return -2;
+    return cmp > 0;
+}
+
+static void
+_batch_release_bucket(Bucket *bucket)
+{
+    PER_UNUSE(bucket);
+    Py_DECREF(bucket);
+}
+
+static int
+_BTree_lookupBatch(BTree *self, BatchLookup *batch)
+{
+    Bucket *bucket = NULL, *next;
+    BatchProbe *probe, *end = batch->probes + batch->nprobes;
+    int where, result = -1;
+
+    PER_USE_OR_RETURN(self, -1);
+    if (self->len == 0)
+    {
+        PER_UNUSE(self);
+        return 0;
+    }
+
+    for (probe = batch->probes; probe < end; probe++)
+    {
+        where = -1;
+        if (bucket != NULL)
+        {
+            where = _batch_bucket_compare(bucket, probe->key);
+            if (where == -2)
+                goto Done;
+        }
+        if (where > 0)
+        {
+            /* Past the bucket in hand: try the next one before
+             * descending from the root again.
+             */
+            next = bucket->next;
+            if (next == NULL)
+                continue;       /* past the largest key in the tree */
+            Py_INCREF(next);
+            _batch_release_bucket(bucket);
+            bucket = next;
+            if (!PER_USE(bucket))
+            {
+                Py_DECREF(bucket);
+                bucket = NULL;
+                goto Done;
+            }
+            where = _batch_bucket_compare(bucket, probe->key);
+            if (where == -2)
+                goto Done;
+            if (where < 0 && bucket->len > 0)
+                where = 0;      /* falls between the two buckets */
+        }
+        if (where != 0)
+        {
+            if (bucket != NULL)
+                _batch_release_bucket(bucket);
+            bucket = _BTree_bucketFor(self, probe->key);
+            if (bucket == NULL)
+                goto Done;
+        }
+        if (_batch_search_bucket(batch, probe, bucket) < 0)
+            goto Done;
+    }
+    result = 0;
+
+Done:
+    if (bucket != NULL)
+        _batch_release_bucket(bucket);
+    PER_UNUSE(self);
+    return result;
+}
+
+/* The shared implementation of get_many() and contains_many() for
+ * buckets, sets, BTrees and TreeSets.
+ */
+static PyObject *
+_batch_lookup(PyObject *self, PyObject *keys, PyObject *failobj,
+              int contains, int is_tree)
+{
+    BatchLookup batch;
+    PyObject *result = NULL;
+    Py_ssize_t i;
+    int status;
+
+    memset(&batch, 0, sizeof(batch));
+    if (_batch_init(&batch, keys) < 0)
+        goto Done;
+
+    if (contains)
+    {
+        batch.found = BTree_Malloc(batch.len ? batch.len : 1);
+        if (batch.found == NULL)
+            goto Done;
+        memset(batch.found, 0, batch.len);
+    }
+#ifdef VALUE_TYPECODE
+    else if (batch.native)
+    {
+        /* A buffer of C keys gets an array of C values back, so the
+         * default must be a value too; None stands for zero.
+         */
+        VALUE_TYPE value = 0;
+
+        if (failobj != Py_None)
+        {
+            status = 1;
+            COPY_VALUE_FROM_ARG(value, failobj, status);
+            UNLESS (status)
+                goto Done;
+        }
+        batch.values = BTree_Malloc(
+            sizeof(VALUE_TYPE) * (batch.len ? batch.len : 1));
+        if (batch.values == NULL)
+            goto Done;
+        for (i = 0; i < batch.len; i++)
+            batch.values[i] = value;
+    }
+#endif
+    else
+    {
+        batch.list = PyList_New(batch.len);
+        if (batch.list == NULL)
+            goto Done;
+        for (i = 0; i < batch.len; i++)
+        {
+            Py_INCREF(failobj);
+            PyList_SET_ITEM(batch.list, i, failobj);
+        }
+    }
+
+    if (is_tree)
+        status = _BTree_lookupBatch(BTREE(self), &batch);
+    else
+        status = _bucket_lookupBatch(BUCKET(self), &batch);
+    if (status < 0)
+        goto Done;
+
+    if (batch.list)
+    {
+        result = batch.list;
+        batch.list = NULL;
+    }
+#ifdef VALUE_TYPECODE
+    else if (batch.values)
+        result = BTree_NewArray(VALUE_TYPECODE, (char *)batch.values,
+                                sizeof(VALUE_TYPE) * batch.len);
+#endif
+#ifdef KEY_TYPECODE
+    else if (batch.native)
+        result = BTree_NewArray('B', batch.found, batch.len);
+#endif
+    else
+    {
+        result = PyList_New(batch.len);
+        if (result == NULL)
+            goto Done;
+        for (i = 0; i < batch.len; i++)
+        {
+            PyObject *flag = batch.found[i] ? Py_True : Py_False;
+            Py_INCREF(flag);
+            PyList_SET_ITEM(result, i, flag);
+        }
+    }
+
+Done:
+    Py_XDECREF(batch.list);
+    if (batch.found)
+        free(batch.found);
+#ifdef VALUE_TYPECODE
+    if (batch.values)
+        free(batch.values);
+#endif
+    _batch_fini(&batch);
+    return result;
+}
+
+static char *get_many_kwlist[] = {"keys", "default", NULL};
+
+static PyObject *
+BTree_get_many(BTree *self, PyObject *args, PyObject *kw)
+{
+    PyObject *keys, *failobj = Py_None;
+
+    UNLESS (PyArg_ParseTupleAndKeywords(args, kw, "O|O:get_many",
+                                        get_many_kwlist, &keys, &failobj))
+        return NULL;
+    return _batch_lookup((PyObject *)self, keys, failobj, 0, 1);
+}
+
+static PyObject *
+BTree_contains_many(BTree *self, PyObject *keys)
+{
+    return _batch_lookup((PyObject *)self, keys, Py_None, 1, 1);
+}
+
+static PyObject *
+bucket_get_many(Bucket *self, PyObject *args, PyObject *kw)
+{
+    PyObject *keys, *failobj = Py_None;
+
+    UNLESS (PyArg_ParseTupleAndKeywords(args, kw, "O|O:get_many",
+                                        get_many_kwlist, &keys, &failobj))
+        return NULL;
+    return _batch_lookup((PyObject *)self, keys, failobj, 0, 0);
+}
+
+static PyObject *
+bucket_contains_many(Bucket *self, PyObject *keys)
+{
+    return _batch_lookup((PyObject *)self, keys, Py_None, 1, 0);
+}
+
 static PyObject *
 BTree_setdefault(BTree *self, PyObject *args)
 {
@@ -2014,10 +3212,6 @@ BTree_setdefault(BTree *self, PyObject *args)
     return value;
 }
 
-/* forward declaration */
-static Py_ssize_t
-BTree_length_or_nonzero(BTree *self, int nonzero);
-
 static PyObject *
 BTree_pop(BTree *self, PyObject *args)
 {
@@ -2155,6 +3349,553 @@ BTree_addUnique(BTree *self, PyObject *args)
     return PyLong_FromLong(grew);
 }
 
+/**************************************************************************/
+/* Bulk loading. */
+
+/* Fill the empty BTree node 'self' with the n nodes in 'children', whose
+ * first buckets are given by 'firsts'.  The references to the children are
+ * stolen, even on error.
+ *
+ * Return:
+ *    -1    error
+ *     0    OK
+ */
+static int
+BTree_fillFromLevel(BTree *self, Sized **children, Bucket **firsts, int n)
+{
+    int i;
+
+    self->data = BTree_Malloc(sizeof(BTreeItem) * n);
+    if (self->data == NULL)
+    {
+        for (i = 0; i < n; i++)
+            Py_DECREF(children[i]);
+        return -1;
+    }
+
+    for (i = 0; i < n; i++)
+    {
+        self->data[i].child = children[i];
+        self->data[i].count = _BTree_childCount(self, children[i]);
+        if (i)
+        {
+            COPY_KEY(self->data[i].key, firsts[i]->keys[0]);
+            INCREF_KEY(self->data[i].key);
+        }
+    }
+    self->size = self->len = n;
+    self->firstbucket = firsts[0];
+    Py_INCREF(self->firstbucket);
+    return 0;
+}
+
+/* Move keys (and values) from the end of 'self' to the front of 'next' so
+ * that the two buckets end up evenly filled.  'next' must have room for
+ * half of their combined length.
+ */
+static void
+bucket_balanceWithNext(Bucket *self, Bucket *next)
+{
+    int total = self->len + next->len;
+    int moved = self->len - total / 2;
+
+    if (moved <= 0)
+        return;
+
+    memmove(next->keys + moved, next->keys, sizeof(KEY_TYPE) * next->len);
+    memcpy(next->keys, self->keys + self->len - moved,
+           sizeof(KEY_TYPE) * moved);
+    if (self->values)
+    {
+        memmove(next->values + moved, next->values,
+                sizeof(VALUE_TYPE) * next->len);
+        memcpy(next->values, self->values + self->len - moved,
+               sizeof(VALUE_TYPE) * moved);
+    }
+    self->len -= moved;
+    next->len += moved;
+}
+
+/* Compute the number of items per bucket, and of children per interior
+ * node, that fill the nodes of the BTree self to fill_factor.  Return 0 on
+ * success or -1 on error.
+ */
+static int
+_BTree_fillSizes(BTree *self, double fill_factor,
+                 int *leaf_fill, int *internal_fill)
+{
+    long max_size;
+
+    if (!(fill_factor > 0.0 && fill_factor <= 1.0))
+    {
+        PyErr_SetString(PyExc_ValueError,
+                        "fill_factor must be in the range (0, 1]");
+        return -1;
+    }
+
+    max_size = _max_leaf_size(self);
+    if (max_size < 0)
+        return -1;
+    *leaf_fill = (int)(max_size * fill_factor);
+    if (*leaf_fill < 1)
+        *leaf_fill = 1;
+    max_size = _max_internal_size(self);
+    if (max_size < 0)
+        return -1;
+    *internal_fill = (int)(max_size * fill_factor);
+    if (*internal_fill < 2)
+        *internal_fill = 2;
+    return 0;
+}
+
+/* Build the interior nodes of result, a new empty BTree of the given type,
+ * above the n > 0 linked buckets in children, with at most internal_fill
+ * children per node.  This steals the references in children, but not the
+ * array itself.  Return 0 on success or -1 on error.
+ */
+static int
+_BTree_buildInterior(BTree *result, PyObject *type, Sized **children, int n,
+                     int internal_fill)
+{
+    Bucket **firsts;
+    int i;
+
+    /* Don't leave a nearly empty bucket at the end. */
+    if (n > 1)
+        bucket_balanceWithNext(BUCKET(children[n - 2]),
+                               BUCKET(children[n - 1]));
+
+    firsts = BTree_Malloc(sizeof(Bucket *) * n);
+    if (firsts == NULL)
+    {
+        for (i = 0; i < n; i++)
+            Py_DECREF(children[i]);
+        return -1;
+    }
+    for (i = 0; i < n; i++)
+        firsts[i] = BUCKET(children[i]);
+
+    /* Build the interior levels, reusing the arrays in place:  the node
+     * built for children[start:start+count] is stored at index j <= start.
+     */
+    while (n > internal_fill)
+    {
+        int nnodes = (n + internal_fill - 1) / internal_fill;
+        int start = 0, j;
+
+        for (j = 0; j < nnodes; j++)
+        {
+            int count = n / nnodes + (j < n % nnodes);
+            BTree *node = BTREE(PyObject_CallObject(type, NULL));
+
+            if (node == NULL
+                || BTree_fillFromLevel(node, children + start,
+                                       firsts + start, count) < 0)
+            {
+                if (node == NULL)
+                {
+                    for (i = start; i < start + count; i++)
+                        Py_DECREF(children[i]);
+                }
+                Py_XDECREF(node);
+                /* Release the nodes already built and the rest of the
+                 * children not yet consumed. */
+                for (i = 0; i < j; i++)
+                    Py_DECREF(children[i]);
+                for (i = start + count; i < n; i++)
+                    Py_DECREF(children[i]);
+                free(firsts);
+                return -1;
+            }
+            children[j] = SIZED(node);
+            firsts[j] = firsts[start];
+            start += count;
+        }
+        n = nnodes;
+    }
+
+    i = BTree_fillFromLevel(result, children, firsts, n);
+    free(firsts);
+    return i;
+}
+
+/*
+ * Build a new tree of the given type from items sorted by key.  Buckets are
+ * packed left to right to fill_factor of the maximum leaf size and linked
+ * together, then each level of interior nodes is built above them.  This
+ * avoids the root-to-leaf search and the splits done by one-at-a-time
+ * insertion.
+ *
+ * If noval is true, the items are keys (TreeSet); otherwise they are
+ * (key, value) pairs, or a mapping with an items() method (BTree).
+ */
+static PyObject *
+_BTree_fromSorted(PyObject *type, PyObject *args, PyObject *kw, int noval)
+{
+    static char *kwlist[] = {"items", "fill_factor", NULL};
+    PyObject *items, *iter = NULL, *o, *k, *v;
+    double fill_factor = 1.0;
+    BTree *result = NULL;
+    Bucket *bucket = NULL;
+    Sized **children = NULL;
+    int n = 0, allocated = 0;
+    int leaf_fill, internal_fill;
+    int cmp, copied = 1;
+    int i;
+    KEY_TYPE key;
+    VALUE_TYPE value = {0};     /* squash nuisance warning */
+
+    if (!PyArg_ParseTupleAndKeywords(args, kw, "O|d:fromSorted", kwlist,
+                                     &items, &fill_factor))
+        return NULL;
+
+    result = BTREE(PyObject_CallObject(type, NULL));
+    if (result == NULL)
+        return NULL;
+    if (_BTree_fillSizes(result, fill_factor, &leaf_fill, &internal_fill) < 0)
+        goto err;
+
+    /* Same input handling as update_from_seq for mappings. */
+    if (!noval && (!PySequence_Check(items)
+                   || PyObject_HasAttrString(items, "items")))
+    {
+        PyObject *meth = PyObject_GetAttrString(items, "items");
+        if (meth == NULL)
+            goto err;
+        items = PyObject_CallObject(meth, NULL);
+        Py_DECREF(meth);
+        if (items == NULL)
+            goto err;
+        iter = PyObject_GetIter(items);
+        Py_DECREF(items);
+    }
+    else
+        iter = PyObject_GetIter(items);
+    if (iter == NULL)
+        goto err;
+
+    while ((o = PyIter_Next(iter)) != NULL)
+    {
+        k = o;
+        v = NULL;
+        if (!noval)
+        {
+            if (!PyTuple_Check(o) || PyTuple_GET_SIZE(o) != 2)
+            {
+                Py_DECREF(o);
+                PyErr_SetString(PyExc_TypeError,
+                                "Sequence must contain 2-item tuples");
+                goto err;
+            }
+            k = PyTuple_GET_ITEM(o, 0);
+            v = PyTuple_GET_ITEM(o, 1);
+        }
+
+        COPY_KEY_FROM_ARG(key, k, copied);
+        UNLESS (copied)
+        {
+            Py_DECREF(o);
+            goto err;
+        }
+#ifdef KEY_CHECK_ON_SET
+        if (!KEY_CHECK_ON_SET(k))
+        {
+            Py_DECREF(o);
+            goto err;
+        }
+#endif
+        if (v)
+        {
+            COPY_VALUE_FROM_ARG(value, v, copied);
+            UNLESS (copied)
+            {
+                Py_DECREF(o);
+                goto err;
+            }
+        }
+
+        if (bucket)
+        {
+            TEST_KEY_SET_OR(cmp, bucket->keys[bucket->len - 1], key)
+            {
+                Py_DECREF(o);
+                goto err;
+            }
+            if (cmp >= 0)
+            {
+                Py_DECREF(o);
+                PyErr_SetString(PyExc_ValueError,
+                                "fromSorted() requires strictly "
+                                "increasing keys");
+                goto err;
+            }
+        }
+
+        if (bucket == NULL || bucket->len == leaf_fill)
+        {
+            Bucket *next;
+
+            if (n == allocated)
+            {
+                Sized **c;
+                allocated = allocated ? allocated * 2 : 16;
+                c = BTree_Realloc(children, sizeof(Sized *) * allocated);
+                if (c == NULL)
+                {
+                    Py_DECREF(o);
+                    goto err;
+                }
+                children = c;
+            }
+
+            next = BUCKET(BTree_newBucket(result));
+            if (next == NULL || Bucket_grow(next, leaf_fill, noval) < 0)
+            {
+                Py_XDECREF(next);
+                Py_DECREF(o);
+                goto err;
+            }
+            children[n++] = SIZED(next);
+            if (bucket)
+            {
+                Py_INCREF(next);
+                bucket->next = next;
+            }
+            bucket = next;
+        }
+
+        COPY_KEY(bucket->keys[bucket->len], key);
+        INCREF_KEY(bucket->keys[bucket->len]);
+        if (v)
+        {
+            COPY_VALUE(bucket->values[bucket->len], value);
+            INCREF_VALUE(bucket->values[bucket->len]);
+        }
+        bucket->len++;
+        Py_DECREF(o);
+    }
+    if (PyErr_Occurred())
+        goto err;
+    Py_CLEAR(iter);
+
+    if (n > 0)
+    {
+        i = _BTree_buildInterior(result, type, children, n, internal_fill);
+        n = 0;
+        if (i < 0)
+            goto err;
+    }
+
+    free(children);
+    return OBJECT(result);
+
+err:
+    for (i = 0; i < n; i++)
+        Py_DECREF(children[i]);
+    free(children);
+    Py_XDECREF(iter);
+    Py_XDECREF(result);
+    return NULL;
+}
+
+static PyObject *
+BTree_fromSorted(PyObject *type, PyObject *args, PyObject *kw)
+{
+    return _BTree_fromSorted(type, args, kw, 0);
+}
+
+#if defined(KEY_TYPECODE) && defined(VALUE_TYPECODE)
+/* Order probes by key, and equal keys by their position in the input. */
+static int
+_from_arrays_compare(const void *a, const void *b)
+{
+    int cmp = _batch_probe_compare(a, b);
+
+    if (cmp == 0)
+    {
+        Py_ssize_t x = ((const BatchProbe *)a)->index;
+        Py_ssize_t y = ((const BatchProbe *)b)->index;
+        cmp = x < y ? -1 : x > y;
+    }
+    return cmp;
+}
+#endif
+
+/*
+ * Build a new BTree of the given type from two buffers of native keys and
+ * values.  The formats are checked once, and if the keys aren't strictly
+ * increasing, (key, position) pairs are sorted so that the last value
+ * given for a key wins, as for update().  Buckets are then filled with
+ * memcpy (or a gather through the sorted positions), and the interior
+ * nodes built as for fromSorted().
+ */
+static PyObject *
+BTree_from_arrays(PyObject *type, PyObject *args, PyObject *kw)
+{
+#if defined(KEY_TYPECODE) && defined(VALUE_TYPECODE)
+    static char *kwlist[] = {"keys", "values", "fill_factor", NULL};
+    PyObject *keys_arg, *values_arg;
+    double fill_factor = 1.0;
+    Py_buffer keys_view, values_view;
+    KEY_TYPE *keys;
+    VALUE_TYPE *values;
+    void *keys_copy = NULL, *values_copy = NULL;
+    BatchProbe *order = NULL;
+    BTree *result = NULL;
+    Bucket *bucket = NULL;
+    Sized **children = NULL;
+    Py_ssize_t len, i, count;
+    int leaf_fill, internal_fill;
+    int n = 0, nbuckets, cmp;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kw, "OO|d:from_arrays", kwlist,
+                                     &keys_arg, &values_arg, &fill_factor))
+        return NULL;
+
+    if (BTree_GetNativeBuffer(keys_arg, &keys_view, KEY_TYPECODE,
+                              sizeof(KEY_TYPE)) < 0)
+        return NULL;
+    if (BTree_GetNativeBuffer(values_arg, &values_view, VALUE_TYPECODE,
+                              sizeof(VALUE_TYPE)) < 0)
+    {
+        PyBuffer_Release(&keys_view);
+        return NULL;
+    }
+    len = keys_view.len / sizeof(KEY_TYPE);
+    if (values_view.len / (Py_ssize_t)sizeof(VALUE_TYPE) != len)
+    {
+        PyErr_SetString(PyExc_ValueError,
+                        "keys and values must have the same length");
+        goto err;
+    }
+    keys = BTree_AlignedItems(&keys_view, sizeof(KEY_TYPE), &keys_copy);
+    if (keys == NULL)
+        goto err;
+    values = BTree_AlignedItems(&values_view, sizeof(VALUE_TYPE),
+                                &values_copy);
+    if (values == NULL)
+        goto err;
+#ifdef KEY_IS_NAN
+    if (BTree_CheckNaNKeys(keys, len) < 0)
+        goto err;
+#endif
+
+    result = BTREE(PyObject_CallObject(type, NULL));
+    if (result == NULL)
+        goto err;
+    if (_BTree_fillSizes(result, fill_factor, &leaf_fill, &internal_fill) < 0)
+        goto err;
+
+    count = len;
+    for (i = 1; i < len; i++)
+    {
+        TEST_KEY_SET_OR(cmp, keys[i - 1], keys[i]) {}
+        if (cmp >= 0)
+            break;
+    }
+    if (i < len)
+    {
+        Py_ssize_t j;
+
+        order = BTree_Malloc(sizeof(BatchProbe) * len);
+        if (order == NULL)
+            goto err;
+        for (i = 0; i < len; i++)
+        {
+            order[i].key = keys[i];
+            order[i].index = i;
+        }
+        qsort(order, len, sizeof(BatchProbe), _from_arrays_compare);
+        /* Keep the last of each run of equal keys. */
+        for (i = j = 0; i < len; i++)
+        {
+            if (i + 1 < len)
+            {
+                TEST_KEY_SET_OR(cmp, order[i].key, order[i + 1].key) {}
+                if (cmp == 0)
+                    continue;
+            }
+            order[j++] = order[i];
+        }
+        count = j;
+    }
+
+    if (count == 0)
+        goto done;
+
+    nbuckets = (int)((count + leaf_fill - 1) / leaf_fill);
+    children = BTree_Malloc(sizeof(Sized *) * nbuckets);
+    if (children == NULL)
+        goto err;
+
+    for (i = 0; i < count; i += leaf_fill)
+    {
+        Bucket *next;
+        int filled = (int)(count - i < leaf_fill ? count - i : leaf_fill);
+        int k;
+
+        next = BUCKET(BTree_newBucket(result));
+        if (next == NULL || Bucket_grow(next, leaf_fill, 0) < 0)
+        {
+            Py_XDECREF(next);
+            goto err;
+        }
+        children[n++] = SIZED(next);
+        if (bucket)
+        {
+            Py_INCREF(next);
+            bucket->next = next;
+        }
+        bucket = next;
+
+        if (order == NULL)
+        {
+            memcpy(bucket->keys, keys + i, sizeof(KEY_TYPE) * filled);
+            memcpy(bucket->values, values + i, sizeof(VALUE_TYPE) * filled);
+        }
+        else
+        {
+            for (k = 0; k < filled; k++)
+            {
+                COPY_KEY(bucket->keys[k], order[i + k].key);
+                COPY_VALUE(bucket->values[k], values[order[i + k].index]);
+            }
+        }
+        bucket->len = filled;
+    }
+
+    i = _BTree_buildInterior(result, type, children, n, internal_fill);
+    n = 0;
+    if (i < 0)
+        goto err;
+
+done:
+    free(children);
+    free(order);
+    free(keys_copy);
+    free(values_copy);
+    PyBuffer_Release(&keys_view);
+    PyBuffer_Release(&values_view);
+    return OBJECT(result);
+
+err:
+    for (i = 0; i < n; i++)
+        Py_DECREF(children[i]);
+    free(children);
+    free(order);
+    free(keys_copy);
+    free(values_copy);
+    PyBuffer_Release(&keys_view);
+    PyBuffer_Release(&values_view);
+    Py_XDECREF(result);
+    return NULL;
+#else
+    PyErr_SetString(PyExc_TypeError,
+                    "keys and values must be native numbers");
+    return NULL;
+#endif
+}
+
 /**************************************************************************/
 /* Iterator support. */
 
@@ -2172,7 +3913,7 @@ buildBTreeIter(BTree *self, PyObject *args, PyObject *kw, char kind)
 
     if (items)
     {
-        result = BTreeIter_new(items);
+        result = BTreeIter_new(items, self);
         Py_DECREF(items);
     }
     return (PyObject *)result;
@@ -2251,16 +3992,31 @@ static struct PyMethodDef BTree_methods[] = {
      "Returns the items of the BTree.  If min and max are supplied, only\n"
      "items with keys greater than min and less than max are returned."},
 
-    {"byValue", (PyCFunction) BTree_byValue, METH_O,
-     "byValue(min) ->  list of value, key pairs\n\n"
+    {"byValue", (PyCFunction) BTree_byValue, METH_VARARGS | METH_KEYWORDS,
+     "byValue(min, limit=None) ->  list of value, key pairs\n\n"
      "Returns list of value, key pairs where the value is >= min.  The\n"
      "list is sorted by value.  Note that items() returns keys in the\n"
-     "opposite order."},
+     "opposite order.  If limit is given, only the first limit pairs\n"
+     "are returned, without sorting the others."},
+
+    {"topk", (PyCFunction) BTree_topk, METH_VARARGS | METH_KEYWORDS,
+     "topk(k, min=None) ->  list of value, key pairs\n\n"
+     "Returns the k value, key pairs with the largest values, sorted by\n"
+     "value, largest first.  Unlike byValue, values are not normalized.\n"
+     "If min is given, values < min are omitted."},
 
     {"get", (PyCFunction) BTree_getm, METH_VARARGS,
      "get(key[, default=None]) -> Value for key or default\n\n"
      "Return the value or the default if the key is not found."},
 
+    {"get_many", (PyCFunction) BTree_get_many, METH_VARARGS | METH_KEYWORDS,
+     "get_many(keys[, default=None]) -> Values for keys\n\n"
+     "Return the value, or the default, for each of the keys."},
+
+    {"contains_many", (PyCFunction) BTree_contains_many, METH_O,
+     "contains_many(keys) -> Flags for keys\n\n"
+     "Return whether the BTree contains each of the keys."},
+
     {"setdefault", (PyCFunction) BTree_setdefault, METH_VARARGS,
      "D.setdefault(k, d) -> D.get(k, d), also set D[k]=d if k not in D.\n\n"
      "Return the value like get() except that if key is missing, d is both\n"
@@ -2285,6 +4041,24 @@ static struct PyMethodDef BTree_methods[] = {
      "Return the smallest key in the BTree.  If min is specified, return\n"
      "the smallest key >= min."},
 
+    {"count", (PyCFunction) BTree_count, METH_VARARGS | METH_KEYWORDS,
+     "count([min, max]) -> int\n\n"
+     "Return the number of keys in the BTree that keys() would return\n"
+     "for the same arguments."},
+
+    {"to_arrays", (PyCFunction) BTree_to_arrays, METH_VARARGS | METH_KEYWORDS,
+     "to_arrays([min, max]) -> (keys, values)\n\n"
+     "Return arrays of the keys and values items() would return for the\n"
+     "same arguments."},
+
+    {"rank", (PyCFunction) BTree_rank, METH_O,
+     "rank(key) -> int\n\n"
+     "Return the number of keys in the BTree less than key."},
+
+    {"select", (PyCFunction) BTree_select, METH_VARARGS,
+     "select(index) -> key\n\n"
+     "Return the key at the given position in the sorted keys."},
+
     {"clear", (PyCFunction) BTree_clear, METH_NOARGS,
      "clear()\n\nRemove all of the items from the BTree."},
 
@@ -2296,6 +4070,17 @@ static struct PyMethodDef BTree_methods[] = {
     {"update", (PyCFunction) Mapping_update, METH_O,
      "update(collection)\n\n Add the items from the given collection."},
 
+    {"fromSorted", (PyCFunction) BTree_fromSorted,
+     METH_VARARGS | METH_KEYWORDS | METH_CLASS,
+     "fromSorted(items[, fill_factor=1.0]) -> new BTree\n\n"
+     "Build a BTree bottom-up from (key, value) pairs sorted by key,\n"
+     "filling each bucket to fill_factor of its maximum size."},
+
+    {"from_arrays", (PyCFunction) BTree_from_arrays,
+     METH_VARARGS | METH_KEYWORDS | METH_CLASS,
+     "from_arrays(keys, values[, fill_factor=1.0]) -> new BTree\n\n"
+     "Build a BTree from two buffers of native keys and values."},
+
     {"iterkeys", (PyCFunction) BTree_iterkeys, METH_VARARGS | METH_KEYWORDS,
      "B.iterkeys([min[,max]]) -> an iterator over the keys of B"},
 
@@ -2326,8 +4111,7 @@ BTree_init(PyObject *self, PyObject *args, PyObject *kwds)
 {
     PyObject *v = NULL;
 
-    BTREE(self)->max_leaf_size = 0;
-    BTREE(self)->max_internal_size = 0;
+    BTREE(self)->counted = 0;
 
     if (!PyArg_ParseTuple(args, "|O:" MOD_NAME_PREFIX "BTree", &v))
         return -1;
@@ -2425,12 +4209,24 @@ BTree_tp_clear(BTree *self)
 static Py_ssize_t
 BTree_length_or_nonzero(BTree *self, int nonzero)
 {
-    int result;
+    Py_ssize_t result;
     Bucket *b;
     Bucket *next;
+    int counted;
 
     PER_USE_OR_RETURN(self, -1);
     b = self->firstbucket;
+    if (!nonzero)
+    {
+        /* A counted BTree knows its size without visiting the buckets. */
+        counted = _BTree_counted(self);
+        if (counted)
+        {
+            result = counted < 0 ? -1 : _BTree_countSum(self);
+            PER_UNUSE(self);
+            return result;
+        }
+    }
     PER_UNUSE(self);
     if (nonzero)
         return b != NULL;
@@ -2518,9 +4314,14 @@ BTreeType_setattro(PyTypeObject* type, PyObject* name, PyObject* value)
     }
 
     if (allowed) {
-        PyDict_SetItem(type->tp_dict, name, value);
+        if (value == NULL)
+            allowed = PyDict_DelItem(type->tp_dict, name);
+        else
+            allowed = PyDict_SetItem(type->tp_dict, name, value);
+        /* This also gives this class and its subclasses, whose sizes
+           may be inherited from it, new version tags.  See BTreeSizes. */
         PyType_Modified(type);
-        if (PyErr_Occurred()) {
+        if (allowed < 0 || PyErr_Occurred()) {
             return -1;
         }
         return 0;
@@ -2531,7 +4332,7 @@ BTreeType_setattro(PyTypeObject* type, PyObject* name, PyObject* value)
 static PyTypeObject BTreeTypeType = {
     PyVarObject_HEAD_INIT(NULL, 0)
     MODULE_NAME MOD_NAME_PREFIX "BTreeType",
-    0, /* tp_basicsize */
+    sizeof(BTreeTypeObject), /* tp_basicsize */
     0, /* tp_itemsize */
     0, /* tp_dealloc */
     0, /* tp_print */
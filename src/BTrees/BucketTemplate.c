@@ -51,6 +51,18 @@
     (ABSENT) = _cmp;                                        \
   }
 
+#ifdef KEY_TYPE_IS_INTEGER
+/* See _bucket_lower_bound. */
+#undef BUCKET_SEARCH
+#define BUCKET_SEARCH(INDEX, ABSENT, SELF, KEY, ONERROR) {  \
+    (INDEX) = _bucket_lower_bound((SELF)->keys, (SELF)->len, \
+                                  (KEY));                   \
+    (ABSENT) = (INDEX) == (SELF)->len                       \
+               || (SELF)->keys[INDEX] != (KEY);             \
+    if (0) { ONERROR; }                                     \
+  }
+#endif
+
 /*
 ** _bucket_get
 **
@@ -875,6 +887,76 @@ empty:
     return 0;
 }
 
+/*
+** bucket_keys_buffer
+**
+** Return a read-only memoryview of the bucket's keys, copied with a
+** single memcpy instead of creating an object per key.  Only families
+** with native keys support this.
+*/
+static PyObject *
+bucket_keys_buffer(Bucket *self, PyObject *unused)
+{
+#ifdef KEY_TYPECODE
+    PyObject *result;
+
+    PER_USE_OR_RETURN(self, NULL);
+    result = BTree_NewView(KEY_TYPECODE, (const char *)self->keys,
+                           sizeof(KEY_TYPE) * self->len);
+    PER_UNUSE(self);
+    return result;
+#else
+    PyErr_SetString(PyExc_TypeError, "keys are not native numbers");
+    return NULL;
+#endif
+}
+
+/*
+** bucket_values_buffer
+**
+** Return a read-only memoryview of the bucket's values, like
+** bucket_keys_buffer.
+*/
+static PyObject *
+bucket_values_buffer(Bucket *self, PyObject *unused)
+{
+#ifdef VALUE_TYPECODE
+    PyObject *result;
+
+    PER_USE_OR_RETURN(self, NULL);
+    result = BTree_NewView(VALUE_TYPECODE, (const char *)self->values,
+                           sizeof(VALUE_TYPE) * self->len);
+    PER_UNUSE(self);
+    return result;
+#else
+    PyErr_SetString(PyExc_TypeError, "values are not native numbers");
+    return NULL;
+#endif
+}
+
+/*
+** bucket_count
+**
+** Return the number of keys that keys() would return for the same
+** arguments, without creating them.
+*/
+static PyObject *
+bucket_count(Bucket *self, PyObject *args, PyObject *kw)
+{
+    int low, high;
+
+    PER_USE_OR_RETURN(self, NULL);
+
+    if (Bucket_rangeSearch(self, args, kw, &low, &high) < 0)
+    {
+        PER_UNUSE(self);
+        return NULL;
+    }
+
+    PER_UNUSE(self);
+    return PyLong_FromLong(high - low + 1);
+}
+
 /*
 ** bucket_keys
 **
@@ -1013,22 +1095,319 @@ err:
     return NULL;
 }
 
+/* A bounded min-heap of items, ordered by (value, key), used to find the
+ * items with the largest values without sorting all of them.  The heap
+ * keeps at most "limit" items; once full, an item offered replaces the
+ * smallest if it's larger.  items holds references to object keys and
+ * values.
+ */
+typedef struct {
+    KEY_TYPE key;
+    VALUE_TYPE value;
+} TopItem;
+
+typedef struct {
+    TopItem *items;
+    int len;
+    int size;
+    int limit;
+} TopHeap;
+
+/* Compare items by value, then key.  Return -1, 0 or 1, or -2 with an
+ * exception set if comparing objects failed.
+ */
+static int
+_TopHeap_cmp(const TopItem *a, const TopItem *b)
+{
+    int cmp;
+
+    cmp = TEST_VALUE(a->value, b->value);
+#ifdef VALUE_TYPE_IS_PYOBJECT
+    if (PyErr_Occurred())
+        return -2;
+#endif
+    if (cmp == 0)
+    {
+        TEST_KEY_SET_OR(cmp, a->key, b->key) return -2;
+    }
+    return cmp < 0 ? -1 : cmp > 0;
+}
+
+/* Sift item down into the hole at index i of the first n items.  On
+ * error, item is still stored (in the hole), and -1 is returned.
+ */
+static int
+_TopHeap_siftdown(TopHeap *heap, int i, int n, const TopItem *item)
+{
+    TopItem *items = heap->items;
+    int child, cmp, result = 0;
+
+    while ((child = 2 * i + 1) < n)
+    {
+        if (child + 1 < n)
+        {
+            cmp = _TopHeap_cmp(&items[child + 1], &items[child]);
+            if (cmp == -2)
+            {
+                result = -1;
+                break;
+            }
+            if (cmp < 0)
+                child++;
+        }
+        cmp = _TopHeap_cmp(&items[child], item);
+        if (cmp == -2)
+        {
+            result = -1;
+            break;
+        }
+        if (cmp >= 0)
+            break;
+        items[i] = items[child];
+        i = child;
+    }
+    items[i] = *item;
+    return result;
+}
+
+/* Offer the item (key, value) to the heap, which keeps it if it's among
+ * the largest heap->limit offered.  Return 0, or -1 on error.
+ */
+static int
+_TopHeap_offer(TopHeap *heap, KEY_TYPE key, VALUE_TYPE value)
+{
+    TopItem item;
+    int i, parent, cmp;
+
+    if (heap->limit == 0)
+        return 0;
+    COPY_KEY(item.key, key);
+    COPY_VALUE(item.value, value);
+
+    if (heap->len == heap->limit)
+    {
+        cmp = _TopHeap_cmp(&item, &heap->items[0]);
+        if (cmp == -2)
+            return -1;
+        if (cmp <= 0)
+            return 0;
+        DECREF_KEY(heap->items[0].key);
+        DECREF_VALUE(heap->items[0].value);
+        INCREF_KEY(item.key);
+        INCREF_VALUE(item.value);
+        return _TopHeap_siftdown(heap, 0, heap->len, &item);
+    }
+
+    if (heap->len == heap->size)
+    {
+        int newsize = heap->size ? heap->size * 2 : 16;
+        TopItem *items;
+
+        if (newsize > heap->limit)
+            newsize = heap->limit;
+        items = BTree_Realloc(heap->items, sizeof(TopItem) * newsize);
+        if (items == NULL)
+            return -1;
+        heap->items = items;
+        heap->size = newsize;
+    }
+
+    INCREF_KEY(item.key);
+    INCREF_VALUE(item.value);
+    i = heap->len++;
+    while (i > 0)
+    {
+        parent = (i - 1) >> 1;
+        cmp = _TopHeap_cmp(&item, &heap->items[parent]);
+        if (cmp == -2)
+        {
+            heap->items[i] = item;
+            return -1;
+        }
+        if (cmp >= 0)
+            break;
+        heap->items[i] = heap->items[parent];
+        i = parent;
+    }
+    heap->items[i] = item;
+    return 0;
+}
+
+static void
+_TopHeap_clear(TopHeap *heap)
+{
+#if defined(KEY_TYPE_IS_PYOBJECT) || defined(VALUE_TYPE_IS_PYOBJECT)
+    int i;
+
+    for (i = 0; i < heap->len; i++)
+    {
+        DECREF_KEY(heap->items[i].key);
+        DECREF_VALUE(heap->items[i].value);
+    }
+#endif
+    if (heap->items)
+        free(heap->items);
+    heap->items = NULL;
+    heap->len = heap->size = 0;
+}
+
+/* Offer the items of bucket whose values are >= *min (or all of them, if
+ * min is NULL) to heap.  If normalize, the values are first normalized
+ * by *min, as byValue does, so that ties among the normalized values are
+ * broken by key.  Return 0, or -1 on error.
+ */
+static int
+_bucket_offer_values(Bucket *self, TopHeap *heap, VALUE_TYPE *min,
+                     int normalize)
+{
+    int i, cmp, rc;
+    VALUE_TYPE v;
+
+    for (i = 0; i < self->len; i++)
+    {
+#ifdef VALUE_IS_NAN
+        if (VALUE_IS_NAN(self->values[i]))
+            continue;
+#endif
+        if (min)
+        {
+            cmp = TEST_VALUE(self->values[i], *min);
+#ifdef VALUE_TYPE_IS_PYOBJECT
+            if (PyErr_Occurred())
+                return -1;
+#endif
+            if (cmp < 0)
+                continue;
+        }
+        if (min && normalize)
+        {
+            COPY_VALUE(v, self->values[i]);
+            NORMALIZE_VALUE(v, *min);
+            rc = _TopHeap_offer(heap, self->keys[i], v);
+            DECREF_VALUE(v);
+        }
+        else
+            rc = _TopHeap_offer(heap, self->keys[i], self->values[i]);
+        if (rc < 0)
+            return -1;
+    }
+    return 0;
+}
+
+/* Sort heap, largest item first, and return a list of (value, key) pairs
+ * of its items.  The heap is cleared in any case.
+ */
 static PyObject *
-bucket_byValue(Bucket *self, PyObject *omin)
+_TopHeap_result(TopHeap *heap)
+{
+    PyObject *r = NULL, *item, *o;
+    TopItem last;
+    int i, n;
+
+    /* Move the smallest item to the end, repeatedly. */
+    for (n = heap->len - 1; n > 0; n--)
+    {
+        last = heap->items[n];
+        heap->items[n] = heap->items[0];
+        if (_TopHeap_siftdown(heap, 0, n, &last) < 0)
+            goto done;
+    }
+
+    UNLESS (r = PyList_New(heap->len))
+        goto done;
+    for (i = 0; i < heap->len; i++)
+    {
+        UNLESS (item = PyTuple_New(2))
+            goto err;
+        PyList_SET_ITEM(r, i, item);
+        COPY_KEY_TO_OBJECT(o, heap->items[i].key);
+        UNLESS (o)
+            goto err;
+        PyTuple_SET_ITEM(item, 1, o);
+        COPY_VALUE_TO_OBJECT(o, heap->items[i].value);
+        UNLESS (o)
+            goto err;
+        PyTuple_SET_ITEM(item, 0, o);
+    }
+    goto done;
+
+err:
+    Py_CLEAR(r);
+done:
+    _TopHeap_clear(heap);
+    return r;
+}
+
+/* Parse the arguments of byValue, (min, limit=None), or, if is_topk, of
+ * topk, (k, min=None).  Set *min (which is then an owned reference for
+ * object values) and *has_min, and *limit to the limit, or -1 for none.
+ * Return 0, or -1 on error.
+ */
+static int
+_parse_top_args(PyObject *args, PyObject *kw, int is_topk,
+                VALUE_TYPE *min, int *has_min, int *limit)
+{
+    static char *byvalue_kwlist[] = {"min", "limit", NULL};
+    static char *topk_kwlist[] = {"k", "min", NULL};
+    PyObject *omin = Py_None, *olimit = Py_None;
+    int copied = 1;
+
+    if (is_topk)
+    {
+        if (!PyArg_ParseTupleAndKeywords(args, kw, "O|O:topk", topk_kwlist,
+                                         &olimit, &omin))
+            return -1;
+    }
+    else if (!PyArg_ParseTupleAndKeywords(args, kw, "O|O:byValue",
+                                          byvalue_kwlist, &omin, &olimit))
+        return -1;
+
+    *limit = -1;
+    if (olimit != Py_None || is_topk)
+    {
+        /* Like operator.index(), but clamping very large limits. */
+        Py_ssize_t l = PyNumber_AsSsize_t(olimit, NULL);
+
+        if (l == -1 && PyErr_Occurred())
+            return -1;
+        if (l < 0)
+        {
+            PyErr_SetString(PyExc_ValueError,
+                            is_topk ? "k must not be negative"
+                                    : "limit must not be negative");
+            return -1;
+        }
+        *limit = l > INT_MAX ? INT_MAX : (int)l;
+    }
+
+    *has_min = !is_topk || omin != Py_None;
+    if (*has_min)
+    {
+        COPY_VALUE_FROM_ARG(*min, omin, copied);
+        UNLESS (copied)
+            return -1;
+#ifdef VALUE_TYPE_IS_PYOBJECT
+        Py_INCREF(*min);
+#endif
+    }
+    return 0;
+}
+
+static PyObject *
+_bucket_byValue(Bucket *self, VALUE_TYPE min)
 {
     PyObject *r=0, *o=0, *item=0;
-    VALUE_TYPE min;
     VALUE_TYPE v;
-    int i, l, copied=1;
+    int i, l;
 
     PER_USE_OR_RETURN(self, NULL);
 
-    COPY_VALUE_FROM_ARG(min, omin, copied);
-    UNLESS(copied)
-        return NULL;
-
     for (i=0, l=0; i < self->len; i++)
-        if (TEST_VALUE(self->values[i], min) >= 0)
+        if (TEST_VALUE(self->values[i], min) >= 0
+#ifdef VALUE_IS_NAN
+            && !VALUE_IS_NAN(self->values[i])
+#endif
+            )
         l++;
 
     UNLESS (r=PyList_New(l))
@@ -1038,6 +1417,10 @@ bucket_byValue(Bucket *self, PyObject *omin)
     {
         if (TEST_VALUE(self->values[i], min) < 0)
             continue;
+#ifdef VALUE_IS_NAN
+        if (VALUE_IS_NAN(self->values[i]))
+            continue;
+#endif
 
         UNLESS (item = PyTuple_New(2))
             goto err;
@@ -1086,6 +1469,54 @@ err:
     return NULL;
 }
 
+static PyObject *
+_bucket_top(Bucket *self, PyObject *args, PyObject *kw, int is_topk)
+{
+    TopHeap heap = {NULL, 0, 0, 0};
+    VALUE_TYPE min;
+    int has_min, rc;
+    PyObject *r;
+
+    if (_parse_top_args(args, kw, is_topk, &min, &has_min, &heap.limit) < 0)
+        return NULL;
+    if (heap.limit < 0)
+    {
+        /* byValue without a limit */
+        r = _bucket_byValue(self, min);
+        DECREF_VALUE(min);
+        return r;
+    }
+
+    r = NULL;
+    UNLESS (PER_USE(self))
+        goto done;
+    rc = _bucket_offer_values(self, &heap, has_min ? &min : NULL,
+                              !is_topk);
+    PER_UNUSE(self);
+    if (rc >= 0)
+        r = _TopHeap_result(&heap);
+
+done:
+    _TopHeap_clear(&heap);
+    if (has_min)
+    {
+        DECREF_VALUE(min);
+    }
+    return r;
+}
+
+static PyObject *
+bucket_byValue(Bucket *self, PyObject *args, PyObject *kw)
+{
+    return _bucket_top(self, args, kw, 0);
+}
+
+static PyObject *
+bucket_topk(Bucket *self, PyObject *args, PyObject *kw)
+{
+    return _bucket_top(self, args, kw, 1);
+}
+
 static int
 _bucket_clear(Bucket *self)
 {
@@ -1220,14 +1651,249 @@ err:
  *          <self->next iff non-NULL>
  *     )
  */
+/* Return the packed state of a bucket (see bucket_getstate), or NULL
+ * with an exception set.  self must be activated.
+ */
+static PyObject *
+_bucket_packed_state(Bucket *self)
+{
+#ifdef KEY_TYPECODE
+    PyObject *keys, *values = NULL, *state;
+
+    /* An empty bucket may not have allocated its values yet. */
+    if (PyObject_TypeCheck(OBJECT(self), &BucketType))
+    {
+#ifdef VALUE_TYPECODE
+        values = BTree_PackItems(self->values, self->len, sizeof(VALUE_TYPE));
+        if (values == NULL)
+            return NULL;
+#else
+        PyErr_SetString(PyExc_TypeError,
+                        "packed state requires native keys and values");
+        return NULL;
+#endif
+    }
+    keys = BTree_PackItems(self->keys, self->len, sizeof(KEY_TYPE));
+    if (keys == NULL)
+    {
+        Py_XDECREF(values);
+        return NULL;
+    }
+    if (values)
+    {
+        if (self->next)
+            state = Py_BuildValue("NNO", keys, values, self->next);
+        else
+            state = Py_BuildValue("NN", keys, values);
+    }
+    else if (self->next)
+        state = Py_BuildValue("NO", keys, self->next);
+    else
+        state = Py_BuildValue("(N)", keys);
+    return state;
+#else
+    PyErr_SetString(PyExc_TypeError,
+                    "packed state requires native keys and values");
+    return NULL;
+#endif
+}
+
+/* Return the delta state of a set (see bucket_getstate), or NULL with an
+ * exception set.  self must be activated.
+ *
+ * Each key is stored as the difference from the previous key (the first
+ * from 0), taken modulo 2**64, as an unsigned LEB128 varint (see
+ * _BTree_put_varint).  The keys of a set are increasing, so the
+ * differences are small for dense sets, and most keys take one or two
+ * bytes.
+ */
+static PyObject *
+_set_delta_state(Bucket *self)
+{
+#ifdef KEY_TYPE_IS_INTEGER
+    PyObject *data, *state;
+    unsigned char *p;
+    unsigned PY_LONG_LONG prev = 0, key;
+    int i;
+
+    if (PyObject_TypeCheck(OBJECT(self), &BucketType))
+    {
+        PyErr_SetString(PyExc_TypeError, "delta state requires a Set");
+        return NULL;
+    }
+    /* A varint takes at most 10 bytes. */
+    data = PyBytes_FromStringAndSize(NULL, (Py_ssize_t)self->len * 10);
+    if (data == NULL)
+        return NULL;
+    p = (unsigned char *)PyBytes_AS_STRING(data);
+    for (i = 0; i < self->len; i++)
+    {
+        key = (unsigned PY_LONG_LONG)self->keys[i];
+        p = _BTree_put_varint(p, key - prev);
+        prev = key;
+    }
+    if (_PyBytes_Resize(&data, (char *)p - PyBytes_AS_STRING(data)) < 0)
+        return NULL;
+    if (self->next)
+        state = Py_BuildValue("iNO", self->len, data, self->next);
+    else
+        state = Py_BuildValue("iN", self->len, data);
+    return state;
+#else
+    PyErr_SetString(PyExc_TypeError,
+                    "delta state requires a Set of integer keys");
+    return NULL;
+#endif
+}
+
+#ifdef KEY_TYPE_IS_PYOBJECT
+/* Return the number of leading characters (or bytes) a and b, which are
+ * both exact bytes or both exact str, have in common.
+ */
+static Py_ssize_t
+_object_common_prefix(PyObject *a, PyObject *b)
+{
+    Py_ssize_t n = 0, limit;
+
+    if (PyBytes_Check(a))
+    {
+        const char *da = PyBytes_AS_STRING(a), *db = PyBytes_AS_STRING(b);
+
+        limit = Py_MIN(PyBytes_GET_SIZE(a), PyBytes_GET_SIZE(b));
+        while (n < limit && da[n] == db[n])
+            n++;
+    }
+    else
+    {
+        int ka = PyUnicode_KIND(a), kb = PyUnicode_KIND(b);
+        const void *da = PyUnicode_DATA(a), *db = PyUnicode_DATA(b);
+
+        limit = Py_MIN(PyUnicode_GET_LENGTH(a), PyUnicode_GET_LENGTH(b));
+        while (n < limit && PyUnicode_READ(ka, da, n) == PyUnicode_READ(kb, db, n))
+            n++;
+    }
+    return n;
+}
+#endif
+
+/* Return the prefix state of a bucket (see bucket_getstate), a new
+ * reference to Py_None if its keys aren't all exact bytes or all exact
+ * str, or NULL with an exception set.  self must be activated.
+ *
+ * Each key is stored as the number of leading characters it shares with
+ * the previous key, as a varint (see _BTree_put_varint) in one bytes
+ * object, and the rest of the key, in a tuple in place of the keys.
+ * Sorted keys with long common prefixes, such as paths, then save only
+ * what differs from their neighbour.
+ */
+static PyObject *
+_bucket_prefix_state(Bucket *self)
+{
+#ifdef KEY_TYPE_IS_PYOBJECT
+    PyObject *items, *shared, *key, *prev = NULL, *o, *state;
+    unsigned char *p;
+    Py_ssize_t n;
+    int i, step, is_bytes;
+
+    is_bytes = self->len && PyBytes_CheckExact(self->keys[0]);
+    for (i = 0; i < self->len; i++)
+    {
+        key = self->keys[i];
+        if (is_bytes ? ! PyBytes_CheckExact(key) : ! PyUnicode_CheckExact(key))
+        {
+            Py_INCREF(Py_None);
+            return Py_None;
+        }
+    }
+
+    /* An empty bucket may not have allocated its values yet. */
+    step = PyObject_TypeCheck(OBJECT(self), &BucketType) ? 2 : 1;
+    items = PyTuple_New((Py_ssize_t)self->len * step);
+    if (items == NULL)
+        return NULL;
+    /* A varint takes at most 10 bytes. */
+    shared = PyBytes_FromStringAndSize(NULL, (Py_ssize_t)self->len * 10);
+    if (shared == NULL)
+        goto err;
+    p = (unsigned char *)PyBytes_AS_STRING(shared);
+    for (i = 0; i < self->len; i++)
+    {
+        key = self->keys[i];
+        n = prev ? _object_common_prefix(prev, key) : 0;
+        if (n == 0)
+        {
+            o = key;
+            Py_INCREF(o);
+        }
+        else if (is_bytes)
+            o = PyBytes_FromStringAndSize(PyBytes_AS_STRING(key) + n,
+                                          PyBytes_GET_SIZE(key) - n);
+        else
+            o = PyUnicode_Substring(key, n, PyUnicode_GET_LENGTH(key));
+        if (o == NULL)
+            goto err;
+        PyTuple_SET_ITEM(items, i * step, o);
+        if (step == 2)
+        {
+            COPY_VALUE_TO_OBJECT(o, self->values[i]);
+            if (o == NULL)
+                goto err;
+            PyTuple_SET_ITEM(items, i * 2 + 1, o);
+        }
+        p = _BTree_put_varint(p, (unsigned PY_LONG_LONG)n);
+        prev = key;
+    }
+    if (_PyBytes_Resize(&shared, (char *)p - PyBytes_AS_STRING(shared)) < 0)
+        goto err;
+    if (self->next)
+        state = Py_BuildValue("NNO", items, shared, self->next);
+    else
+        state = Py_BuildValue("NN", items, shared);
+    return state;
+
+err:
+    Py_DECREF(items);
+    Py_XDECREF(shared);
+    return NULL;
+#else
+    PyErr_SetString(PyExc_TypeError,
+                    "prefix state requires object keys");
+    return NULL;
+#endif
+}
+
 static PyObject *
 bucket_getstate(Bucket *self)
 {
     PyObject *o = NULL, *items = NULL, *state;
-    int i, len, l;
+    int i, len, l, format;
 
     PER_USE_OR_RETURN(self, NULL);
 
+    format = _BTree_state_format(OBJECT(self));
+    if (format < 0)
+        goto err;
+    if (format == STATE_PACKED || format == STATE_DELTA)
+    {
+        if (format == STATE_PACKED)
+            state = _bucket_packed_state(self);
+        else
+            state = _set_delta_state(self);
+        PER_UNUSE(self);
+        return state;
+    }
+    if (format == STATE_PREFIX)
+    {
+        state = _bucket_prefix_state(self);
+        if (state != Py_None)
+        {
+            PER_UNUSE(self);
+            return state;
+        }
+        /* Save keys that aren't all bytes or all str as tuples. */
+        Py_DECREF(state);
+    }
+
     len = self->len;
 
     if (self->values) /* Bucket */
@@ -1280,24 +1946,61 @@ err:
 static int
 _bucket_setstate(Bucket *self, PyObject *state)
 {
-    PyObject *k, *v, *items;
+    PyObject *k, *v, *items, *packed_values = NULL;
+#ifdef KEY_TYPE_IS_PYOBJECT
+    PyObject *shared = NULL;
+#endif
     Bucket *next = NULL;
     int i, l, len, copied=1;
     KEY_TYPE *keys;
     VALUE_TYPE *values;
 
-    if (!PyArg_ParseTuple(state, "O|O:__setstate__", &items, &next))
+    if (!PyArg_ParseTuple(state, "O|OO:__setstate__",
+                          &items, &next, &packed_values))
         return -1;
 
-    if (!PyTuple_Check(items)) {
+#if defined(KEY_TYPECODE) && defined(VALUE_TYPECODE)
+    if (PyBytes_Check(items)) {
+        /* Packed state:  (keys, values[, next]). */
+        packed_values = OBJECT(next);
+        next = NULL;
+        if (packed_values == NULL) {
+            PyErr_SetString(PyExc_TypeError,
+                            "packed state requires keys and values");
+            return -1;
+        }
+        if (PyTuple_GET_SIZE(state) > 2)
+            next = BUCKET(PyTuple_GET_ITEM(state, 2));
+        if (PyBytes_GET_SIZE(items) % sizeof(KEY_TYPE)
+            || PyBytes_GET_SIZE(items) / sizeof(KEY_TYPE) > INT_MAX) {
+            PyErr_SetString(PyExc_TypeError,
+                            "packed state has the wrong number of bytes");
+            return -1;
+        }
+        len = (int)(PyBytes_GET_SIZE(items) / sizeof(KEY_TYPE));
+    }
+    else
+#endif
+#ifdef KEY_TYPE_IS_PYOBJECT
+    if (PyTuple_Check(items) && next && PyBytes_Check(OBJECT(next))) {
+        /* Prefix state:  (suffixes and values, shared[, next]). */
+        shared = OBJECT(next);
+        next = BUCKET(packed_values);
+        packed_values = NULL;
+        len = PyTuple_GET_SIZE(items) / 2;
+    }
+    else
+#endif
+    if (!PyTuple_Check(items) || packed_values) {
         PyErr_SetString(PyExc_TypeError,
                         "tuple required for first state element");
         return -1;
     }
-
-    len = PyTuple_Size(items);
-    ASSERT(len >= 0, "_bucket_setstate: items tuple has negative size", -1);
-    len /= 2;
+    else {
+        len = PyTuple_Size(items);
+        ASSERT(len >= 0, "_bucket_setstate: items tuple has negative size", -1);
+        len /= 2;
+    }
 
     for (i = self->len; --i >= 0; ) {
         DECREF_KEY(self->keys[i]);
@@ -1322,6 +2025,33 @@ _bucket_setstate(Bucket *self, PyObject *state)
         self->size = len;
     }
 
+#if defined(KEY_TYPECODE) && defined(VALUE_TYPECODE)
+    if (PyBytes_Check(items)) {
+        if (BTree_UnpackItems(items, self->keys, len, sizeof(KEY_TYPE)) < 0
+            || BTree_UnpackItems(packed_values, self->values, len,
+                                 sizeof(VALUE_TYPE)) < 0)
+            return -1;
+#ifdef KEY_IS_NAN
+        if (BTree_CheckNaNKeys(self->keys, len) < 0)
+            return -1;
+#endif
+    }
+    else
+#endif
+#ifdef KEY_TYPE_IS_PYOBJECT
+    if (shared) {
+        if (BTree_PrefixKeys(items, 2, shared, self->keys, len) < 0)
+            return -1;
+        for (i = 0; i < len; i++) {
+            v = PyTuple_GET_ITEM(items, i * 2 + 1);
+            COPY_VALUE_FROM_ARG(self->values[i], v, copied);
+            if (!copied)
+                return -1;
+            INCREF_VALUE(self->values[i]);
+        }
+    }
+    else
+#endif
     for (i=0, l=0; i < len; i++) {
         k = PyTuple_GET_ITEM(items, l);
         l++;
@@ -1367,21 +2097,21 @@ static PyObject *
 bucket_sub(PyObject *self, PyObject *other)
 {
     PyObject *args = Py_BuildValue("OO", self, other);
-    return difference_m(NULL, args);
+    return difference_m(NULL, args, NULL);
 }
 
 static PyObject *
 bucket_or(PyObject *self, PyObject *other)
 {
     PyObject *args = Py_BuildValue("OO", self, other);
-    return union_m(NULL, args);
+    return union_m(NULL, args, NULL);
 }
 
 static PyObject *
 bucket_and(PyObject *self, PyObject *other)
 {
     PyObject *args = Py_BuildValue("OO", self, other);
-    return intersection_m(NULL, args);
+    return intersection_m(NULL, args, NULL);
 }
 
 static PyObject *
@@ -1585,7 +2315,7 @@ buildBucketIter(Bucket *self, PyObject *args, PyObject *kw, char kind)
     if (items == NULL)
         goto Done;
 
-    result = BTreeIter_new(items);      /* win or lose, we're done */
+    result = BTreeIter_new(items, NULL); /* win or lose, we're done */
     Py_DECREF(items);
 
 Done:
@@ -1701,6 +2431,10 @@ static struct PyMemberDef Bucket_members[] = {
     {NULL}
 };
 
+/* Batch lookups are shared with BTrees, see BTreeTemplate.c. */
+static PyObject *bucket_get_many(Bucket *self, PyObject *args, PyObject *kw);
+static PyObject *bucket_contains_many(Bucket *self, PyObject *keys);
+
 static struct PyMethodDef Bucket_methods[] = {
     {"__getstate__", (PyCFunction) bucket_getstate, METH_NOARGS,
      "__getstate__() -- Return the picklable state of the object"},
@@ -1711,6 +2445,15 @@ static struct PyMethodDef Bucket_methods[] = {
     {"keys", (PyCFunction) bucket_keys, METH_VARARGS | METH_KEYWORDS,
      "keys([min, max]) -- Return the keys"},
 
+    {"count", (PyCFunction) bucket_count, METH_VARARGS | METH_KEYWORDS,
+     "count([min, max]) -- Return the number of keys in the range"},
+
+    {"keys_buffer", (PyCFunction) bucket_keys_buffer, METH_NOARGS,
+     "keys_buffer() -- Return a read-only memoryview of the keys"},
+
+    {"values_buffer", (PyCFunction) bucket_values_buffer, METH_NOARGS,
+     "values_buffer() -- Return a read-only memoryview of the values"},
+
     {"has_key", (PyCFunction) bucket_has_key, METH_O,
      "has_key(key) -- Test whether the bucket contains the given key"},
 
@@ -1734,14 +2477,29 @@ static struct PyMethodDef Bucket_methods[] = {
     {"items", (PyCFunction) bucket_items, METH_VARARGS | METH_KEYWORDS,
      "items([min, max])) -- Return the items"},
 
-    {"byValue", (PyCFunction) bucket_byValue, METH_O,
-     "byValue(min) -- "
-     "Return value-keys with values >= min and reverse sorted by values"},
+    {"byValue", (PyCFunction) bucket_byValue, METH_VARARGS | METH_KEYWORDS,
+     "byValue(min, limit=None) -- "
+     "Return value-keys with values >= min and reverse sorted by values\n\n"
+     "If limit is given, return only the first limit pairs."},
+
+    {"topk", (PyCFunction) bucket_topk, METH_VARARGS | METH_KEYWORDS,
+     "topk(k, min=None) -- "
+     "Return the k value-keys with the largest values\n\n"
+     "They are reverse sorted by values, which are not normalized.\n"
+     "If min is given, values < min are omitted."},
 
     {"get", (PyCFunction) bucket_getm, METH_VARARGS,
      "get(key[,default]) -- Look up a value\n\n"
      "Return the default (or None) if the key is not found."},
 
+    {"get_many", (PyCFunction) bucket_get_many, METH_VARARGS | METH_KEYWORDS,
+     "get_many(keys[,default]) -- Look up many values\n\n"
+     "Return the values for keys, with the default (or None) for keys\n"
+     "that are not found."},
+
+    {"contains_many", (PyCFunction) bucket_contains_many, METH_O,
+     "contains_many(keys) -- Test whether the bucket contains each key"},
+
     {"setdefault", (PyCFunction) bucket_setdefault, METH_VARARGS,
      "D.setdefault(k, d) -> D.get(k, d), also set D[k]=d if k not in D.\n\n"
      "Return the value like get() except that if key is missing, d is both\n"
@@ -2013,3 +2771,30 @@ nextBucket(SetIteration *i)
 
     return 0;
 }
+
+/* The SetIteration seek() for a bucket or set, whose i->position is the
+ * offset of the next key.
+ */
+static int
+seekBucket(SetIteration *i, KEY_TYPE key)
+{
+    int cmp, found, offset;
+
+    /* Start, so that the current key is one next() releases. */
+    if (i->position == 0 && i->next(i) < 0)
+        return -1;
+    if (i->position < 0)
+        return 0;
+    TEST_KEY_SET_OR(cmp, i->key, key) return -1;
+    if (cmp >= 0)
+        return 0;
+    UNLESS(PER_USE(BUCKET(i->set)))
+        return -1;
+    offset = _bucket_gallop(BUCKET(i->set), i->position, key, &found);
+    PER_UNUSE(BUCKET(i->set));
+    if (offset < 0)
+        return -1;
+    /* next() releases the current key and takes the one at offset. */
+    i->position = offset;
+    return i->next(i);
+}
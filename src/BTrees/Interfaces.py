@@ -45,6 +45,20 @@ class IKeyed(ICollection):
         Return a true value if the key is present, else a false value.
         """
 
+    def contains_many(keys):
+        """Check whether the object has an item for each of the given keys.
+
+        Return a list of booleans, one for each key in the iterable
+        *keys*, in order.
+
+        For integer keys, *keys* may also be an object supporting the
+        buffer protocol holding C integers of the key type, such as an
+        :class:`array.array`, or untyped bytes to be read as such. The
+        result is then an ``array('B')`` of 0s and 1s.
+
+        .. versionadded:: 6.2
+        """
+
     def keys(min=None, max=None, excludemin=False, excludemax=False):
         """
         Return an :mod:`IMinimalSequence <zope.interface.common.sequence>`
@@ -71,6 +85,17 @@ class IKeyed(ICollection):
         largest key is excluded.
         """
 
+    def count(min=None, max=None, excludemin=False, excludemax=False):
+        """
+        Return the number of keys :meth:`keys` would return for the same
+        arguments, without creating them.
+
+        For a BTree or TreeSet with ``counted`` set, this takes time
+        logarithmic in the size of the tree.
+
+        .. versionadded:: 6.2
+        """
+
     def maxKey(key=None):
         """Return the maximum key.
 
@@ -198,12 +223,61 @@ class ISet(ISetMutable, IKeySequence):
     A set of unique items stored in a single persistent object.
     """
 
+    def keys_buffer():
+        """
+        Return a read-only :class:`memoryview` of the keys.
+
+        See :meth:`IBucket.keys_buffer`.
+
+        .. versionadded:: 6.2
+        """
+
 
 class ITreeSet(ISetMutable):
     """
     A set of unique items stored in a tree of persistent objects.
     """
 
+    def fromSorted(items, fill_factor=1.0):
+        """
+        Class method: return a new tree set built from *items*.
+
+        *items* must iterate the keys in strictly increasing order,
+        otherwise :class:`ValueError` is raised. The buckets are packed
+        from left to right, each filled to *fill_factor* (a number in
+        the range ``(0, 1]``) of the maximum bucket size, and the
+        interior nodes are then built above them. This is much faster
+        than adding the keys one at a time, and produces a tree with
+        predictable fill. A *fill_factor* less than 1 leaves room for
+        later insertions without immediate bucket splits.
+
+        .. versionadded:: 6.2
+        """
+
+    def rank(key):
+        """
+        Return the number of keys in the set less than *key*.
+
+        If *key* is present, this is its position in the sorted keys.
+
+        .. versionadded:: 6.2
+        """
+
+    def select(index):
+        """
+        Return the key at position *index* of the sorted keys.
+
+        Negative indexes count from the end, as for a sequence, and
+        :class:`IndexError` is raised if *index* is out of range.
+
+        For a tree with ``counted`` set, this and :meth:`rank`, as well
+        as indexing the result of ``keys()``, ``values()`` and
+        ``items()``, take time logarithmic in the size of the tree.
+        Otherwise they walk the buckets.
+
+        .. versionadded:: 6.2
+        """
+
 
 class IMinimalDictionary(IKeyed, IMapping):
     """
@@ -220,6 +294,22 @@ class IMinimalDictionary(IKeyed, IMapping):
         false with the given key.
         """
 
+    def get_many(keys, default=None):
+        """Get the values associated with each of the given keys.
+
+        Return a list with the value for each key in the iterable
+        *keys*, in order, or *default* for keys that are not present.
+
+        For integer keys, *keys* may also be an object supporting the
+        buffer protocol, as for
+        :meth:`~BTrees.Interfaces.IKeyed.contains_many`. If the values
+        are integers or floats too, the result is then an
+        :class:`array.array` of the value type, and *default* must be
+        such a value; ``None`` stands for zero.
+
+        .. versionadded:: 6.2
+        """
+
     def __getitem__(key):
         """Get the value associated with the given key.
 
@@ -297,6 +387,60 @@ class IMinimalDictionary(IKeyed, IMapping):
         excluded.
         """
 
+    def iterkeys(min=None, max=None, excludemin=False, excludemax=False):
+        """
+        Return an iterator over the keys :meth:`keys` would return for
+        the same arguments.
+
+        The iterator, like those returned by :meth:`itervalues`,
+        :meth:`iteritems` and ``iter()`` (also for sets), has a
+        ``seek(key)`` method that skips ahead to the first key in the
+        range that isn't less than *key*. It never moves back. A BTree
+        finds that key through its interior nodes, without visiting the
+        buckets skipped.
+
+        .. versionchanged:: 6.2
+           Add the ``seek`` method of the iterator.
+        """
+
+    def itervalues(min=None, max=None, excludemin=False, excludemax=False):
+        """
+        Return an iterator over the values :meth:`values` would return
+        for the same arguments.
+        """
+
+    def iteritems(min=None, max=None, excludemin=False, excludemax=False):
+        """
+        Return an iterator over the items :meth:`items` would return for
+        the same arguments.
+        """
+
+
+class IBucket(IMinimalDictionary):
+    """
+    A mapping stored in a single persistent object.
+
+    .. versionadded:: 6.2
+    """
+
+    def keys_buffer():
+        """
+        Return a read-only :class:`memoryview` of the keys.
+
+        The view's format is the :mod:`array` typecode of the keys, and
+        it holds a copy made without creating an object per key. Only
+        available when the keys are native numbers (integers);
+        otherwise :class:`TypeError` is raised.
+        """
+
+    def values_buffer():
+        """
+        Return a read-only :class:`memoryview` of the values.
+
+        This is like :meth:`keys_buffer`, and is available when the
+        values are native numbers (integers or floats).
+        """
+
 
 class IDictionaryIsh(IMinimalDictionary):
 
@@ -308,12 +452,34 @@ class IDictionaryIsh(IMinimalDictionary):
         (key, value) pairs.
         """
 
-    def byValue(minValue):
+    def byValue(minValue, limit=None):
         """Return a sequence of (value, key) pairs, sorted by value.
 
         Values < minValue are omitted and other values are "normalized" by
         the minimum value.  This normalization may be a noop, but, for
         integer values, the normalization is division.
+
+        If *limit* is given, only the first *limit* pairs, those with the
+        largest values, are returned.  The other pairs aren't sorted or
+        created, which is much faster when *limit* is small.
+
+        .. versionchanged:: 6.2
+           Add the *limit* argument.
+        """
+
+    def topk(k, min=None):
+        """Return a list of the *k* (value, key) pairs with the largest
+        values, sorted by value, largest first.
+
+        Pairs with equal values are sorted by key, largest first, as in
+        :meth:`byValue`.  Unlike :meth:`byValue`, the values are not
+        normalized.  If *min* is given, values < *min* are omitted.
+
+        Only *k* pairs are kept while the items are scanned, so this takes
+        time linear in the size of the collection and memory for *k*
+        pairs.
+
+        .. versionadded:: 6.2
         """
 
     def setdefault(key, d):
@@ -367,6 +533,79 @@ class IBTree(IDictionaryIsh):
               key=generate_key()
         """
 
+    def fromSorted(items, fill_factor=1.0):
+        """
+        Class method: return a new BTree built from *items*.
+
+        *items* is a sequence of ``(key, value)`` 2-tuples, or an object
+        with an ``items`` method returning one, in strictly increasing
+        key order; otherwise :class:`ValueError` is raised. The buckets
+        are packed from left to right, each filled to *fill_factor* (a
+        number in the range ``(0, 1]``) of the maximum bucket size, and
+        the interior nodes are then built above them. This is much
+        faster than inserting the items one at a time, and produces a
+        tree with predictable fill. A *fill_factor* less than 1 leaves
+        room for later insertions without immediate bucket splits.
+
+        .. versionadded:: 6.2
+        """
+
+    def from_arrays(keys, values, fill_factor=1.0):
+        """
+        Class method: return a new BTree built from buffers of keys and
+        values.
+
+        *keys* and *values* are objects supporting the buffer protocol,
+        such as :class:`array.array` objects or NumPy arrays, of the
+        same length and holding the native key and value types, or raw
+        bytes. The keys need not be sorted, and the last value given
+        for a key wins, as for :meth:`update`. The tree is then built
+        as by :meth:`fromSorted`, copying the data into the buckets
+        without creating an object per item. Only available when both
+        the keys and the values are native numbers; otherwise
+        :class:`TypeError` is raised.
+
+        .. versionadded:: 6.2
+        """
+
+    def to_arrays(min=None, max=None, excludemin=False, excludemax=False):
+        """
+        Return a 2-tuple of :class:`array.array` objects holding the
+        keys and the values that :meth:`items` would return for the
+        same arguments.
+
+        Each bucket in the range is copied as a block, without creating
+        an object per item. Only available when both the keys and the
+        values are native numbers; otherwise :class:`TypeError` is
+        raised.
+
+        .. versionadded:: 6.2
+        """
+
+    def rank(key):
+        """
+        Return the number of keys in the BTree less than *key*.
+
+        If *key* is present, this is its position in the sorted keys.
+
+        .. versionadded:: 6.2
+        """
+
+    def select(index):
+        """
+        Return the key at position *index* of the sorted keys.
+
+        Negative indexes count from the end, as for a sequence, and
+        :class:`IndexError` is raised if *index* is out of range.
+
+        For a tree with ``counted`` set, this and :meth:`rank`, as well
+        as indexing the result of ``keys()``, ``values()`` and
+        ``items()``, take time logarithmic in the size of the tree.
+        Otherwise they walk the buckets.
+
+        .. versionadded:: 6.2
+        """
+
     def __and__(other):
         """Shortcut for :meth:`~BTrees.Interfaces.IMerge.intersection`"""
 
@@ -403,7 +642,7 @@ class IMerge(Interface):
     mapping (Bucket and BTree) types.
     """
 
-    def difference(c1, c2):
+    def difference(c1, c2, out=None):
         """Return the keys or items in c1 for which there is no key in c2.
 
         If c1 is None, then None is returned.  If c2 is None, then c1
@@ -417,9 +656,22 @@ class IMerge(Interface):
 
         .. versionchanged:: 4.8.0
            Add support for *c2* to be an arbitrary iterable.
+        .. versionchanged:: 6.2
+           If *c2* is a BTrees collection with many times as many keys as
+           *c1*, the keys of *c1* are looked up in *c2* instead of
+           merging the two, so the buckets of *c2* between them aren't
+           visited.
+        .. versionchanged:: 6.2
+           With ``out='view'``, return a lazy view of the result
+           instead. Iterating the view merges the inputs as it goes.
+           Truth testing stops at the first key, while ``len()`` merges
+           all of the inputs, without storing the keys.
+           ``materialize(limit=None)`` returns the first *limit* keys
+           (or items) as the Set or Bucket described above. A view
+           treats a None input as empty.
         """
 
-    def union(c1, c2):
+    def union(c1, c2, out=None):
         """Compute the Union of c1 and c2.
 
         If c1 is None, then c2 is returned, otherwise, if c2 is None,
@@ -433,9 +685,16 @@ class IMerge(Interface):
 
         .. versionchanged:: 4.8.0
            Add support for arbitrary iterables.
+        .. versionchanged:: 6.2
+           With ``out='view'``, return a lazy view of the result
+           instead. Iterating the view merges the inputs as it goes.
+           Truth testing stops at the first key, while ``len()`` merges
+           all of the inputs, without storing the keys.
+           ``materialize(limit=None)`` returns the first *limit* keys
+           as a Set. A view treats a None input as empty.
         """
 
-    def intersection(c1, c2):
+    def intersection(c1, c2, out=None):
         """Compute the intersection of c1 and c2.
 
         If c1 is None, then c2 is returned, otherwise, if c2 is None,
@@ -449,6 +708,19 @@ class IMerge(Interface):
 
         .. versionchanged:: 4.8.0
            Add support for arbitrary iterables.
+        .. versionchanged:: 6.2
+           If one input is a BTrees collection with many times as many
+           keys as the other, the keys of the other are looked up in it
+           instead of merging the two, so the buckets between them
+           aren't visited.
+        .. versionchanged:: 6.2
+           With ``out='view'``, return a lazy view of the result
+           instead. Iterating the view merges the inputs as it goes.
+           Truth testing stops at the first key, while ``len()`` merges
+           all of the inputs, without storing the keys.
+           ``materialize(limit=None)`` returns the first *limit* keys
+           as a Set. With a None input, the view holds the keys of the
+           other input, as the result does without a view.
         """
 
 
@@ -562,7 +834,7 @@ class IMergeIntegerKey(IMerge):
     :class:`~BTrees.IIBTree.IIBTree`.
     """
 
-    def multiunion(seq):
+    def multiunion(seq, out=None):
         """Return union of (zero or more) integer sets, as an integer set.
 
         seq is a sequence of objects each convertible to an integer set.
@@ -580,12 +852,21 @@ class IMergeIntegerKey(IMerge):
           :meth:`BTrees.IOBTree.multiunion`).  The keys of the mapping are
           added to the union.
 
+        + A buffer, such as an :class:`array.array` or :class:`memoryview`,
+          of native integers of the key type (for example, ``array('q')``
+          for :meth:`BTrees.LLBTree.multiunion`).  The integers are
+          copied directly into the union.  Buffers of any other format are
+          iterated like any other iterable.
+
         + Any iterable Python object that iterates across integers. This
           will be slower than the above types.
 
         The union is returned as a Set from the same module (for example,
         :meth:`BTrees.IIBTree.multiunion` returns an
-        :class:`BTrees.IIBTree.IISet`).
+        :class:`BTrees.IIBTree.IISet`).  If *out* is ``'buffer'``, the
+        sorted integers are instead returned as a read-only
+        :class:`memoryview` of native integers of the key type, without
+        building a Set.
 
         The point to this method is that it can run much faster than doing a
         sequence of two-input :meth:`~BTrees.Interfaces.IMerge.union` calls.
@@ -595,6 +876,43 @@ class IMergeIntegerKey(IMerge):
 
         .. versionchanged:: 4.8.0
            Add support for arbitrary iterables of integers.
+
+        .. versionchanged:: 6.2
+           Add support for buffers of native integers, and the *out*
+           argument.
+        """
+
+    def multiintersection(seq):
+        """Return intersection of (zero or more) integer sets, as an integer
+        set.
+
+        seq is a sequence of objects each convertible to an integer set as
+        for :meth:`multiunion`.  The intersection is returned as a Set from
+        the same module; it is empty if seq is empty.
+
+        This can run much faster than doing a sequence of two-input
+        :meth:`~BTrees.Interfaces.IMerge.intersection` calls.  No
+        intermediate sets are built: the keys of the smallest input are
+        looked for in the others in increasing order, skipping ahead in
+        each input past the keys that can't be in the result.  BTrees and
+        TreeSets are searched in place, so the buckets skipped over aren't
+        loaded.
+
+        .. versionadded:: 6.2
+        """
+
+    def multidifference(base, seq):
+        """Return the keys of base that aren't in any of the integer sets
+        in seq, as an integer set.
+
+        base and the elements of seq are objects each convertible to an
+        integer set as for :meth:`multiunion`.  The difference is returned
+        as a Set from the same module, even if base is a mapping.
+
+        Like :meth:`multiintersection`, this skips ahead in each element
+        of seq instead of building intermediate sets.
+
+        .. versionadded:: 6.2
         """
 
 
@@ -614,6 +932,11 @@ class IBTreeFamily(Interface):
     OO = Attribute('The IObjectObjectBTreeModule for this family')
     OU = Attribute('The IObjectUnsignedBTreeModule for this family')
 
+    DD = Attribute('The IDoubleDoubleBTreeModule; the same in both families')
+    DI = Attribute('The IDoubleIntegerBTreeModule for this family')
+    DO = Attribute('The IDoubleObjectBTreeModule; the same in both families')
+    ID = Attribute('The IIntegerDoubleBTreeModule for this family')
+
     maxint = Attribute('The maximum signed integer storable in this family')
     maxuint = Attribute('The maximum unsigned integer storable in this family')
     minint = Attribute('The minimum signed integer storable in this family')
@@ -698,6 +1021,75 @@ class IObjectObjectBTreeModule(IBTreeModule, IMerge):
     """
 
 
+class IBytesObjectBTreeModule(IBTreeModule, IMerge):
+    """Keys, or set values, are bytes of a fixed size; values are objects.
+
+    The keys are stored in the buckets themselves, rather than as
+    Python objects, and compared like the bytes objects they come from.
+    Describes bOBTree (8-byte keys, such as ZODB object ids) and gOBTree
+    (16-byte keys, such as UUIDs).
+
+    .. versionadded:: 6.2
+    """
+
+
+class IStringObjectBTreeModule(IBTreeModule, IMerge):
+    """Keys, or set values, are str; values are objects.
+
+    Keys are compared directly as strings, without the rich comparison
+    protocol, so lookups avoid the overhead of comparing arbitrary
+    objects. Describes SOBTree.
+
+    .. versionadded:: 6.2
+    """
+
+
+class IStringIntegerBTreeModule(_IMergeBTreeModule):
+    """Keys, or set values, are str; values are signed ints.
+
+    Keys are compared as for `IStringObjectBTreeModule`. Describes
+    SIBTree.
+
+    .. versionadded:: 6.2
+    """
+
+
+class IDoubleObjectBTreeModule(_IMergeBTreeModule):
+    """Keys, or set values, are 64-bit floats; values are objects.
+
+    NaN is not a valid key. Describes DOBTree.
+
+    .. versionadded:: 6.2
+    """
+
+
+class IDoubleDoubleBTreeModule(_IMergeBTreeModule):
+    """Keys, or set values, and values are 64-bit floats.
+
+    NaN is not a valid key. Describes DDBTree.
+
+    .. versionadded:: 6.2
+    """
+
+
+class IDoubleIntegerBTreeModule(_IMergeBTreeModule):
+    """Keys, or set values, are 64-bit floats; values are signed ints.
+
+    NaN is not a valid key. Describes DIBTree and DLBTree.
+
+    .. versionadded:: 6.2
+    """
+
+
+class IIntegerDoubleBTreeModule(_IMergeBTreeModule):
+    """Keys, or set values, are signed ints; values are 64-bit floats.
+
+    Describes IDBTree and LDBTree.
+
+    .. versionadded:: 6.2
+    """
+
+
 class IIntegerFloatBTreeModule(_IMergeBTreeModule):
     """Keys, or set values, are signed ints; values are floats.
 
@@ -110,10 +110,16 @@ bucket_merge(Bucket *s1, Bucket *s2, Bucket *s3)
   mapping = i1.usesValue | i2.usesValue | i3.usesValue;
   set = !mapping;
 
+  /* Make the result of the same type as the inputs (when they are of the
+     right kind), so its state has the same format. */
   if (mapping)
-    r = (Bucket *)PyObject_CallObject((PyObject *)&BucketType, NULL);
+    r = (Bucket *)PyObject_CallObject(
+        PyObject_IsInstance(OBJECT(s1), OBJECT(&BucketType))
+        ? OBJECT(Py_TYPE(s1)) : OBJECT(&BucketType), NULL);
   else
-    r = (Bucket *)PyObject_CallObject((PyObject *)&SetType, NULL);
+    r = (Bucket *)PyObject_CallObject(
+        PyObject_IsInstance(OBJECT(s1), OBJECT(&SetType))
+        ? OBJECT(Py_TYPE(s1)) : OBJECT(&SetType), NULL);
   if (r == NULL)
     goto err;
 
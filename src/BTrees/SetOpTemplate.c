@@ -93,6 +93,8 @@ static int nextGenericKeyIter(SetIteration* i)
  *          iterate over s.
  *      i.position is set to 0.
  *      i.next is set to an appropriate iteration function.
+ *      i.seek is set to an appropriate seek function, or NULL if s
+ *          isn't a bucket, set, BTree or TreeSet.
  *      i.key and i.value are left alone.
  *
  * Internal
@@ -115,6 +117,7 @@ initSetIteration(SetIteration *i, PyObject *s, int useValues)
   i->set = NULL;
   i->position = -1;     /* set to 0 only on normal return */
   i->usesValue = 0;     /* assume it's a set or that values aren't iterated */
+  i->seek = NULL;
 
   if (PyObject_IsInstance(s, (PyObject *)&BucketType))
     {
@@ -128,31 +131,31 @@ initSetIteration(SetIteration *i, PyObject *s, int useValues)
         }
       else
         i->next = nextSet;
+      i->seek = seekBucket;
     }
   else if (PyObject_IsInstance(s, (PyObject *)&SetType))
     {
       i->set = s;
       Py_INCREF(s);
       i->next = nextSet;
+      i->seek = seekBucket;
     }
   else if (PyObject_IsInstance(s, (PyObject *)&BTreeType))
     {
-      i->set = BTree_rangeSearch(BTREE(s), NULL, NULL, 'i');
+      i->set = buildBTreeIter(BTREE(s), NULL, NULL, 'i');
       UNLESS(i->set) return -1;
 
       if (useValues)
-        {
-          i->usesValue = 1;
-          i->next = nextBTreeItems;
-        }
-      else
-        i->next = nextTreeSetItems;
+        i->usesValue = 1;
+      i->next = nextBTreeIter;
+      i->seek = seekBTreeIter;
     }
   else if (PyObject_IsInstance(s, (PyObject *)&TreeSetType))
     {
-      i->set = BTree_rangeSearch(BTREE(s), NULL, NULL, 'k');
+      i->set = buildBTreeIter(BTREE(s), NULL, NULL, 'k');
       UNLESS(i->set) return -1;
-      i->next = nextTreeSetItems;
+      i->next = nextBTreeIter;
+      i->seek = seekBTreeIter;
     }
 #ifdef KEY_CHECK
   else if (KEY_CHECK(s))
@@ -230,6 +233,129 @@ copyRemaining(Bucket *r, SetIteration *i, int merge,
   return 0;
 }
 
+/* When one input of an intersection or difference has at least
+   GALLOP_RATIO times as many keys as the other, the smaller input is
+   iterated and the SetIteration of the larger one seeks each of its keys,
+   instead of merging the two.  So m keys are looked up in n in
+   O(m log n) time, and the buckets between them aren't visited.
+*/
+#define GALLOP_RATIO 8
+
+/* Return 1 if s is an instance of t1 or t2, 0 if it isn't, or -1 on
+   error.
+*/
+static int
+_instance_of_either(PyObject *s, PyTypeObject *t1, PyTypeObject *t2)
+{
+  int r = PyObject_IsInstance(s, OBJECT(t1));
+
+  return r ? r : PyObject_IsInstance(s, OBJECT(t2));
+}
+
+/* Return a cheap estimate of the number of keys of s, an input of a set
+   operation, or -1 if that isn't known.  Buckets, sets and counted trees
+   know their lengths.  Other trees are estimated from the lengths of the
+   nodes on their leftmost path, which are loaded anyway by a search.
+   Return -2 on error.
+*/
+static Py_ssize_t
+_set_operation_size(PyObject *s)
+{
+  Sized *node, *child;
+  Py_ssize_t size;
+  int counted, len, is_tree, r;
+
+  if ((r = _instance_of_either(s, &BucketType, &SetType)) < 0)
+    return -2;
+  if (r)
+    {
+      PER_USE_OR_RETURN(BUCKET(s), -2);
+      size = BUCKET(s)->len;
+      PER_UNUSE(BUCKET(s));
+      return size;
+    }
+  if ((r = _instance_of_either(s, &BTreeType, &TreeSetType)) < 0)
+    return -2;
+  if (r)
+    {
+      if ((counted = _BTree_counted(BTREE(s))) < 0)
+        return -2;
+      if (counted)
+        {
+          size = BTree_length_or_nonzero(BTREE(s), 0);
+          return size < 0 ? -2 : size;
+        }
+
+      size = 1;
+      node = SIZED(s);
+      Py_INCREF(node);
+      for (;;)
+        {
+          is_tree = SameType_Check(s, node);
+          UNLESS (PER_USE(node))
+            {
+              Py_DECREF(node);
+              return -2;
+            }
+          len = node->len;
+          child = (is_tree && len) ? BTREE(node)->data[0].child : NULL;
+          Py_XINCREF(child);
+          PER_UNUSE(node);
+          Py_DECREF(node);
+          if (len == 0)
+            return 0;
+          size = (size > PY_SSIZE_T_MAX / len) ? PY_SSIZE_T_MAX : size * len;
+          if (child == NULL)
+            return size;
+          node = child;
+        }
+    }
+#ifdef KEY_CHECK
+  if (KEY_CHECK(s))
+    return 1;
+#endif
+  size = PyObject_Size(s);
+  if (size < 0)
+    {
+      if (! PyErr_ExceptionMatches(PyExc_TypeError))
+        return -2;
+      PyErr_Clear();
+    }
+  return size;
+}
+
+/* Decide whether an intersection (c12 only) or difference (c1 only) of s1
+   and s2, iterated by i1 and i2, should look up the keys of one in the
+   other.  Return 1 to look up the keys of s2 in s1, 2 to look up those of
+   s1 in s2, 0 to merge them, or -1 on error.
+*/
+static int
+_set_operation_gallop(PyObject *s1, SetIteration *i1,
+                      PyObject *s2, SetIteration *i2,
+                      int c1, int c12, int c2)
+{
+  Py_ssize_t size1, size2;
+  int seekable1, seekable2;
+
+  if (c2 || c1 == c12)
+    return 0;
+  seekable1 = c12 && i1->seek != NULL;
+  seekable2 = i2->seek != NULL;
+  if (! (seekable1 || seekable2))
+    return 0;
+
+  if ((size1 = _set_operation_size(s1)) < -1 ||
+      (size2 = _set_operation_size(s2)) < -1)
+    return -1;
+  if (size1 < 0 || size2 < 0)
+    return 0;
+  if (seekable2 && size2 / GALLOP_RATIO >= size1)
+    return 2;
+  if (seekable1 && size1 / GALLOP_RATIO >= size2)
+    return 1;
+  return 0;
+}
+
 /* This is the workhorse for all set merge operations:  the weighted and
  * unweighted flavors of union and intersection, and set difference.  The
  * algorithm is conceptually simple but the code is complicated due to all
@@ -282,7 +408,9 @@ set_operation(PyObject *s1, PyObject *s2,
 {
   Bucket *r=0;
   SetIteration i1 = {0,0,0}, i2 = {0,0,0};
-  int cmp, merge;
+  SetIteration *drive, *probe;
+  PyObject *o;
+  int cmp, merge, gallop, found;
 
   if (initSetIteration(&i1, s1, usevalues1) < 0) goto err;
   if (initSetIteration(&i2, s2, usevalues2) < 0) goto err;
@@ -308,6 +436,7 @@ set_operation(PyObject *s1, PyObject *s2,
           t=i1; i1=i2; i2=t;
           i=c1; c1=c2; c2=i;
           v=w1; w1=w2; w2=v;
+          o=s1; s1=s2; s2=o;
         }
 #ifdef MERGE_DEFAULT
       i1.value=MERGE_DEFAULT;
@@ -332,6 +461,54 @@ set_operation(PyObject *s1, PyObject *s2,
         goto err;
     }
 
+  if ((gallop = _set_operation_gallop(s1, &i1, s2, &i2, c1, c12, c2)) < 0)
+    goto err;
+  if (gallop)
+    {
+      /* Look up the keys of the smaller input in the larger one. */
+      drive = gallop == 1 ? &i2 : &i1;
+      probe = gallop == 1 ? &i1 : &i2;
+      if (drive->next(drive) < 0) goto err;
+      while (drive->position >= 0)
+        {
+          if (probe->seek(probe, drive->key) < 0) goto err;
+          found = 0;
+          if (probe->position > 0)
+            {
+              TEST_KEY_SET_OR(cmp, probe->key, drive->key) goto err;
+              found = cmp == 0;
+            }
+          /* An intersection keeps the keys found, a difference the rest. */
+          if (found != c1)
+            {
+              if(r->len >= r->size && Bucket_grow(r, -1, ! merge) < 0) goto err;
+              COPY_KEY(r->keys[r->len], drive->key);
+              INCREF_KEY(r->keys[r->len]);
+              if (merge && c1)
+                {
+                  COPY_VALUE(r->values[r->len], MERGE_WEIGHT(i1.value, w1));
+                  INCREF_VALUE(r->values[r->len]);
+                }
+              else if (merge)
+                {
+#ifdef MERGE
+                  r->values[r->len] = MERGE(i1.value, w1, i2.value, w2);
+#else
+                  COPY_VALUE(r->values[r->len], i1.value);
+                  INCREF_VALUE(r->values[r->len]);
+#endif
+                }
+              r->len++;
+            }
+          /* As when merging, a key found isn't found again. */
+          if (found && probe->next(probe) < 0) goto err;
+          if (probe->position < 0 && ! c1)
+            break;
+          if (drive->next(drive) < 0) goto err;
+        }
+      goto done;
+    }
+
   if (i1.next(&i1) < 0) goto err;
   if (i2.next(&i2) < 0) goto err;
 
@@ -395,7 +572,7 @@ set_operation(PyObject *s1, PyObject *s2,
   if(c1 && copyRemaining(r, &i1, merge, w1) < 0) goto err;
   if(c2 && copyRemaining(r, &i2, merge, w2) < 0) goto err;
 
-
+ done:
   finiSetIteration(&i1);
   finiSetIteration(&i2);
 
@@ -413,13 +590,534 @@ set_operation(PyObject *s1, PyObject *s2,
   return NULL;
 }
 
+/* A SetOperationView is the lazy result of union, intersection or
+ * difference, returned when out='view' is passed.  It holds the two inputs
+ * and the kind of operation, and computes the keys of the result only as
+ * they are asked for:  iterating over part of it, or testing whether it's
+ * empty, reads only as much of the inputs as that takes, but len() merges
+ * all of them, counting the keys without storing them.  Inputs other than
+ * buckets, sets, BTrees and TreeSets are read into a sorted list when the
+ * view is created, and a None input is empty.  Where only the keys common
+ * to both inputs are kept, the keys skipped are sought rather than
+ * visited.  materialize() builds the Set or Bucket the operation would
+ * have returned, or its first keys.
+ */
+typedef struct
+{
+  PyObject_HEAD
+  PyObject *s1;           /* the first input */
+  PyObject *s2;           /* the second input */
+  int usevalues1;         /* keep the values of s1, if it has them */
+  int c1, c12, c2;        /* as for set_operation */
+} SetOpView;
+
+static PyTypeObject SetOpViewType;
+static PyTypeObject SetOpViewIterType;
+
+/* The state of a lazy merge of the inputs of a SetOperationView. */
+typedef struct
+{
+  SetIteration i1, i2;
+  int c1, c12, c2;
+  int pending;            /* advance i1 (bit 1), i2 (bit 2) before the next step */
+} SetOpMerge;
+
+/* Start merging the inputs of v.  Return 0, or -1 on error, after which
+   _SetOpMerge_fini must still be called.
+*/
+static int
+_SetOpMerge_init(SetOpMerge *m, SetOpView *v)
+{
+  m->i1.set = m->i2.set = NULL;
+  m->c1 = v->c1;
+  m->c12 = v->c12;
+  m->c2 = v->c2;
+  m->pending = 0;
+  if (initSetIteration(&m->i1, v->s1, v->usevalues1) < 0) return -1;
+  if (initSetIteration(&m->i2, v->s2, 0) < 0) return -1;
+  if (m->i1.next(&m->i1) < 0) return -1;
+  if (m->i2.next(&m->i2) < 0) return -1;
+  return 0;
+}
+
+static void
+_SetOpMerge_fini(SetOpMerge *m)
+{
+  finiSetIteration(&m->i1);
+  finiSetIteration(&m->i2);
+}
+
+/* Visit the objects a merge holds references to, for the garbage
+   collector.
+*/
+static int
+_SetOpMerge_traverse(SetOpMerge *m, visitproc visit, void *arg)
+{
+  SetIteration *its[2] = {&m->i1, &m->i2};
+  int k;
+
+  for (k = 0; k < 2; k++)
+    {
+      Py_VISIT(its[k]->set);
+      if (its[k]->set == NULL || its[k]->position <= 0)
+        continue;
+#ifdef KEY_TYPE_IS_PYOBJECT
+      Py_VISIT(its[k]->key);
+#endif
+#ifdef VALUE_TYPE_IS_PYOBJECT
+      if (its[k]->usesValue)
+        Py_VISIT(its[k]->value);
+#endif
+    }
+  return 0;
+}
+
+/* Move i to the first key >= key, which is only a step away when i can't
+   seek.
+*/
+static int
+_SetOpMerge_skip(SetIteration *i, KEY_TYPE key)
+{
+  return i->seek != NULL ? i->seek(i, key) : i->next(i);
+}
+
+/* Find the next key of the result.  Return the SetIteration whose current
+   key it is (i1, when both inputs have it), or NULL at the end or, with an
+   exception set, on error.
+*/
+static SetIteration *
+_SetOpMerge_next(SetOpMerge *m)
+{
+  SetIteration *i1 = &m->i1, *i2 = &m->i2;
+  int cmp;
+
+  if ((m->pending & 1) && i1->next(i1) < 0) return NULL;
+  if ((m->pending & 2) && i2->next(i2) < 0) return NULL;
+  m->pending = 0;
+
+  for (;;)
+    {
+      if (i1->position < 0)
+        {
+          if (! m->c2 || i2->position < 0) return NULL;
+          m->pending = 2;
+          return i2;
+        }
+      if (i2->position < 0)
+        {
+          if (! m->c1) return NULL;
+          m->pending = 1;
+          return i1;
+        }
+      TEST_KEY_SET_OR(cmp, i1->key, i2->key) return NULL;
+      if (cmp < 0)
+        {
+          if (m->c1)
+            {
+              m->pending = 1;
+              return i1;
+            }
+          if (_SetOpMerge_skip(i1, i2->key) < 0) return NULL;
+        }
+      else if (cmp == 0)
+        {
+          if (m->c12)
+            {
+              m->pending = 3;
+              return i1;
+            }
+          if (i1->next(i1) < 0) return NULL;
+          if (i2->next(i2) < 0) return NULL;
+        }
+      else
+        {
+          if (m->c2)
+            {
+              m->pending = 2;
+              return i2;
+            }
+          if (_SetOpMerge_skip(i2, i1->key) < 0) return NULL;
+        }
+    }
+}
+
+/* Return a new reference to s, an input of a SetOperationView, or, if it
+   isn't a bucket, set, BTree, TreeSet or key, to a sorted list of its
+   keys, so that an iterator is only read once.  None is an empty list.
+   Return NULL on error.
+*/
 static PyObject *
-difference_m(PyObject *ignored, PyObject *args)
+_set_operation_view_input(PyObject *s)
 {
-  PyObject *o1, *o2;
+  PyObject *list;
+  int r;
+
+  if (s == Py_None)
+    return PyList_New(0);
+  if ((r = _instance_of_either(s, &BucketType, &SetType)) == 0)
+    r = _instance_of_either(s, &BTreeType, &TreeSetType);
+  if (r < 0)
+    return NULL;
+  if (r)
+    {
+      Py_INCREF(s);
+      return s;
+    }
+#ifdef KEY_CHECK
+  if (KEY_CHECK(s))
+    {
+      Py_INCREF(s);
+      return s;
+    }
+#endif
+  UNLESS (list = PySequence_List(s))
+    return NULL;
+  if (PyList_Sort(list) < 0)
+    {
+      Py_DECREF(list);
+      return NULL;
+    }
+  return list;
+}
 
-  UNLESS(PyArg_ParseTuple(args, "OO", &o1, &o2)) return NULL;
+/* Return a new SetOperationView, or NULL on error.  The inputs are
+   checked as set_operation would check them.
+*/
+static PyObject *
+set_operation_view(PyObject *s1, PyObject *s2, int usevalues1,
+                   int c1, int c12, int c2)
+{
+  SetOpView *v;
+  SetOpMerge m;
 
+  UNLESS (s1 = _set_operation_view_input(s1))
+    return NULL;
+  UNLESS (s2 = _set_operation_view_input(s2))
+    {
+      Py_DECREF(s1);
+      return NULL;
+    }
+  UNLESS (v = PyObject_GC_New(SetOpView, &SetOpViewType))
+    {
+      Py_DECREF(s1);
+      Py_DECREF(s2);
+      return NULL;
+    }
+  v->s1 = s1;
+  v->s2 = s2;
+  v->usevalues1 = usevalues1;
+  v->c1 = c1;
+  v->c12 = c12;
+  v->c2 = c2;
+  PyObject_GC_Track(v);
+
+  if (_SetOpMerge_init(&m, v) < 0)
+    Py_CLEAR(v);
+  _SetOpMerge_fini(&m);
+  return OBJECT(v);
+}
+
+static int
+SetOpView_traverse(SetOpView *self, visitproc visit, void *arg)
+{
+  Py_VISIT(self->s1);
+  Py_VISIT(self->s2);
+  return 0;
+}
+
+static int
+SetOpView_clear(SetOpView *self)
+{
+  Py_CLEAR(self->s1);
+  Py_CLEAR(self->s2);
+  return 0;
+}
+
+static void
+SetOpView_dealloc(SetOpView *self)
+{
+  PyObject_GC_UnTrack(self);
+  SetOpView_clear(self);
+  PyObject_GC_Del(self);
+}
+
+/* The iterator over the keys of a SetOperationView. */
+typedef struct
+{
+  PyObject_HEAD
+  SetOpView *view;        /* keeps the inputs alive */
+  SetOpMerge merge;
+} SetOpViewIter;
+
+static PyObject *
+SetOpView_iter(SetOpView *self)
+{
+  SetOpViewIter *it;
+
+  UNLESS (it = PyObject_GC_New(SetOpViewIter, &SetOpViewIterType))
+    return NULL;
+  Py_INCREF(self);
+  it->view = self;
+  if (_SetOpMerge_init(&it->merge, self) < 0)
+    {
+      PyObject_GC_Track(it);
+      Py_DECREF(it);
+      return NULL;
+    }
+  PyObject_GC_Track(it);
+  return OBJECT(it);
+}
+
+static int
+SetOpViewIter_traverse(SetOpViewIter *it, visitproc visit, void *arg)
+{
+  Py_VISIT(it->view);
+  return _SetOpMerge_traverse(&it->merge, visit, arg);
+}
+
+static int
+SetOpViewIter_clear(SetOpViewIter *it)
+{
+  _SetOpMerge_fini(&it->merge);
+  Py_CLEAR(it->view);
+  return 0;
+}
+
+static void
+SetOpViewIter_dealloc(SetOpViewIter *it)
+{
+  PyObject_GC_UnTrack(it);
+  SetOpViewIter_clear(it);
+  PyObject_GC_Del(it);
+}
+
+static PyObject *
+SetOpViewIter_next(SetOpViewIter *it)
+{
+  SetIteration *i;
+  PyObject *key;
+
+  UNLESS (i = _SetOpMerge_next(&it->merge))
+    return NULL;
+  COPY_KEY_TO_OBJECT(key, i->key);
+  return key;
+}
+
+/* Count the keys of the result, up to limit if it isn't negative.  Return
+   the count, or -1 on error.
+*/
+static Py_ssize_t
+_SetOpView_count(SetOpView *self, Py_ssize_t limit)
+{
+  SetOpMerge m;
+  Py_ssize_t n = 0;
+
+  if (_SetOpMerge_init(&m, self) < 0)
+    goto err;
+  while (n != limit && _SetOpMerge_next(&m) != NULL)
+    n++;
+  if (PyErr_Occurred())
+    goto err;
+  _SetOpMerge_fini(&m);
+  return n;
+
+ err:
+  _SetOpMerge_fini(&m);
+  return -1;
+}
+
+static Py_ssize_t
+SetOpView_length(SetOpView *self)
+{
+  return _SetOpView_count(self, -1);
+}
+
+static int
+SetOpView_nonzero(SetOpView *self)
+{
+  /* Stop at the first key. */
+  Py_ssize_t n = _SetOpView_count(self, 1);
+
+  return n < 0 ? -1 : (int)n;
+}
+
+static PyObject *
+SetOpView_materialize(SetOpView *self, PyObject *args, PyObject *kw)
+{
+  static char *kwlist[] = {"limit", NULL};
+  PyObject *olimit = Py_None;
+  SetOpMerge m;
+  SetIteration *i;
+  Bucket *r = NULL;
+  Py_ssize_t limit;
+  int merge;
+
+  UNLESS (PyArg_ParseTupleAndKeywords(args, kw, "|O", kwlist, &olimit))
+    return NULL;
+
+  if (olimit == Py_None)
+    return set_operation(self->s1, self->s2, self->usevalues1, 0,
+                         1, 1, self->c1, self->c12, self->c2);
+
+  /* Clamp huge limits, which can't be reached anyway. */
+  limit = PyNumber_AsSsize_t(olimit, NULL);
+  if (limit == -1 && PyErr_Occurred())
+    return NULL;
+  if (limit < 0)
+    {
+      PyErr_SetString(PyExc_ValueError, "limit must not be negative");
+      return NULL;
+    }
+
+  if (_SetOpMerge_init(&m, self) < 0)
+    goto err;
+  /* Only a difference keeps values, those of s1, which are current. */
+  merge = m.i1.usesValue;
+  UNLESS (r = BUCKET(PyObject_CallObject(OBJECT(merge ? &BucketType
+                                                      : &SetType), NULL)))
+    goto err;
+  while (r->len < limit && (i = _SetOpMerge_next(&m)) != NULL)
+    {
+      if (r->len >= r->size && Bucket_grow(r, -1, ! merge) < 0) goto err;
+      COPY_KEY(r->keys[r->len], i->key);
+      INCREF_KEY(r->keys[r->len]);
+      if (merge)
+        {
+          COPY_VALUE(r->values[r->len], i->value);
+          INCREF_VALUE(r->values[r->len]);
+        }
+      r->len++;
+    }
+  if (PyErr_Occurred())
+    goto err;
+  _SetOpMerge_fini(&m);
+  return OBJECT(r);
+
+ err:
+  _SetOpMerge_fini(&m);
+  Py_XDECREF(r);
+  return NULL;
+}
+
+static struct PyMethodDef SetOpView_methods[] = {
+  {"materialize", (PyCFunction)SetOpView_materialize,
+   METH_VARARGS | METH_KEYWORDS,
+   "materialize(limit=None)\n\n"
+   "Return the result as the Set or Bucket the operation returns without\n"
+   "out='view', or only its first limit keys."},
+
+  {NULL, NULL}          /* sentinel */
+};
+
+static PySequenceMethods SetOpView_as_sequence = {
+  (lenfunc)SetOpView_length,              /* sq_length */
+};
+
+static PyNumberMethods SetOpView_as_number = {
+  0,                                      /* nb_add */
+  0,                                      /* nb_subtract */
+  0,                                      /* nb_multiply */
+  0,                                      /* nb_remainder */
+  0,                                      /* nb_divmod */
+  0,                                      /* nb_power */
+  0,                                      /* nb_negative */
+  0,                                      /* nb_positive */
+  0,                                      /* nb_absolute */
+  (inquiry)SetOpView_nonzero              /* nb_bool */
+};
+
+static PyTypeObject SetOpViewType = {
+  PyVarObject_HEAD_INIT(NULL, 0)
+  MODULE_NAME MOD_NAME_PREFIX "SetOperationView", /* tp_name */
+  sizeof(SetOpView),                      /* tp_basicsize */
+  0,                                      /* tp_itemsize */
+  (destructor)SetOpView_dealloc,          /* tp_dealloc */
+  0,                                      /* tp_print */
+  0,                                      /* tp_getattr */
+  0,                                      /* tp_setattr */
+  0,                                      /* tp_compare */
+  0,                                      /* tp_repr */
+  &SetOpView_as_number,                   /* tp_as_number */
+  &SetOpView_as_sequence,                 /* tp_as_sequence */
+  0,                                      /* tp_as_mapping */
+  0,                                      /* tp_hash */
+  0,                                      /* tp_call */
+  0,                                      /* tp_str */
+  PyObject_GenericGetAttr,                /* tp_getattro */
+  0,                                      /* tp_setattro */
+  0,                                      /* tp_as_buffer */
+  Py_TPFLAGS_DEFAULT | Py_TPFLAGS_HAVE_GC, /* tp_flags */
+  "The lazy result of a set operation.",  /* tp_doc */
+  (traverseproc)SetOpView_traverse,       /* tp_traverse */
+  (inquiry)SetOpView_clear,               /* tp_clear */
+  0,                                      /* tp_richcompare */
+  0,                                      /* tp_weaklistoffset */
+  (getiterfunc)SetOpView_iter,            /* tp_iter */
+  0,                                      /* tp_iternext */
+  SetOpView_methods,                      /* tp_methods */
+};
+
+static PyTypeObject SetOpViewIterType = {
+  PyVarObject_HEAD_INIT(NULL, 0)
+  MODULE_NAME MOD_NAME_PREFIX "SetOperationViewIterator", /* tp_name */
+  sizeof(SetOpViewIter),                  /* tp_basicsize */
+  0,                                      /* tp_itemsize */
+  (destructor)SetOpViewIter_dealloc,      /* tp_dealloc */
+  0,                                      /* tp_print */
+  0,                                      /* tp_getattr */
+  0,                                      /* tp_setattr */
+  0,                                      /* tp_compare */
+  0,                                      /* tp_repr */
+  0,                                      /* tp_as_number */
+  0,                                      /* tp_as_sequence */
+  0,                                      /* tp_as_mapping */
+  0,                                      /* tp_hash */
+  0,                                      /* tp_call */
+  0,                                      /* tp_str */
+  PyObject_GenericGetAttr,                /* tp_getattro */
+  0,                                      /* tp_setattro */
+  0,                                      /* tp_as_buffer */
+  Py_TPFLAGS_DEFAULT | Py_TPFLAGS_HAVE_GC, /* tp_flags */
+  0,                                      /* tp_doc */
+  (traverseproc)SetOpViewIter_traverse,   /* tp_traverse */
+  (inquiry)SetOpViewIter_clear,           /* tp_clear */
+  0,                                      /* tp_richcompare */
+  0,                                      /* tp_weaklistoffset */
+  PyObject_SelfIter,                      /* tp_iter */
+  (iternextfunc)SetOpViewIter_next,       /* tp_iternext */
+};
+
+/* Parse the out argument of union, intersection and difference.  Return 1
+   for 'view', 0 for None, or -1 on error.
+*/
+static int
+_set_operation_out(PyObject *out)
+{
+  if (out == Py_None)
+    return 0;
+  if (PyUnicode_Check(out)
+      && PyUnicode_CompareWithASCIIString(out, "view") == 0)
+    return 1;
+  PyErr_Format(PyExc_ValueError,
+               "out must be None or 'view', not %R", out);
+  return -1;
+}
+
+static char *set_operation_kwlist[] = {"o1", "o2", "out", NULL};
+
+static PyObject *
+difference_m(PyObject *ignored, PyObject *args, PyObject *kw)
+{
+  PyObject *o1, *o2, *out = Py_None;
+  int as_view;
+
+  UNLESS(PyArg_ParseTupleAndKeywords(args, kw, "OO|O", set_operation_kwlist,
+                                     &o1, &o2, &out)) return NULL;
+  if ((as_view = _set_operation_out(out)) < 0) return NULL;
+
+  /* A view treats None as empty. */
+  if (as_view)
+    return set_operation_view(o1, o2, o1 != Py_None, 1, 0, 0);
 
   if (o1 == Py_None || o2 == Py_None)
     {
@@ -427,18 +1125,24 @@ difference_m(PyObject *ignored, PyObject *args)
       Py_INCREF(o1);
       return o1;
     }
-
   return set_operation(o1, o2, 1, 0, /* preserve values from o1, ignore o2's */
                        1, 0,         /* o1's values multiplied by 1 */
                        1, 0, 0);     /* take only keys unique to o1 */
 }
 
 static PyObject *
-union_m(PyObject *ignored, PyObject *args)
+union_m(PyObject *ignored, PyObject *args, PyObject *kw)
 {
-  PyObject *o1, *o2;
+  PyObject *o1, *o2, *out = Py_None;
+  int as_view;
+
+  UNLESS(PyArg_ParseTupleAndKeywords(args, kw, "OO|O", set_operation_kwlist,
+                                     &o1, &o2, &out)) return NULL;
+  if ((as_view = _set_operation_out(out)) < 0) return NULL;
 
-  UNLESS(PyArg_ParseTuple(args, "OO", &o1, &o2)) return NULL;
+  /* A view treats None as empty. */
+  if (as_view)
+    return set_operation_view(o1, o2, 0, 1, 1, 1);
 
   if (o1 == Py_None)
     {
@@ -450,18 +1154,30 @@ union_m(PyObject *ignored, PyObject *args)
       Py_INCREF(o1);
       return o1;
     }
-
   return set_operation(o1, o2, 0, 0,    /* ignore values in both */
                        1, 1,            /* the weights are irrelevant */
                        1, 1, 1);        /* take all keys */
 }
 
 static PyObject *
-intersection_m(PyObject *ignored, PyObject *args)
+intersection_m(PyObject *ignored, PyObject *args, PyObject *kw)
 {
-  PyObject *o1, *o2;
+  PyObject *o1, *o2, *out = Py_None;
+  int as_view;
+
+  UNLESS(PyArg_ParseTupleAndKeywords(args, kw, "OO|O", set_operation_kwlist,
+                                     &o1, &o2, &out)) return NULL;
+  if ((as_view = _set_operation_out(out)) < 0) return NULL;
+
+  /* As without out='view', intersecting with None keeps the keys of the
+     other input, so a view makes that a union with nothing.
+  */
+  if (as_view)
+    {
+      int with_none = o1 == Py_None || o2 == Py_None;
 
-  UNLESS(PyArg_ParseTuple(args, "OO", &o1, &o2)) return NULL;
+      return set_operation_view(o1, o2, 0, with_none, 1, with_none);
+    }
 
   if (o1 == Py_None)
     {
@@ -473,7 +1189,6 @@ intersection_m(PyObject *ignored, PyObject *args)
       Py_INCREF(o1);
       return o1;
     }
-
   return set_operation(o1, o2, 0, 0,    /* ignore values in both */
                        1, 1,            /* the weights are irrelevant */
                        0, 1, 0);        /* take only keys common to both */
@@ -532,23 +1247,132 @@ wintersection_m(PyObject *ignored, PyObject *args)
 #ifdef MULTI_INT_UNION
 #include "sorters.c"
 
+/* Append the keys of one input of multiunion (an integer set, a buffer
+   of native keys, or anything convertible to an integer set by the set
+   iteration protocol) to the result set, ignoring the possibility of
+   duplicates.  If overallocate is true, more input is expected, so grow
+   the result by more than is needed.  Return 0 on success, -1 on error.
+*/
+static int
+multiunion_append(Bucket *result, PyObject *set, int overallocate)
+{
+  SetIteration setiter = {0};
+  Py_buffer buffer;
+  int status;
+
+  /* If set is a bucket, do a straight resize + memcpy. */
+  if (set->ob_type == (PyTypeObject*)&SetType ||
+      set->ob_type == (PyTypeObject*)&BucketType)
+    {
+      Bucket *b = BUCKET(set);
+      status = 0;
+
+      UNLESS (PER_USE(b)) return -1;
+      if (b->len)
+        status = bucket_append(result, b, 0, b->len, 0, overallocate);
+      PER_UNUSE(b);
+      return status;
+    }
+
+  status = BTree_GetTypedBuffer(set, &buffer, KEY_TYPECODE, sizeof(KEY_TYPE));
+  if (status < 0)
+    return -1;
+  if (status) {
+    /* A buffer of native keys:  another straight resize + memcpy. */
+    Py_ssize_t len = buffer.len / (Py_ssize_t)sizeof(KEY_TYPE);
+
+    if (len > INT_MAX - result->len) {
+      PyBuffer_Release(&buffer);
+      PyErr_SetString(PyExc_OverflowError, "too many keys for a set");
+      return -1;
+    }
+    if (result->len + len > result->size) {
+      /* As for bucket_append, overallocate if more is coming. */
+      int newsize = result->len + (int)len;
+      if (overallocate && newsize <= INT_MAX - (newsize >> 2))
+        newsize += newsize >> 2;
+      if (Bucket_grow(result, newsize, 1) < 0) {
+        PyBuffer_Release(&buffer);
+        return -1;
+      }
+    }
+    if (len)
+      memcpy(result->keys + result->len, buffer.buf, len * sizeof(KEY_TYPE));
+    result->len += (int)len;
+    PyBuffer_Release(&buffer);
+    return 0;
+  }
+
+  /* No cheap way:  iterate over set's elements one at a time. */
+  if (initSetIteration(&setiter, set, 0) < 0) goto Error;
+  if (setiter.next(&setiter) < 0) goto Error;
+  while (setiter.position >= 0) {
+    if (result->len >= result->size && Bucket_grow(result, -1, 1) < 0)
+      goto Error;
+    COPY_KEY(result->keys[result->len], setiter.key);
+    ++result->len;
+    /* We know the key is an int, so no need to incref it. */
+    if (setiter.next(&setiter) < 0) goto Error;
+  }
+  finiSetIteration(&setiter);
+  return 0;
+
+ Error:
+  finiSetIteration(&setiter);
+  return -1;
+}
+
+/* Sort the keys of a set built by multiunion_append, removing duplicates
+   and resetting its len.  If the set shrinks (which happens if and only
+   if there are duplicates), no point to realloc'ing the set smaller, as
+   we expect it to be short-lived.
+*/
+static void
+multiunion_sort(Bucket *result)
+{
+  if (result->len > 0) {
+    size_t newlen;          /* number of elements in final result set */
+    newlen = sort_int_nodups(result->keys, (size_t)result->len);
+    result->len = (int)newlen;
+  }
+}
+
 /* Input is a sequence of integer sets (or convertible to sets by the
    set iteration protocol).  Output is the union of the sets.  The point
    is to run much faster than doing pairs of unions.
+
+   Buffers of native integers of the key type (for example, array.array
+   objects with the key typecode) are copied straight into the result.
+   If out is 'buffer', the result is returned as a read-only memoryview
+   of the sorted keys rather than as a set.
 */
 static PyObject *
-multiunion_m(PyObject *ignored, PyObject *args)
+multiunion_m(PyObject *ignored, PyObject *args, PyObject *kw)
 {
   PyObject *seq;          /* input sequence */
+  PyObject *out = Py_None; /* requested kind of result */
+  int as_buffer = 0;      /* return a buffer rather than a set? */
   int n;                  /* length of input sequence */
   PyObject *set = NULL;   /* an element of the input sequence */
   Bucket *result;         /* result set */
-  SetIteration setiter = {0};
+  PyObject *view;         /* result buffer */
   int i;
+  static char *kwlist[] = {"seq", "out", NULL};
 
-  UNLESS(PyArg_ParseTuple(args, "O", &seq))
+  UNLESS(PyArg_ParseTupleAndKeywords(args, kw, "O|O", kwlist, &seq, &out))
     return NULL;
 
+  if (out != Py_None) {
+    if (PyUnicode_Check(out)
+        && PyUnicode_CompareWithASCIIString(out, "buffer") == 0)
+      as_buffer = 1;
+    else {
+      PyErr_Format(PyExc_ValueError,
+                   "out must be None or 'buffer', not %R", out);
+      return NULL;
+    }
+  }
+
   n = PyObject_Length(seq);
   if (n < 0)
     return NULL;
@@ -564,54 +1388,284 @@ multiunion_m(PyObject *ignored, PyObject *args)
     set = PySequence_GetItem(seq, i);
     if (set == NULL)
       goto Error;
-
-    /* If set is a bucket, do a straight resize + memcpy. */
-    if (set->ob_type == (PyTypeObject*)&SetType ||
-        set->ob_type == (PyTypeObject*)&BucketType)
-      {
-        Bucket *b = BUCKET(set);
-        int status = 0;
-
-        UNLESS (PER_USE(b)) goto Error;
-        if (b->len)
-          status = bucket_append(result, b, 0, b->len, 0, i < n-1);
-        PER_UNUSE(b);
-        if (status < 0) goto Error;
-      }
-    else {
-      /* No cheap way:  iterate over set's elements one at a time. */
-      if (initSetIteration(&setiter, set, 0) < 0) goto Error;
-      if (setiter.next(&setiter) < 0) goto Error;
-      while (setiter.position >= 0) {
-        if (result->len >= result->size && Bucket_grow(result, -1, 1) < 0)
-          goto Error;
-        COPY_KEY(result->keys[result->len], setiter.key);
-        ++result->len;
-        /* We know the key is an int, so no need to incref it. */
-        if (setiter.next(&setiter) < 0) goto Error;
-      }
-      finiSetIteration(&setiter);
-    }
+    if (multiunion_append(result, set, i < n-1) < 0)
+      goto Error;
     Py_DECREF(set);
     set = NULL;
   }
 
-  /* Combine, sort, remove duplicates, and reset the result's len.
-     If the set shrinks (which happens if and only if there are
-     duplicates), no point to realloc'ing the set smaller, as we
-     expect the result set to be short-lived.
-  */
-  if (result->len > 0) {
-    size_t newlen;          /* number of elements in final result set */
-    newlen = sort_int_nodups(result->keys, (size_t)result->len);
-    result->len = (int)newlen;
+  /* Combine, sort, remove duplicates, and reset the result's len. */
+  multiunion_sort(result);
+  if (as_buffer) {
+    view = BTree_NewView(KEY_TYPECODE, (const char *)result->keys,
+                         (Py_ssize_t)result->len * sizeof(KEY_TYPE));
+    Py_DECREF(result);
+    return view;
   }
   return (PyObject *)result;
 
  Error:
   Py_DECREF(result);
   Py_XDECREF(set);
-  finiSetIteration(&setiter);
   return NULL;
 }
+
+/* One input of multiintersection or multidifference:  a SetIteration over
+   its keys, which can skip ahead with seek(), and the number of keys as
+   far as it's cheaply known (PY_SSIZE_T_MAX if not at all).
+*/
+typedef struct {
+  SetIteration it;
+  Py_ssize_t size;
+} MultiInput;
+
+/* Initialize in to iterate over the keys of input, and get its first key.
+   Buckets, sets, BTrees and TreeSets are iterated in place; any other
+   input is first collected into a sorted Set as multiunion would, so that
+   every input can seek.  Return 1 if the input has a current key, 0 if
+   it's empty, or -1 on error.  in must be finished with finiSetIteration
+   in any case.
+*/
+static int
+_MultiInput_init(MultiInput *in, PyObject *input)
+{
+  PyObject *set = NULL;
+  int r;
+
+  in->it.set = NULL;
+  if ((r = _instance_of_either(input, &BTreeType, &TreeSetType)) == 0)
+    r = _instance_of_either(input, &BucketType, &SetType);
+  if (r < 0)
+    return -1;
+  if (r == 0) {
+    set = PyObject_CallObject(OBJECT(&SetType), NULL);
+    if (set == NULL)
+      return -1;
+    if (multiunion_append(BUCKET(set), input, 0) < 0) {
+      Py_DECREF(set);
+      return -1;
+    }
+    multiunion_sort(BUCKET(set));
+    input = set;
+  }
+  in->size = _set_operation_size(input);
+  r = in->size < -1 ? -1 : initSetIteration(&in->it, input, 0);
+  Py_XDECREF(set);
+  if (r < 0)
+    return -1;
+  if (in->size < 0)
+    in->size = PY_SSIZE_T_MAX;
+  if (in->it.next(&in->it) < 0)
+    return -1;
+  return in->it.position >= 0;
+}
+
+/* Append key to the result set of multiintersection or multidifference.
+   The keys arrive in increasing order.  Return 0 on success, -1 on error.
+*/
+static int
+_multi_append_key(Bucket *result, KEY_TYPE key)
+{
+  if (result->len >= result->size && Bucket_grow(result, -1, 1) < 0)
+    return -1;
+  result->keys[result->len++] = key;
+  return 0;
+}
+
+/* Initialize an input for each item of seq, storing the array of them in
+   *ins (to be freed by _multi_inputs_fini) and their number in *n.
+   Return 1 if all the inputs have a current key, 0 if any is empty, or -1
+   on error.
+*/
+static int
+_multi_inputs_init(PyObject *seq, MultiInput **ins, int *n)
+{
+  PyObject *input;
+  int len, i, status, result = 1;
+
+  *ins = NULL;
+  *n = 0;
+  len = PyObject_Length(seq);
+  if (len < 0)
+    return -1;
+  if (len == 0)
+    return 1;
+  *ins = BTree_Malloc(sizeof(MultiInput) * len);
+  if (*ins == NULL)
+    return -1;
+  for (i = 0; i < len; ++i) {
+    input = PySequence_GetItem(seq, i);
+    if (input == NULL)
+      return -1;
+    status = _MultiInput_init(*ins + i, input);
+    ++*n;
+    Py_DECREF(input);
+    if (status < 0)
+      return -1;
+    if (status == 0)
+      result = 0;
+  }
+  return result;
+}
+
+static void
+_multi_inputs_fini(MultiInput *ins, int n)
+{
+  int i;
+
+  for (i = 0; i < n; ++i)
+    finiSetIteration(&ins[i].it);
+  free(ins);
+}
+
+/* Input is a sequence of integer sets (or convertible to sets as for
+   multiunion).  Output is the intersection of the sets, as a set.
+
+   The inputs are ordered from the smallest (as far as is cheaply known)
+   to the largest.  The keys of the smallest are then looked for in the
+   others in increasing order, each seeking ahead to the first key not
+   smaller than the current one; whenever an input has no match, the
+   smallest seeks ahead to that input's key in turn.  No intermediate sets
+   are built, and large runs of keys that can't be in the result are
+   skipped without being visited.
+*/
+static PyObject *
+multiintersection_m(PyObject *ignored, PyObject *args)
+{
+  PyObject *seq;          /* input sequence */
+  MultiInput *ins = NULL; /* an input for each item of seq */
+  MultiInput in;
+  SetIteration *it;
+  Bucket *result;         /* result set */
+  KEY_TYPE key;
+  int n = 0;              /* number of inputs */
+  int i, j, status;
+
+  UNLESS(PyArg_ParseTuple(args, "O", &seq))
+    return NULL;
+
+  result = BUCKET(PyObject_CallObject(OBJECT(&SetType), NULL));
+  if (result == NULL)
+    return NULL;
+
+  status = _multi_inputs_init(seq, &ins, &n);
+  if (status <= 0 || n == 0)
+    goto Done;
+
+  /* Order the inputs by size (a stable insertion sort, as n is small). */
+  for (i = 1; i < n; ++i) {
+    in = ins[i];
+    for (j = i; j > 0 && ins[j-1].size > in.size; --j)
+      ins[j] = ins[j-1];
+    ins[j] = in;
+  }
+
+  it = &ins[0].it;
+  for (;;) {
+    key = it->key;
+    for (i = 1; i < n; ++i) {
+      if ((status = ins[i].it.seek(&ins[i].it, key)) < 0)
+        goto Done;
+      if (ins[i].it.position < 0)
+        goto Done;
+      if (ins[i].it.key != key)
+        break;
+    }
+    if (i == n) {
+      /* Every input has key. */
+      if ((status = _multi_append_key(result, key)) < 0)
+        goto Done;
+      status = it->next(it);
+    }
+    else
+      status = it->seek(it, ins[i].it.key);
+    if (status < 0 || it->position < 0)
+      goto Done;
+  }
+
+ Done:
+  if (ins)
+    _multi_inputs_fini(ins, n);
+  if (status < 0) {
+    Py_DECREF(result);
+    return NULL;
+  }
+  return (PyObject *)result;
+}
+
+/* Input is an integer set base and a sequence of integer sets (each or
+   convertible to sets as for multiunion).  Output is the set of keys of
+   base that aren't in any of the sets.
+
+   The keys of base are looked for in each other input in increasing
+   order, seeking ahead as for multiintersection.  An input is dropped
+   once it's exhausted.
+*/
+static PyObject *
+multidifference_m(PyObject *ignored, PyObject *args)
+{
+  PyObject *base;         /* the input to take keys from */
+  PyObject *seq;          /* input sequence of keys to remove */
+  MultiInput *ins = NULL; /* an input for each item of seq */
+  MultiInput base_in;
+  SetIteration *it;
+  Bucket *result;         /* result set */
+  KEY_TYPE key;
+  int n = 0;              /* number of inputs */
+  int i, status, found;
+
+  UNLESS(PyArg_ParseTuple(args, "OO", &base, &seq))
+    return NULL;
+
+  result = BUCKET(PyObject_CallObject(OBJECT(&SetType), NULL));
+  if (result == NULL)
+    return NULL;
+
+  status = _MultiInput_init(&base_in, base);
+  if (status <= 0)
+    goto Done;
+  if ((status = _multi_inputs_init(seq, &ins, &n)) < 0)
+    goto Done;
+  /* Drop the empty inputs. */
+  for (i = 0; i < n; ) {
+    if (ins[i].it.position < 0) {
+      finiSetIteration(&ins[i].it);
+      ins[i] = ins[--n];
+    }
+    else
+      ++i;
+  }
+
+  it = &base_in.it;
+  for (;;) {
+    key = it->key;
+    found = 0;
+    for (i = 0; i < n && ! found; ) {
+      if ((status = ins[i].it.seek(&ins[i].it, key)) < 0)
+        goto Done;
+      if (ins[i].it.position < 0) {
+        /* Exhausted, so nothing more to remove. */
+        finiSetIteration(&ins[i].it);
+        ins[i] = ins[--n];
+        continue;
+      }
+      found = ins[i].it.key == key;
+      ++i;
+    }
+    if (! found && (status = _multi_append_key(result, key)) < 0)
+      goto Done;
+    if ((status = it->next(it)) < 0 || it->position < 0)
+      goto Done;
+  }
+
+ Done:
+  if (ins)
+    _multi_inputs_fini(ins, n);
+  finiSetIteration(&base_in.it);
+  if (status < 0) {
+    Py_DECREF(result);
+    return NULL;
+  }
+  return (PyObject *)result;
+}
 #endif
@@ -213,24 +213,113 @@ err:
     return result;
 }
 
+#ifdef KEY_TYPE_IS_INTEGER
+/* Decode the n keys of the delta state data (see _set_delta_state) into
+ * keys.  Return 0 on success, or -1 with an exception set if data is
+ * malformed or holds keys out of range.
+ */
+static int
+_set_delta_keys(PyObject *data, KEY_TYPE *keys, int n)
+{
+    const unsigned char *p, *end;
+    unsigned PY_LONG_LONG key = 0, delta;
+    int i;
+
+    p = (const unsigned char *)PyBytes_AS_STRING(data);
+    end = p + PyBytes_GET_SIZE(data);
+    for (i = 0; i < n; i++)
+    {
+        p = _BTree_get_varint(p, end, &delta);
+        if (p == NULL)
+            goto Malformed;
+        key += delta;
+        if ((KEY_TYPE)-1 < 0)
+        {
+            PY_LONG_LONG signed_key = (PY_LONG_LONG)key;
+            if ((PY_LONG_LONG)(KEY_TYPE)signed_key != signed_key)
+                goto Malformed;
+        }
+        else if ((unsigned PY_LONG_LONG)(KEY_TYPE)key != key)
+            goto Malformed;
+        keys[i] = (KEY_TYPE)key;
+    }
+    if (p == end)
+        return 0;
+
+Malformed:
+    PyErr_SetString(PyExc_TypeError, "delta state is malformed");
+    return -1;
+}
+#endif
+
 static int
 _set_setstate(Bucket *self, PyObject *args)
 {
-    PyObject *k, *items;
+    PyObject *k, *items, *data = NULL;
+#ifdef KEY_TYPE_IS_PYOBJECT
+    PyObject *shared = NULL;
+#endif
     Bucket *next=0;
     int i, l, copied=1;
     KEY_TYPE *keys;
 
-    UNLESS (PyArg_ParseTuple(args, "O|O", &items, &next))
+    UNLESS (PyArg_ParseTuple(args, "O|OO", &items, &next, &data))
         return -1;
 
-    if (!PyTuple_Check(items)) {
+#ifdef KEY_TYPECODE
+#ifdef KEY_TYPE_IS_INTEGER
+    if (PyLong_Check(items)) {
+        /* Delta state:  (len, data[, next]). */
+        Py_ssize_t n = PyLong_AsSsize_t(items);
+
+        if (n == -1 && PyErr_Occurred())
+            return -1;
+        k = data;
+        data = OBJECT(next);
+        next = BUCKET(k);
+        /* Each key takes at least one byte. */
+        if (data == NULL || !PyBytes_Check(data)
+            || n < 0 || n > PyBytes_GET_SIZE(data) || n > INT_MAX) {
+            PyErr_SetString(PyExc_TypeError, "delta state is malformed");
+            return -1;
+        }
+        l = (int)n;
+    }
+    else
+#endif
+    if (data) {
         PyErr_SetString(PyExc_TypeError,
                         "tuple required for first state element");
         return -1;
     }
-
-    if ((l=PyTuple_Size(items)) < 0)
+    else if (PyBytes_Check(items)) {
+        /* Packed state:  (keys[, next]). */
+        if (PyBytes_GET_SIZE(items) % sizeof(KEY_TYPE)
+            || PyBytes_GET_SIZE(items) / sizeof(KEY_TYPE) > INT_MAX) {
+            PyErr_SetString(PyExc_TypeError,
+                            "packed state has the wrong number of bytes");
+            return -1;
+        }
+        l = (int)(PyBytes_GET_SIZE(items) / sizeof(KEY_TYPE));
+    }
+    else
+#endif
+#ifdef KEY_TYPE_IS_PYOBJECT
+    if (PyTuple_Check(items) && next && PyBytes_Check(OBJECT(next))) {
+        /* Prefix state:  (suffixes, shared[, next]). */
+        shared = OBJECT(next);
+        next = BUCKET(data);
+        data = NULL;
+        l = (int)PyTuple_GET_SIZE(items);
+    }
+    else
+#endif
+    if (!PyTuple_Check(items) || data) {
+        PyErr_SetString(PyExc_TypeError,
+                        "tuple required for first state element");
+        return -1;
+    }
+    else if ((l=PyTuple_Size(items)) < 0)
         return -1;
 
     for (i=self->len; --i >= 0; )
@@ -253,6 +342,31 @@ _set_setstate(Bucket *self, PyObject *args)
         self->size=l;
     }
 
+#ifdef KEY_TYPECODE
+#ifdef KEY_TYPE_IS_INTEGER
+    if (PyLong_Check(items)) {
+        if (_set_delta_keys(data, self->keys, l) < 0)
+            return -1;
+    }
+    else
+#endif
+    if (PyBytes_Check(items)) {
+        if (BTree_UnpackItems(items, self->keys, l, sizeof(KEY_TYPE)) < 0)
+            return -1;
+#ifdef KEY_IS_NAN
+        if (BTree_CheckNaNKeys(self->keys, l) < 0)
+            return -1;
+#endif
+    }
+    else
+#endif
+#ifdef KEY_TYPE_IS_PYOBJECT
+    if (shared) {
+        if (BTree_PrefixKeys(items, 1, shared, self->keys, l) < 0)
+            return -1;
+    }
+    else
+#endif
     for (i=0; i<l; i++)
     {
         k=PyTuple_GET_ITEM(items, i);
@@ -301,9 +415,18 @@ static struct PyMethodDef Set_methods[] = {
     {"keys", (PyCFunction) bucket_keys, METH_VARARGS | METH_KEYWORDS,
      "keys()\nReturn the keys"},
 
+    {"count", (PyCFunction) bucket_count, METH_VARARGS | METH_KEYWORDS,
+     "count([min, max])\nReturn the number of keys in the range"},
+
+    {"keys_buffer", (PyCFunction) bucket_keys_buffer, METH_NOARGS,
+     "keys_buffer()\nReturn a read-only memoryview of the keys"},
+
     {"has_key", (PyCFunction) bucket_has_key, METH_O,
      "has_key(key)\nTest whether the bucket contains the given key"},
 
+    {"contains_many", (PyCFunction) bucket_contains_many, METH_O,
+     "contains_many(keys)\nTest whether the set contains each key"},
+
     {"clear", (PyCFunction) bucket_clear, METH_VARARGS,
      "clear()\nRemove all of the items from the bucket"},
 
@@ -218,6 +218,12 @@ err:
 }
 
 
+static PyObject *
+TreeSet_fromSorted(PyObject *type, PyObject *args, PyObject *kw)
+{
+    return _BTree_fromSorted(type, args, kw, 1);
+}
+
 static PyObject *
 TreeSet_setstate(BTree *self, PyObject *args)
 {
@@ -250,6 +256,10 @@ static struct PyMethodDef TreeSet_methods[] =
      "has_key(key)\n\n"
      "Return true if the TreeSet contains the given key."},
 
+    {"contains_many", (PyCFunction) BTree_contains_many, METH_O,
+     "contains_many(keys) -> Flags for keys\n\n"
+     "Return whether the TreeSet contains each of the keys."},
+
     {"keys", (PyCFunction) BTree_keys, METH_VARARGS | METH_KEYWORDS,
      "keys([min, max]) -> list of keys\n\n"
      "Returns the keys of the TreeSet.  If min and max are supplied, only\n"
@@ -265,6 +275,19 @@ static struct PyMethodDef TreeSet_methods[] =
      "Return the smallest key in the BTree.  If min is specified, return\n"
      "the smallest key >= min."},
 
+    {"count", (PyCFunction) BTree_count, METH_VARARGS | METH_KEYWORDS,
+     "count([min, max]) -> int\n\n"
+     "Return the number of keys in the TreeSet that keys() would return\n"
+     "for the same arguments."},
+
+    {"rank", (PyCFunction) BTree_rank, METH_O,
+     "rank(key) -> int\n\n"
+     "Return the number of keys in the TreeSet less than key."},
+
+    {"select", (PyCFunction) BTree_select, METH_VARARGS,
+     "select(index) -> key\n\n"
+     "Return the key at the given position in the sorted keys."},
+
     {"clear", (PyCFunction) BTree_clear, METH_NOARGS,
      "clear()\n\nRemove all of the items from the BTree."},
 
@@ -277,6 +300,12 @@ static struct PyMethodDef TreeSet_methods[] =
     {"update", (PyCFunction)TreeSet_update, METH_VARARGS,
      "update(collection)\n\n Add the items from the given collection."},
 
+    {"fromSorted", (PyCFunction) TreeSet_fromSorted,
+     METH_VARARGS | METH_KEYWORDS | METH_CLASS,
+     "fromSorted(items[, fill_factor=1.0]) -> new TreeSet\n\n"
+     "Build a TreeSet bottom-up from keys in sorted order, filling each\n"
+     "bucket to fill_factor of its maximum size."},
+
     {"remove", (PyCFunction)TreeSet_remove, METH_VARARGS,
      "remove(id) -- Remove a key from the set"},
 
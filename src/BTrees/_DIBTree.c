@@ -0,0 +1,32 @@
+/*############################################################################
+#
+# Copyright (c) 2004 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################*/
+
+#define MASTER_ID "$Id$\n"
+
+/* DIBTree - double key, int value BTree
+
+   Implements a collection using double type keys
+   and int type values
+*/
+
+#define PERSISTENT
+
+#define MOD_NAME_PREFIX "DI"
+
+#include "Python.h"
+#include "doublekeymacros.h"
+#include "intvaluemacros.h"
+
+#define INITMODULE PyInit__DIBTree
+#include "BTreeModuleTemplate.c"
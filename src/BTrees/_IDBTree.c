@@ -0,0 +1,32 @@
+/*############################################################################
+#
+# Copyright (c) 2004 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################*/
+
+#define MASTER_ID "$Id$\n"
+
+/* IDBTree - int key, double value BTree
+
+   Implements a collection using int type keys
+   and double type values
+*/
+
+#define PERSISTENT
+
+#define MOD_NAME_PREFIX "ID"
+
+#include "Python.h"
+#include "intkeymacros.h"
+#include "doublevaluemacros.h"
+
+#define INITMODULE PyInit__IDBTree
+#include "BTreeModuleTemplate.c"
@@ -53,6 +53,20 @@ _FAMILIES = (
     "OU",  # 32-bit unsigned
     "OL",  # 64-bit signed
     "OQ",  # 64-bit unsigned
+    # Fixed-size bytes keys
+    "bO",  # 8 bytes, object value
+    "gO",  # 16 bytes, object value
+    # str keys
+    "SO",  # object value
+    "SI",  # 32-bit signed
+    # Double keys
+    "DO",  # object value
+    "DD",  # self value
+    "DI",  # 32-bit signed
+    "DL",  # 64-bit signed
+    # Double values
+    "ID",  # 32-bit signed key
+    "LD",  # 64-bit signed key
     # Special purpose
     'fs',  # 2-byte -> 6-byte
 )
@@ -92,6 +106,10 @@ class _Family:
 
 class _Family32(_Family):
     _BITSIZE = 32
+    from BTrees import DDBTree as DD
+    from BTrees import DIBTree as DI
+    from BTrees import DOBTree as DO
+    from BTrees import IDBTree as ID
     from BTrees import IFBTree as IF
     from BTrees import IIBTree as II
     from BTrees import IOBTree as IO
@@ -109,6 +127,10 @@ class _Family32(_Family):
 
 class _Family64(_Family):
     _BITSIZE = 64
+    from BTrees import DDBTree as DD
+    from BTrees import DLBTree as DI
+    from BTrees import DOBTree as DO
+    from BTrees import LDBTree as ID
     from BTrees import LFBTree as IF
     from BTrees import LLBTree as II
     from BTrees import LOBTree as IO
@@ -146,7 +168,7 @@ family64 = _Family64()
 for _family in family32, family64:
     for _mod_name in (
             "OI", "OU",
-            'IO', "II", "IF", "IU",
+            'IO', "II", "IF", "IU", "ID", "DI",
             "UO", "UU", "UF", "UI",
     ):
         getattr(_family, _mod_name).family = _family
@@ -156,3 +178,10 @@ for _family in family32, family64:
 # interface. But for fsBTrees, no family makes particular sense, so we
 # arbitrarily pick one.
 globals()['fsBTree'].family = family64
+# Likewise, SIBTree implements IStringIntegerBTreeModule; its values are
+# 32-bit.
+globals()['SIBTree'].family = family32
+# DOBTree and DDBTree belong to both families; their keys (and values)
+# are 64-bit floats.
+globals()['DOBTree'].family = family64
+globals()['DDBTree'].family = family64
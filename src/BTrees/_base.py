@@ -14,6 +14,11 @@
 """Python BTree implementation
 """
 
+import heapq
+import operator
+import sys
+from array import array
+
 from persistent import Persistent
 
 from ._compat import compare
@@ -22,6 +27,251 @@ from .Interfaces import BTreesConflictError
 
 _marker = object()
 
+_TYPECODE_KINDS = ('bhilqn', 'BHILQN', 'efd')
+
+
+def _typecode_kind(typecode):
+    for kind in _TYPECODE_KINDS:
+        if typecode in kind:
+            return kind
+    return None
+
+
+def _native_buffer(data, datatype):
+    """
+    If *datatype* stores native numbers and *data* supports the buffer
+    protocol, return a memoryview of *data* as items of that type;
+    otherwise return None.
+
+    Untyped (byte) buffers are reinterpreted as native items. Buffers of
+    any other kind or item size raise :exc:`TypeError`, as they do
+    for the C implementation.
+    """
+    typecode = getattr(datatype, 'array_typecode', None)
+    if typecode is None:
+        return None
+    try:
+        view = memoryview(data)
+    except TypeError:
+        return None
+    fmt = view.format.lstrip('@=')
+    if fmt not in ('B', 'b', 'c'):
+        itemsize = array(typecode).itemsize
+        if (len(fmt) != 1
+                or _typecode_kind(fmt) != _typecode_kind(typecode)
+                or view.itemsize != itemsize):
+            raise TypeError(
+                "expected a buffer of %r items, not %r" % (
+                    typecode, view.format))
+    return view.cast('B').cast(typecode)
+
+
+def _typed_buffer(data, typecode):
+    """
+    If *data* supports the buffer protocol with contiguous items of the
+    same kind and size as *typecode*, return a memoryview of it as such
+    items; otherwise return None.
+
+    Unlike :func:`_native_buffer`, this neither reinterprets byte
+    buffers nor rejects buffers of other formats, matching how the C
+    ``multiunion`` decides whether to copy an input.
+    """
+    try:
+        view = memoryview(data)
+    except TypeError:
+        return None
+    fmt = view.format.lstrip('@=')
+    if (len(fmt) != 1 or fmt in 'Bbc' or not view.c_contiguous
+            or view.itemsize != array(typecode).itemsize
+            or _typecode_kind(fmt) != _typecode_kind(typecode)):
+        return None
+    return view.cast('B').cast(typecode)
+
+
+def _native_view(items, datatype, what):
+    """
+    Return a read-only memoryview of a copy of *items* as the native
+    numbers stored by *datatype*, or raise :exc:`TypeError` if
+    *datatype* doesn't store native numbers.
+    """
+    typecode = getattr(datatype, 'array_typecode', None)
+    if typecode is None:
+        raise TypeError("%s are not native numbers" % what)
+    return memoryview(array(typecode, items).tobytes()).cast(typecode)
+
+
+def _pack_items(items, datatype):
+    """
+    Return the native numbers of *datatype* in *items* as little-endian
+    bytes, as stored in packed state.
+    """
+    typecode = getattr(datatype, 'array_typecode', None)
+    if typecode is None:
+        raise TypeError("packed state requires native keys and values")
+    packed = array(typecode, items)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack_items(data, datatype):
+    """
+    Return a list of the native numbers of *datatype* packed by
+    :func:`_pack_items` in the bytes *data*.
+    """
+    typecode = getattr(datatype, 'array_typecode', None)
+    if typecode is None or not isinstance(data, bytes):
+        raise TypeError('tuple required for first state element')
+    packed = array(typecode)
+    try:
+        packed.frombytes(data)
+    except ValueError:
+        raise TypeError("packed state has the wrong number of bytes")
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tolist()
+
+
+def _unpack_keys(data, to_key):
+    """
+    Return a list of the native keys packed in the bytes *data*,
+    rejecting NaN keys as *to_key* does.
+    """
+    keys = _unpack_items(data, to_key)
+    if to_key.array_typecode == 'd':
+        for key in keys:
+            if key != key:
+                to_key(key)
+    return keys
+
+
+def _state_format(bucket):
+    # Return the state format the class of bucket asks for.
+    state_format = type(bucket).state_format
+    if state_format not in (None, 'packed', 'delta', 'prefix'):
+        raise ValueError("unknown state_format %r" % (state_format,))
+    return state_format
+
+
+_MASK_64 = 2 ** 64 - 1
+
+
+def _append_varint(data, value):
+    # Append value to the bytearray data as an unsigned LEB128 varint:
+    # 7 bits per byte, least significant first, with the high bit set
+    # on all but the last byte.
+    while value >= 0x80:
+        data.append((value & 0x7f) | 0x80)
+        value >>= 7
+    data.append(value)
+
+
+def _iter_varints(data, message):
+    # Yield the varints appended to data by _append_varint, raising
+    # TypeError(message) if the last is truncated or any is too large.
+    value = shift = 0
+    for byte in data:
+        if shift > 63:
+            raise TypeError(message)
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            yield value
+            value = shift = 0
+    if shift:
+        raise TypeError(message)
+
+
+def _delta_encode(keys):
+    """
+    Return the integer *keys*, in increasing order, encoded for delta
+    state: each key as its difference from the previous key (the first
+    from 0), taken modulo 2**64, as an unsigned LEB128 varint.
+    """
+    data = bytearray()
+    prev = 0
+    for key in keys:
+        _append_varint(data, (key - prev) & _MASK_64)
+        prev = key
+    return bytes(data)
+
+
+def _delta_decode(n, data, datatype):
+    """
+    Return a list of the *n* keys encoded in *data* by
+    :func:`_delta_encode`, raising :exc:`TypeError` if *data* is
+    malformed or holds keys out of the range of *datatype*.
+    """
+    if not isinstance(data, bytes) or not 0 <= n <= len(data):
+        raise TypeError("delta state is malformed")
+    lower = datatype.get_lower_bound()
+    upper = datatype.get_upper_bound()
+    keys = []
+    key = 0
+    for delta in _iter_varints(data, "delta state is malformed"):
+        key = (key + delta) & _MASK_64
+        value = key - 2 ** 64 if lower < 0 and key >= 2 ** 63 else key
+        if not lower <= value <= upper:
+            raise TypeError("delta state is malformed")
+        keys.append(value)
+    if len(keys) != n:
+        raise TypeError("delta state is malformed")
+    return keys
+
+
+def _prefix_encode(keys):
+    """
+    Return ``(suffixes, shared)`` for the prefix state of *keys*, or
+    None if they aren't all exact bytes or all exact str.
+
+    Each key is saved as the number of leading characters it shares
+    with the previous key, as a varint in the bytes *shared*, and the
+    rest of the key, in the list *suffixes*.
+    """
+    kind = type(keys[0]) if keys else bytes
+    if kind not in (bytes, str):
+        return None
+    suffixes = []
+    shared = bytearray()
+    prev = kind()
+    for key in keys:
+        if type(key) is not kind:
+            return None
+        n = 0
+        limit = min(len(prev), len(key))
+        while n < limit and prev[n] == key[n]:
+            n += 1
+        suffixes.append(key[n:])
+        _append_varint(shared, n)
+        prev = key
+    return suffixes, bytes(shared)
+
+
+def _prefix_decode(suffixes, shared):
+    """
+    Return a list of the keys encoded by :func:`_prefix_encode`,
+    raising :exc:`TypeError` if the state is malformed.
+    """
+    if not isinstance(shared, bytes):
+        raise TypeError("prefix state is malformed")
+    lengths = list(_iter_varints(shared, "prefix state is malformed"))
+    if len(lengths) != len(suffixes):
+        raise TypeError("prefix state is malformed")
+    keys = []
+    prev = None
+    for n, suffix in zip(lengths, suffixes):
+        if prev is None:
+            if type(suffix) not in (bytes, str) or n:
+                raise TypeError("prefix state is malformed")
+            key = suffix
+        elif type(suffix) is not type(prev) or n > len(prev):
+            raise TypeError("prefix state is malformed")
+        else:
+            key = prev[:n] + suffix
+        keys.append(key)
+        prev = key
+    return keys
+
 
 class _Base(Persistent):
 
@@ -81,6 +331,12 @@ class _Base(Persistent):
 
         _BTree_reduce_up_bound = _BTree_reduce_as
 
+    def contains_many(self, keys):
+        view = _native_buffer(keys, self._to_key)
+        if view is None:
+            return [key in self for key in keys]
+        return array('B', [key in self for key in view.tolist()])
+
 
 class _ArithmeticMixin:
 
@@ -110,6 +366,12 @@ class _BucketBase(_ArithmeticMixin, _Base):
 
     __slots__ = ('_keys', '_next', '_to_key')
 
+    # The format of the state: None for tuples of keys (and values),
+    # 'packed' for bytes of little-endian native keys (and values),
+    # 'delta' for varints of the differences between the keys of a Set,
+    # or 'prefix' for bytes or str keys without their shared prefixes.
+    state_format = None
+
     def clear(self):
         self._keys = self._key_type()
         self._next = None
@@ -204,14 +466,18 @@ class _BucketBase(_ArithmeticMixin, _Base):
         start, end = self._range(*args, **kw)
         return self._keys[start:end]
 
+    def count(self, *args, **kw):
+        start, end = self._range(*args, **kw)
+        return end - start if end > start else 0
+
+    def keys_buffer(self):
+        return _native_view(self._keys, self._to_key, 'keys')
+
     def iterkeys(self, *args, **kw):
-        if not (args or kw):
-            return iter(self._keys)
-        keys = self._keys
-        return (keys[i] for i in range(*self._range(*args, **kw)))
+        return _RangeIterator(self, 'k', *args, **kw)
 
     def __iter__(self):
-        return iter(self._keys)
+        return _RangeIterator(self, 'k')
 
     def __contains__(self, key):
         try:
@@ -292,6 +558,72 @@ class _SetIteration:
 
         return self
 
+    def seek(self, key):
+        # Make the current key the first one that isn't less than *key*,
+        # unless it already is. Buckets, sets and trees find it without
+        # visiting the keys skipped.
+        if self.active and compare(self.key, key) < 0:
+            seek = getattr(self._iter, 'seek', None)
+            if seek is None:
+                while self.active and compare(self.key, key) < 0:
+                    self.advance()
+            else:
+                seek(key)
+                self.advance()
+        return self
+
+
+# When one input of an intersection or difference has at least this many
+# times as many keys as the other, the iteration of the larger input seeks
+# the keys of the smaller one instead of merging the two.
+_GALLOP_RATIO = 8
+
+
+def _estimated_size(o):
+    # A cheap estimate of the number of keys of an input of a set
+    # operation, or None if it isn't known. Trees that aren't counted
+    # are estimated from the lengths of the nodes on their leftmost path.
+    if isinstance(o, _BucketBase):
+        return len(o._keys)
+    if isinstance(o, _Tree):
+        if o.counted:
+            return len(o)
+        size = 1
+        node = o
+        while isinstance(node, _Tree):
+            if not node._data:
+                return 0
+            size *= len(node._data)
+            node = node._data[0].child
+        return size * len(node._keys)
+    try:
+        return len(o)
+    except TypeError:
+        return None
+
+
+def _seek_operands(o1, o2, either):
+    # Decide whether an intersection (if either is true) or a difference
+    # of o1 and o2 should look up the keys of one in the other. Return
+    # the input to iterate and the one to look its keys up in, or None to
+    # merge them.
+    size1 = _estimated_size(o1)
+    size2 = _estimated_size(o2)
+    if size1 is None or size2 is None:
+        return None
+    if isinstance(o2, _Base) and size2 // _GALLOP_RATIO >= size1:
+        return o1, o2
+    if either and isinstance(o1, _Base) and size1 // _GALLOP_RATIO >= size2:
+        return o2, o1
+    return None
+
+
+def _top_limit(limit, name):
+    limit = operator.index(limit)
+    if limit < 0:
+        raise ValueError("%s must not be negative" % name)
+    return limit
+
 
 class _MutableMappingMixin:
     # Methods defined in collections.abc.MutableMapping that
@@ -311,6 +643,46 @@ class _MutableMappingMixin:
         del self[key]
         return key, value
 
+    def byValue(self, min, limit=None):
+        items = ((v, k) for (k, v) in self.iteritems() if v >= min)
+        if limit is None:
+            return reversed(sorted(items))
+        return heapq.nlargest(_top_limit(limit, 'limit'), items)
+
+    def topk(self, k, min=None):
+        k = _top_limit(k, 'k')
+        items = ((value, key) for (key, value) in self.iteritems())
+        if min is not None:
+            items = (item for item in items if item[0] >= min)
+        elif getattr(self._to_value, 'array_typecode', None) in ('f', 'd'):
+            # NaN values can't be ranked, so they're skipped.
+            items = (item for item in items if item[0] == item[0])
+        return heapq.nlargest(k, items)
+
+    def get_many(self, keys, default=None):
+        view = _native_buffer(keys, self._to_key)
+        typecode = getattr(self._to_value, 'array_typecode', None)
+        if view is not None:
+            keys = view.tolist()
+            if typecode is not None:
+                # A buffer of native keys gets a buffer of native values
+                # back, so the default has to be a value too.
+                default = self._to_value(0 if default is None else default)
+        get = self.get
+        to_key = self._to_key
+        result = []
+        for key in keys:
+            try:
+                key = to_key(key)
+            except TypeError:
+                # Can't convert, cannot possibly be present.
+                result.append(default)
+            else:
+                result.append(get(key, default))
+        if view is None or typecode is None:
+            return result
+        return array(typecode, result)
+
 
 class Bucket(_MutableMappingMixin, _BucketBase):
 
@@ -321,6 +693,9 @@ class Bucket(_MutableMappingMixin, _BucketBase):
     def _to_value(self, x):
         return x
 
+    def values_buffer(self):
+        return _native_view(self._values, self._to_value, 'values')
+
     def setdefault(self, key, value):
         key, value = self._to_key(key), self._to_value(value)
         status, value = self._set(key, value, True)
@@ -433,8 +808,7 @@ class Bucket(_MutableMappingMixin, _BucketBase):
         return self._values[start:end]
 
     def itervalues(self, *args, **kw):
-        values = self._values
-        return (values[i] for i in range(*self._range(*args, **kw)))
+        return _RangeIterator(self, 'v', *args, **kw)
 
     def items(self, *args, **kw):
         keys = self._keys
@@ -445,16 +819,35 @@ class Bucket(_MutableMappingMixin, _BucketBase):
         ]
 
     def iteritems(self, *args, **kw):
-        keys = self._keys
-        values = self._values
-        return (
-            (keys[i], values[i])
-            for i in range(*self._range(*args, **kw))
-        )
+        return _RangeIterator(self, 'i', *args, **kw)
 
     def __getstate__(self):
         keys = self._keys
         values = self._values
+        state_format = _state_format(self)
+        if state_format == 'delta':
+            raise TypeError("delta state requires a Set")
+        if state_format == 'prefix':
+            if not getattr(self._to_key, 'supports_prefix_state', False):
+                raise TypeError("prefix state requires object keys")
+            encoded = _prefix_encode(keys)
+            if encoded is not None:
+                suffixes, shared = encoded
+                data = []
+                for i in range(len(keys)):
+                    data.append(suffixes[i])
+                    data.append(values[i])
+                data = (tuple(data), shared)
+                if self._next is not None:
+                    return data + (self._next, )
+                return data
+        if state_format == 'packed':
+            data = (_pack_items(keys, self._to_key),
+                    _pack_items(values, self._to_value))
+            if self._next is not None:
+                return data + (self._next, )
+            return data
+
         data = []
         for i in range(len(keys)):
             data.append(keys[i])
@@ -466,7 +859,15 @@ class Bucket(_MutableMappingMixin, _BucketBase):
         return (data, )
 
     def __setstate__(self, state):
-        if not isinstance(state[0], tuple):
+        if isinstance(state[0], bytes):
+            self._setstate_packed(state)
+            return
+        if (getattr(self._to_key, 'supports_prefix_state', False)
+                and len(state) > 1 and isinstance(state[0], tuple)
+                and isinstance(state[1], bytes)):
+            self._setstate_prefix(state)
+            return
+        if not isinstance(state[0], tuple) or len(state) > 2:
             raise TypeError("tuple required for first state element")
 
         self.clear()
@@ -482,6 +883,27 @@ class Bucket(_MutableMappingMixin, _BucketBase):
             keys.append(state[i])
             values.append(state[i + 1])
 
+    def _setstate_prefix(self, state):
+        items = state[0]
+        n = len(items) // 2
+        keys = _prefix_decode(items[0:2 * n:2], state[1])
+        self.clear()
+        self._keys.extend(keys)
+        self._values.extend(items[1:2 * n:2])
+        self._next = state[2] if len(state) > 2 else None
+
+    def _setstate_packed(self, state):
+        if len(state) < 2:
+            raise TypeError("packed state requires keys and values")
+        keys = _unpack_keys(state[0], self._to_key)
+        values = _unpack_items(state[1], self._to_value)
+        if len(keys) != len(values):
+            raise TypeError("packed state has the wrong number of bytes")
+        self.clear()
+        self._keys.extend(keys)
+        self._values.extend(values)
+        self._next = state[2] if len(state) > 2 else None
+
     def _p_resolveConflict(self, s_old, s_com, s_new):
         b_old = type(self)()
         if s_old is not None:
@@ -705,23 +1127,52 @@ class Set(_MutableSetMixin, _BucketBase):
             add(i)
 
     def __getstate__(self):
-        data = tuple(self._keys)
+        state_format = _state_format(self)
+        if state_format == 'delta':
+            if not getattr(self._to_key, 'supports_delta_state', False):
+                raise TypeError("delta state requires a Set of integer keys")
+            data = (len(self._keys), _delta_encode(self._keys))
+        elif state_format == 'packed':
+            data = (_pack_items(self._keys, self._to_key), )
+        elif state_format == 'prefix':
+            if not getattr(self._to_key, 'supports_prefix_state', False):
+                raise TypeError("prefix state requires object keys")
+            data = _prefix_encode(self._keys)
+            if data is None:
+                data = (tuple(self._keys), )
+            else:
+                data = (tuple(data[0]), data[1])
+        else:
+            data = (tuple(self._keys), )
         if self._next is not None:
-            return data, self._next
-        return (data, )
+            return data + (self._next, )
+        return data
 
     def __setstate__(self, state):
-        if not isinstance(state[0], tuple):
+        first = state[0]
+        if getattr(self._to_key, 'array_typecode', None) is None:
+            first = None  # Only tuples of keys are supported.
+        if (isinstance(first, int) and len(state) > 1
+                and getattr(self._to_key, 'supports_delta_state', False)):
+            keys = _delta_decode(first, state[1], self._to_key)
+            state = state[1:]
+        elif (getattr(self._to_key, 'supports_prefix_state', False)
+                and len(state) > 1 and isinstance(state[0], tuple)
+                and isinstance(state[1], bytes)):
+            keys = _prefix_decode(state[0], state[1])
+            state = state[1:]
+        elif isinstance(first, bytes) and len(state) <= 2:
+            keys = _unpack_keys(first, self._to_key)
+        elif isinstance(state[0], tuple) and len(state) <= 2:
+            keys = state[0]
+        elif isinstance(first, int):
+            raise TypeError("delta state is malformed")
+        else:
             raise TypeError('tuple required for first state element')
 
         self.clear()
-        if len(state) == 2:
-            state, self._next = state
-        else:
-            self._next = None
-            state = state[0]
-
-        self._keys.extend(state)
+        self._next = state[1] if len(state) == 2 else None
+        self._keys.extend(keys)
 
     def _set(self, key, value=None, ifunset=False):
         index = self._search(key)
@@ -887,17 +1338,42 @@ class Set(_MutableSetMixin, _BucketBase):
 
 class _TreeItem:
 
-    __slots__ = ('key', 'child')
+    __slots__ = ('key', 'child', 'count')
 
-    def __init__(self, key, child):
+    def __init__(self, key, child, count=0):
         self.key = key
         self.child = child
+        # The number of elements under child, if the tree is counted.
+        self.count = count
+
+
+def _even_chunks(length, size):
+    # Yield (start, end) pairs splitting range(length) into the fewest
+    # chunks of at most *size* elements, with the chunk lengths differing
+    # by at most one so that no trailing chunk is left nearly empty.
+    count = -(-length // size)
+    base, extra = divmod(length, count)
+    start = 0
+    for i in range(count):
+        end = start + base + (i < extra)
+        yield start, end
+        start = end
+
+
+def _check_sorted(keys):
+    for i in range(1, len(keys)):
+        if compare(keys[i - 1], keys[i]) >= 0:
+            raise ValueError("fromSorted() requires strictly increasing keys")
 
 
 class _Tree(_ArithmeticMixin, _Base):
 
     __slots__ = ('_data', '_firstbucket')
 
+    # Subclasses can set this to keep the number of elements under each
+    # child in the interior nodes (and their state), making len() cheap.
+    counted = False
+
     def __new__(cls, *args):
         value = _Base.__new__(cls, *args)
         # Empty trees don't get their __setstate__ called upon
@@ -928,6 +1404,62 @@ class _Tree(_ArithmeticMixin, _Base):
         for i in items:
             set(*i)
 
+    @classmethod
+    def fromSorted(cls, items, fill_factor=1.0):
+        """Build a new tree bottom-up from input sorted by key.
+
+        Buckets are packed left to right to ``fill_factor`` of
+        ``max_leaf_size`` and the interior levels are built above them
+        in one pass, without searching from the root for each item.
+        """
+        if not 0.0 < fill_factor <= 1.0:
+            raise ValueError("fill_factor must be in the range (0, 1]")
+        tree = cls()
+        keys, values = tree._unpack_sorted(items)
+        if not keys:
+            return tree
+
+        leaf_fill = max(1, int(cls.max_leaf_size * fill_factor))
+        internal_fill = max(2, int(cls.max_internal_size * fill_factor))
+
+        # Each level is a list of (min key, node, firstbucket) triples.
+        level = []
+        previous = None
+        for start, end in _even_chunks(len(keys), leaf_fill):
+            bucket = tree._bucket_type()
+            bucket._keys = keys[start:end]
+            if values is not None:
+                bucket._values = values[start:end]
+            if previous is not None:
+                previous._next = bucket
+            previous = bucket
+            level.append((bucket._keys[0], bucket, bucket))
+
+        while len(level) > internal_fill:
+            parents = []
+            for start, end in _even_chunks(len(level), internal_fill):
+                node = cls()
+                node._fill_from_level(level[start:end])
+                parents.append((level[start][0], node, node._firstbucket))
+            level = parents
+
+        tree._fill_from_level(level)
+        return tree
+
+    def _fill_from_level(self, level):
+        self._data = [
+            _TreeItem(key, child, self._child_count(child))
+            for key, child, _ in level
+        ]
+        self._data[0].key = None
+        self._firstbucket = level[0][2]
+
+    def _child_count(self, child):
+        # The number of elements under child, in a counted tree.
+        if type(child) is type(self):
+            return sum(item.count for item in child._data)
+        return len(child._keys)
+
     def __setitem__(self, key, value):
         self._set(self._to_key(key), self._to_value(value))
 
@@ -944,6 +1476,8 @@ class _Tree(_ArithmeticMixin, _Base):
         return bool(self._data)
 
     def __len__(self):
+        if self.counted:
+            return sum(item.count for item in self._data)
         accumulated = 0
         bucket = self._firstbucket
         while bucket is not None:
@@ -981,6 +1515,88 @@ class _Tree(_ArithmeticMixin, _Base):
                 return child
             return child._findbucket(key)
 
+    def _rank(self, key, or_equal=False):
+        # The number of keys less than key (or equal to it, if or_equal).
+        # A counted tree only visits one node per level; otherwise the
+        # buckets to the left of the one that would hold key are walked.
+        result = 0
+        node = self
+        while True:
+            index = node._search(key)
+            if index < 0:
+                return 0
+            if self.counted:
+                result += sum(item.count for item in node._data[:index])
+            node = node._data[index].child
+            if isinstance(node, self._bucket_type):
+                break
+        if not self.counted:
+            bucket = self._firstbucket
+            while bucket is not node:
+                result += len(bucket._keys)
+                bucket = bucket._next
+        index = node._search(key)
+        if index >= 0:
+            return result + index + (1 if or_equal else 0)
+        return result - index - 1
+
+    def _select(self, index):
+        # The bucket and offset of the key at position index.
+        if self.counted:
+            node = self
+            remaining = index
+            while node._data:
+                for item in node._data[:-1]:
+                    if remaining < item.count:
+                        break
+                    remaining -= item.count
+                else:
+                    item = node._data[-1]
+                node = item.child
+                if isinstance(node, self._bucket_type):
+                    if remaining < len(node._keys):
+                        return node, remaining
+                    break
+        else:
+            bucket = self._firstbucket
+            remaining = index
+            while bucket is not None:
+                if remaining < len(bucket._keys):
+                    return bucket, remaining
+                remaining -= len(bucket._keys)
+                bucket = bucket._next
+        raise IndexError(index)
+
+    def _rank_range(self, min, max, excludemin, excludemax):
+        # The ranks of the first key in the range and just past the last.
+        if min is _marker or min is None:
+            start = 1 if excludemin else 0
+        else:
+            start = self._rank(self._to_key(min), excludemin)
+        if max is _marker or max is None:
+            end = len(self) - (1 if excludemax else 0)
+        else:
+            end = self._rank(self._to_key(max), not excludemax)
+        return start, (end if end > start else start)
+
+    def rank(self, key):
+        return self._rank(self._to_key(key))
+
+    def count(self, min=_marker, max=_marker,
+              excludemin=False, excludemax=False):
+        if not self._data:
+            return 0
+        start, end = self._rank_range(min, max, excludemin, excludemax)
+        return end - start
+
+    def select(self, index):
+        if index < 0:
+            index += len(self)
+            if index < 0:
+                raise IndexError(index)
+        bucket, offset = self._select(index)
+        return bucket._keys[offset]
+
     def __contains__(self, key):
         try:
             tree_key = self._to_key(key)
@@ -1009,14 +1625,15 @@ class _Tree(_ArithmeticMixin, _Base):
 
         iterargs = min, max, excludemin, excludemax
 
-        return _TreeItems(bucket, itertype, iterargs)
+        return _TreeItems(bucket, itertype, iterargs,
+                          self if self.counted else None)
 
     def iterkeys(self, min=_marker, max=_marker,
                  excludemin=False, excludemax=False):
-        return iter(self.keys(min, max, excludemin, excludemax))
+        return _RangeIterator(self, 'k', min, max, excludemin, excludemax)
 
     def __iter__(self):
-        return iter(self.keys())
+        return _RangeIterator(self, 'k')
 
     def minKey(self, min=_marker):
         if min is _marker or min is None:
@@ -1061,6 +1678,9 @@ class _Tree(_ArithmeticMixin, _Base):
         result = child._set(key, value, ifunset)
         grew = result[0]
         if grew:
+            if self.counted:
+                data[index].count += 1
+                self._p_changed = True
             if type(child) is type(self):
                 max_size = type(self).max_internal_size
             else:
@@ -1086,6 +1706,9 @@ class _Tree(_ArithmeticMixin, _Base):
         self._p_changed = True
         new_child = child._split()
         self._data.insert(index + 1, _TreeItem(new_child.minKey(), new_child))
+        if self.counted:
+            self._data[index].count = self._child_count(child)
+            self._data[index + 1].count = self._child_count(new_child)
         if len(self._data) >= type(self).max_internal_size * 2:
             self._split_root()
 
@@ -1129,6 +1752,9 @@ class _Tree(_ArithmeticMixin, _Base):
         child = data[index].child
 
         removed_first_bucket, value = child._del(key)
+        if self.counted:
+            data[index].count -= 1
+            self._p_changed = True
 
         # See comment in _set about small trees
         if (
@@ -1180,12 +1806,15 @@ class _Tree(_ArithmeticMixin, _Base):
         ):
             return ((data[0].child.__getstate__(), ), )
 
+        counts = tuple(item.count for item in data)
         data = iter(data)
         sdata = [next(data).child]
         for item in data:
             sdata.append(item.key)
             sdata.append(item.child)
 
+        if self.counted:
+            return tuple(sdata), self._firstbucket, counts
         return tuple(sdata), self._firstbucket
 
     def __setstate__(self, state):
@@ -1201,7 +1830,8 @@ class _Tree(_ArithmeticMixin, _Base):
             bucket.__setstate__(state[0][0])
             state = [bucket], bucket
 
-        data, self._firstbucket = state
+        data, self._firstbucket = state[:2]
+        counts = state[2] if len(state) > 2 else None
         data = list(reversed(data))
 
         # verify children are either tree or bucket nodes.
@@ -1220,6 +1850,18 @@ class _Tree(_ArithmeticMixin, _Base):
             child = data.pop()
             self._data.append(_TreeItem(key, child))
 
+        if self.counted:
+            if counts is None:
+                # State from before the class was counted; this loads
+                # the children.
+                counts = [self._child_count(item.child)
+                          for item in self._data]
+            elif len(counts) != len(self._data):
+                raise TypeError(
+                    "counts must be a tuple with one int per child")
+            for item, count in zip(self._data, counts):
+                item.count = count
+
     def _assert(self, condition, message):
         if not condition:
             raise AssertionError(message)
@@ -1250,6 +1892,10 @@ class _Tree(_ArithmeticMixin, _Base):
             for i in range(len(data) - 1):
                 data[i].child._check(data[i + 1].child._firstbucket)
             data[-1].child._check(nextbucket)
+            for i in data:
+                assert_(not self.counted
+                        or i.count == self._child_count(i.child),
+                        "BTree child count is wrong")
         elif child_class is self._bucket_type:
             assert_(
                 self._firstbucket is data[0].child,
@@ -1264,6 +1910,10 @@ class _Tree(_ArithmeticMixin, _Base):
                 data[-1].child._next is nextbucket,
                 "Bucket next pointer is damaged"
             )
+            for i in data:
+                assert_(not self.counted
+                        or i.count == self._child_count(i.child),
+                        "BTree child count is wrong")
         else:
             assert_(False, "Incorrect child type")
 
@@ -1310,9 +1960,10 @@ class _TreeItems:
         'it',
         'v',
         '_len',
+        'tree',
     )
 
-    def __init__(self, firstbucket, itertype, iterargs):
+    def __init__(self, firstbucket, itertype, iterargs, tree=None):
         self.firstbucket = firstbucket
         self.itertype = itertype
         self.iterargs = iterargs
@@ -1320,10 +1971,31 @@ class _TreeItems:
         self.it = iter(self)
         self.v = None
         self._len = None
+        # A counted tree to find positions in by rank, or None.
+        self.tree = tree
+
+    def _bounds(self):
+        # The ranks in the tree of the first item and just past the last.
+        return self.tree._rank_range(*self.iterargs)
+
+    def _getitem_by_rank(self, i):
+        start, end = self._bounds()
+        if i < 0:
+            i += end - start
+        if not 0 <= i < end - start:
+            raise IndexError(i)
+        bucket, offset = self.tree._select(start + i)
+        if self.itertype == 'iterkeys':
+            return bucket._keys[offset]
+        if self.itertype == 'itervalues':
+            return bucket._values[offset]
+        return bucket._keys[offset], bucket._values[offset]
 
     def __getitem__(self, i):
         if isinstance(i, slice):
             return list(self)[i]
+        if self.tree is not None:
+            return self._getitem_by_rank(i)
         if i < 0:
             i = len(self) + i
             if i < 0:
@@ -1343,6 +2015,9 @@ class _TreeItems:
         return self.v
 
     def __len__(self):
+        if self.tree is not None:
+            start, end = self._bounds()
+            return end - start
         if self._len is None:
             i = 0
             for _ in self:
@@ -1367,6 +2042,116 @@ class _TreeItems:
             done = 1
 
 
+class _RangeIterator:
+    """
+    Iterate over the keys, values or items in a range of a bucket, or of
+    a tree's buckets, and skip ahead with ``seek(key)``.
+    """
+
+    __slots__ = (
+        '_container',
+        '_tree',
+        '_bucket',
+        '_offset',
+        '_end',
+        '_kind',
+        '_max',
+        '_excludemax',
+    )
+
+    def __init__(self, container, kind, min=_marker, max=_marker,
+                 excludemin=False, excludemax=False):
+        self._kind = kind
+        self._max = max
+        self._excludemax = excludemax
+        self._container = container
+        if isinstance(container, _BucketBase):
+            self._tree = None
+            bucket = container
+        else:
+            self._tree = container
+            if not container._data:
+                bucket = None
+            elif min is not _marker and min is not None:
+                bucket = container._findbucket(container._to_key(min))
+            else:
+                bucket = container._firstbucket
+        self._enter(bucket, min, excludemin)
+
+    def _enter(self, bucket, min=_marker, excludemin=False):
+        # Start iterating over the part of bucket in the range.
+        self._bucket = bucket
+        if bucket is None:
+            self._offset = self._end = 0
+            return
+        max = self._max
+        excludemax = self._excludemax
+        if max is _marker or max is None:
+            # Only the last key of a tree is excluded.
+            excludemax = excludemax and (
+                self._tree is None or bucket._next is None)
+        self._offset, self._end = bucket._range(min, max,
+                                                excludemin, excludemax)
+
+    def _enter_next(self, bucket=None):
+        # Move on from the current bucket to the next one in the range,
+        # or to *bucket*, which must be further along.
+        current = self._bucket
+        if self._tree is None or self._end < len(current._keys):
+            # The range ends in the current bucket.
+            bucket = None
+        elif bucket is None:
+            bucket = current._next
+        self._enter(bucket)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while self._bucket is not None:
+            i = self._offset
+            if i < self._end:
+                self._offset = i + 1
+                bucket = self._bucket
+                if self._kind == 'k':
+                    return bucket._keys[i]
+                if self._kind == 'v':
+                    return bucket._values[i]
+                return bucket._keys[i], bucket._values[i]
+            self._enter_next()
+        raise StopIteration
+
+    def seek(self, key):
+        """
+        Skip ahead to the first key that is not less than *key*.
+
+        The iterator never moves back. The rest of the current bucket is
+        searched first, then the next bucket, and only then the tree from
+        the root, so the buckets skipped aren't visited.
+        """
+        key = self._container._to_key(key)
+        while self._bucket is not None:
+            keys = self._bucket._keys
+            lo = self._offset
+            end = self._end
+            if lo < end and compare(keys[end - 1], key) >= 0:
+                hi = end - 1
+                while lo < hi:
+                    i = (lo + hi) // 2
+                    if compare(keys[i], key) < 0:
+                        lo = i + 1
+                    else:
+                        hi = i
+                self._offset = lo
+                return
+            bucket = self._bucket._next if self._tree is not None else None
+            if (bucket is not None and bucket._keys
+                    and compare(bucket._keys[-1], key) < 0):
+                # The key is past the next bucket too.
+                bucket = self._tree._findbucket(key)
+            self._enter_next(bucket)
+
+
 class _TreeIterator:
     """ Faux implementation for BBB only.
     """
@@ -1402,7 +2187,7 @@ class Tree(_MutableMappingMixin, _Tree):
 
     def itervalues(self, min=_marker, max=_marker,
                    excludemin=False, excludemax=False):
-        return iter(self.values(min, max, excludemin, excludemax))
+        return _RangeIterator(self, 'v', min, max, excludemin, excludemax)
 
     def items(self, min=_marker, max=_marker,
               excludemin=False, excludemax=False):
@@ -1410,11 +2195,66 @@ class Tree(_MutableMappingMixin, _Tree):
 
     def iteritems(self, min=_marker, max=_marker,
                   excludemin=False, excludemax=False):
-        return iter(self.items(min, max, excludemin, excludemax))
+        return _RangeIterator(self, 'i', min, max, excludemin, excludemax)
 
-    def byValue(self, min):
-        return reversed(
-            sorted((v, k) for (k, v) in self.iteritems() if v >= min))
+    @classmethod
+    def from_arrays(cls, keys, values, fill_factor=1.0):
+        """Build a new tree from buffers of native keys and values.
+
+        The last value given for a key wins, as for ``update()``.
+        """
+        key_view = _native_buffer(keys, cls._to_key)
+        value_view = _native_buffer(values, cls._to_value)
+        if key_view is None or value_view is None:
+            raise TypeError("keys and values must be native numbers")
+        if len(key_view) != len(value_view):
+            raise ValueError("keys and values must have the same length")
+        items = dict(zip(key_view.tolist(), value_view.tolist()))
+        return cls.fromSorted(sorted(items.items()), fill_factor)
+
+    def to_arrays(self, min=_marker, max=_marker,
+                  excludemin=False, excludemax=False):
+        key_typecode = getattr(self._to_key, 'array_typecode', None)
+        value_typecode = getattr(self._to_value, 'array_typecode', None)
+        if key_typecode is None or value_typecode is None:
+            raise TypeError("keys and values must be native numbers")
+        keys = array(key_typecode)
+        values = array(value_typecode)
+        if not self._data:
+            return keys, values
+        start, end = self._rank_range(min, max, excludemin, excludemax)
+        remaining = end - start
+        if remaining:
+            # Copy a slice of each bucket in the range.
+            bucket, offset = self._select(start)
+            while remaining > 0:
+                chunk = bucket._keys[offset:offset + remaining]
+                keys.extend(chunk)
+                values.extend(bucket._values[offset:offset + remaining])
+                remaining -= len(chunk)
+                bucket = bucket._next
+                offset = 0
+        return keys, values
+
+    def _unpack_sorted(self, items):
+        if hasattr(items, 'iteritems'):
+            items = items.iteritems()
+        elif hasattr(items, 'items'):
+            items = items.items()
+
+        to_key = self._to_key
+        to_value = self._to_value
+        keys = []
+        values = []
+        for item in items:
+            try:
+                key, value = item
+            except (TypeError, ValueError):
+                raise TypeError("Sequence must contain 2-item tuples")
+            keys.append(to_key(key))
+            values.append(to_value(value))
+        _check_sorted(keys)
+        return keys, values
 
     def insert(self, key, value):
         return bool(self._set(key, value, True)[0])
@@ -1437,6 +2277,12 @@ class TreeSet(_MutableSetMixin, _Tree):
         for i in items:
             add(i)
 
+    def _unpack_sorted(self, items):
+        to_key = self._to_key
+        keys = [to_key(key) for key in items]
+        _check_sorted(keys)
+        return keys, None
+
     _p_resolveConflict = _Tree._p_resolveConflict
 
 
@@ -1464,7 +2310,121 @@ class set_operation:
         return self.func(self.set_type, *a, **k)
 
 
-def difference(set_type, o1, o2):
+class _SetOperationView:
+    """
+    The lazy result of ``union``, ``intersection`` or ``difference``
+    with ``out='view'``.
+
+    The keys of the result are computed only as they are iterated, so
+    reading part of it, or testing whether it's empty, reads only as
+    much of the inputs as that takes; ``len()`` reads all of them.
+    Inputs other than buckets, sets and trees are read into a sorted
+    list when the view is created, and a None input is empty.
+    ``materialize()`` builds the result the operation would have
+    returned, or its first keys.
+    """
+
+    __slots__ = (
+        '_func',
+        '_set_type',
+        '_o1',
+        '_o2',
+        '_c1',
+        '_c12',
+        '_c2',
+    )
+
+    def __init__(self, func, set_type, o1, o2, c1, c12, c2):
+        if func is difference and not isinstance(o1, (_Base, type(None))):
+            raise TypeError("set operation: invalid argument, cannot iterate")
+        self._func = func
+        self._set_type = set_type
+        # Other iterables are only read once.
+        self._o1 = o1 if isinstance(o1, _Base) else sorted(o1 or ())
+        self._o2 = o2 if isinstance(o2, _Base) else sorted(o2 or ())
+        self._c1 = c1
+        self._c12 = c12
+        self._c2 = c2
+
+    def _iterations(self):
+        if self._func is difference:
+            # Only a difference keeps the values of its first input.
+            i1 = _SetIteration(self._o1, True, 0)
+        else:
+            i1 = _SetIteration(self._o1, False, 0, True)
+        return i1, _SetIteration(self._o2, False, 0, True)
+
+    def _merge(self, i1, i2):
+        # Yield the iteration whose current key is the next key of the
+        # result. Where only keys common to both inputs are kept, the
+        # other input seeks the next key instead of stepping to it.
+        c1, c12, c2 = self._c1, self._c12, self._c2
+        while i1.active and i2.active:
+            cmp_ = compare(i1.key, i2.key)
+            if cmp_ < 0:
+                if c1:
+                    yield i1
+                    i1.advance()
+                else:
+                    i1.seek(i2.key)
+            elif cmp_ == 0:
+                if c12:
+                    yield i1
+                i1.advance()
+                i2.advance()
+            elif c2:
+                yield i2
+                i2.advance()
+            else:
+                i2.seek(i1.key)
+        while c1 and i1.active:
+            yield i1
+            i1.advance()
+        while c2 and i2.active:
+            yield i2
+            i2.advance()
+
+    def __iter__(self):
+        return (i.key for i in self._merge(*self._iterations()))
+
+    def __len__(self):
+        return sum(1 for _ in self._merge(*self._iterations()))
+
+    def __bool__(self):
+        for _ in self._merge(*self._iterations()):
+            return True
+        return False
+
+    def materialize(self, limit=None):
+        if limit is not None:
+            limit = _top_limit(limit, 'limit')
+        i1, i2 = self._iterations()
+        if i1.useValues:
+            result = self._o1._mapping_type()
+        elif self._func is difference and isinstance(self._o1, _Base):
+            result = self._o1._set_type()
+        else:
+            result = self._set_type()
+        if limit != 0:
+            for i in self._merge(i1, i2):
+                result._keys.append(i.key)
+                if i1.useValues:
+                    result._values.append(i.value)
+                if len(result._keys) == limit:
+                    break
+        return result
+
+
+def _view_requested(out):
+    if out not in (None, 'view'):
+        raise ValueError("out must be None or 'view', not %r" % (out,))
+    return out is not None
+
+
+def difference(set_type, o1, o2, out=None):
+    if _view_requested(out):
+        # A view treats None as empty.
+        return _SetOperationView(difference, set_type, o1, o2, 1, 0, 0)
     if o1 is None or o2 is None:
         return o1
     i1 = _SetIteration(o1, True, 0)
@@ -1482,6 +2442,16 @@ def difference(set_type, o1, o2):
         def copy(i):
             result._keys.append(i.key)
 
+    if _seek_operands(o1, o2, False) is not None:
+        while i1.active:
+            i2.seek(i1.key)
+            if i2.active and compare(i2.key, i1.key) == 0:
+                i2.advance()
+            else:
+                copy(i1)
+            i1.advance()
+        return result
+
     while i1.active and i2.active:
         cmp_ = compare(i1.key, i2.key)
         if cmp_ < 0:
@@ -1498,7 +2468,10 @@ def difference(set_type, o1, o2):
     return result
 
 
-def union(set_type, o1, o2):
+def union(set_type, o1, o2, out=None):
+    if _view_requested(out):
+        # A view treats None as empty.
+        return _SetOperationView(union, set_type, o1, o2, 1, 1, 1)
     if o1 is None:
         return o2
     if o2 is None:
@@ -1531,18 +2504,36 @@ def union(set_type, o1, o2):
     return result
 
 
-def intersection(set_type, o1, o2):
+def intersection(set_type, o1, o2, out=None):
+    if _view_requested(out):
+        # As without a view, intersecting with None keeps the keys of the
+        # other input, so a view makes that a union with nothing.
+        with_none = o1 is None or o2 is None
+        return _SetOperationView(intersection, set_type, o1, o2,
+                                 with_none, 1, with_none)
     if o1 is None:
         return o2
     if o2 is None:
         return o1
-    i1 = _SetIteration(o1, False, 0, True)
-    i2 = _SetIteration(o2, False, 0, True)
     result = set_type()
 
     def copy(i):
         result._keys.append(i.key)
 
+    operands = _seek_operands(o1, o2, True)
+    if operands is not None:
+        i1 = _SetIteration(operands[0], False, 0, True)
+        i2 = _SetIteration(operands[1], False, 0, True)
+        while i1.active and i2.active:
+            i2.seek(i1.key)
+            if i2.active and compare(i2.key, i1.key) == 0:
+                copy(i1)
+                i2.advance()
+            i1.advance()
+        return result
+
+    i1 = _SetIteration(o1, False, 0, True)
+    i2 = _SetIteration(o2, False, 0, True)
     while i1.active and i2.active:
         cmp_ = compare(i1.key, i2.key)
         if cmp_ < 0:
@@ -1654,15 +2645,89 @@ def weightedIntersection(set_type, o1, o2, w1=1, w2=1):
     return 1, result
 
 
-def multiunion(set_type, seqs):
-    # XXX simple/slow implementation. Goal is just to get tests to pass.
-    result = set_type()
+def _key_lists(tree):
+    # Yield the lists of keys of the buckets of a Python tree, in order.
+    bucket = tree._firstbucket
+    while bucket is not None:
+        yield bucket._keys
+        bucket = bucket._next
+
+
+def multiunion(set_type, seqs, out=None):
+    # Gather the keys of all the inputs in one native array, then sort
+    # and deduplicate them at once and build the result from the sorted
+    # list, instead of adding the keys to the result one by one.
+    if out not in (None, 'buffer'):
+        raise ValueError("out must be None or 'buffer', not %r" % (out,))
+    to_key = set_type._to_key
+    typecode = to_key.array_typecode
+    gathered = array(typecode)
     for s in seqs:
+        if isinstance(s, _Base):
+            if getattr(s._to_key, 'array_typecode', None) == typecode:
+                # Already converted and in range.
+                if isinstance(s, _BucketBase):
+                    gathered.extend(s._keys)
+                else:
+                    for keys in _key_lists(s):
+                        gathered.extend(keys)
+                continue
+        else:
+            view = _typed_buffer(s, typecode)
+            if view is not None:
+                gathered.frombytes(view.cast('B'))
+                continue
+            try:
+                iter(s)
+            except TypeError:
+                gathered.append(to_key(s))
+                continue
+            if not isinstance(s, (list, tuple)):
+                s = list(s)
+        size = len(gathered)
         try:
-            iter(s)
-        except TypeError:
-            s = set_type((s, ))
-        result.update(s)
+            gathered.extend(s)
+        except (TypeError, ValueError, OverflowError):
+            # Let the key type reject the key, as update() would.
+            del gathered[size:]
+            gathered.extend([to_key(k) for k in s])
+    keys = sorted(set(gathered))
+    if out == 'buffer':
+        return _native_view(keys, to_key, 'keys')
+    result = set_type()
+    result._keys = keys
+    return result
+
+
+def _multi_operand(set_type, s):
+    # Return something supporting ordered iteration and ``in`` for
+    # the keys of an input of multiintersection or multidifference,
+    # converting it as multiunion would.
+    if isinstance(s, _Base):
+        return s
+    try:
+        iter(s)
+    except TypeError:
+        s = (s, )
+    return set_type(s)
+
+
+def multiintersection(set_type, seqs):
+    # Look for the keys of the smallest input in the others.
+    operands = sorted(
+        (_multi_operand(set_type, s) for s in seqs), key=len)
+    result = set_type()
+    if operands:
+        first, rest = operands[0], operands[1:]
+        result.update(k for k in first if all(k in o for o in rest))
+    return result
+
+
+def multidifference(set_type, base, seqs):
+    base = _multi_operand(set_type, base)
+    others = [_multi_operand(set_type, s) for s in seqs]
+    result = set_type()
+    result.update(k for k in base if not any(k in o for o in others))
     return result
 
 
@@ -45,6 +45,18 @@ class DataType:
     # integer key types.
     using64bits = False
 
+    # The :mod:`array` typecode for the native C representation of
+    # this data type, or None if it is stored as Python objects.
+    array_typecode = None
+
+    # Can keys of this data type be saved in prefix state? Only
+    # arbitrary Python objects, which may be bytes or str, can.
+    supports_prefix_state = False
+
+    # Can the keys of a Set of this data type be saved in delta state?
+    # Only native integers can.
+    supports_delta_state = False
+
     def __init__(self):
         if not self.prefix_code:
             self.prefix_code = type(self).__name__
@@ -228,6 +240,7 @@ class O(KeyDataType):  # noqa E742
     long_name = 'Object'
     tree_size = 250
     default_bucket_size = 60
+    supports_prefix_state = True
 
     def as_value_type(self):
         return Any()
@@ -261,6 +274,10 @@ class _AbstractNativeDataType(KeyDataType):
     def _check_native(self):
         return struct.Struct(self._struct_format).pack
 
+    @property
+    def array_typecode(self):
+        return self._struct_format
+
     def __call__(self, item):
         try:
             self._check_native(self._as_packable(item))
@@ -285,6 +302,7 @@ class _AbstractIntDataType(_AbstractNativeDataType):
     _required_python_type = int
     multiplication_identity = 1
     long_name = "Integer"
+    supports_delta_state = True
 
     def getTwoExamples(self):
         return 1, 2
@@ -335,6 +353,48 @@ class F(_AbstractNativeDataType):
         return 0.5, 1.5
 
 
+class D(F):
+    """
+    64-bit floats (C doubles).
+
+    NaN is not a valid key, because it doesn't compare consistently
+    with other floats; it is a valid value.
+    """
+    _struct_format = 'd'
+    long_name = 'Double'
+    _reject_nan = True
+
+    def __call__(self, item):
+        try:
+            item = super().__call__(item)
+        except OverflowError:
+            raise TypeError("couldn't convert integer to C double")
+        if self._reject_nan and item != item:
+            raise TypeError("NaN is not a valid key")
+        return item
+
+    def as_value_type(self):
+        return _DoubleValue()
+
+    def supports_value_union(self):
+        # There is no 'multiunion' for float keys.
+        return False
+
+
+class _DoubleValue(D):
+    """
+    The value type for ``D``: any double, including NaN.
+    """
+    prefix_code = 'D'
+    _reject_nan = False
+
+    def as_value_type(self):
+        return self
+
+    def supports_value_union(self):
+        return True
+
+
 class L(_AbstractIntDataType):
     _struct_format = 'q'
     _error_description = '64-bit integer expected'
@@ -427,6 +487,92 @@ class f(_AbstractBytes):
             cls.fromString = self._make_Bucket_fromString()
 
 
+class _AbstractFixedSizeKey(_AbstractBytes):
+    """
+    A key type for byte strings of a fixed size, such as identifiers
+    and hashes, ordered like the bytes objects.
+
+    This must be subclassed to provide the byte length and prefix code.
+    """
+    long_name = 'Bytes'
+    default_bucket_size = 120
+
+    def get_lower_bound(self):
+        # Coercing integers to bytes only preserves their order if they
+        # are non-negative.
+        return 0
+
+    def getTwoExamples(self):
+        return b'\x00' * self._length, b'\xff' * self._length
+
+    def coerce(self, item):
+        # To coerce an integer, as used in tests, convert it to bytes in
+        # big-endian order.
+        try:
+            return self(item)
+        except TypeError:
+            try:
+                return operator.index(item).to_bytes(self._length, 'big')
+            except OverflowError as e:
+                raise TypeError(e)
+
+
+class b(_AbstractFixedSizeKey):
+    """
+    The key type for a ``bO`` tree: 8 bytes, like a ZODB object ID or
+    transaction ID.
+    """
+    prefix_code = 'b'
+    _length = 8
+
+
+class g(_AbstractFixedSizeKey):
+    """
+    The key type for a ``gO`` tree: 16 bytes, like the ``bytes`` of a
+    UUID (GUID).
+    """
+    prefix_code = 'g'
+    _length = 16
+
+
+class S(KeyDataType):
+    """
+    The key type for ``SO`` and ``SI`` trees: ``str`` objects, compared
+    as strings without going through rich comparison.
+    """
+    long_name = 'String'
+    tree_size = 250
+    default_bucket_size = 60
+    supports_prefix_state = True
+
+    def __call__(self, item):
+        if not isinstance(item, str):
+            raise TypeError(f"str expected, not {item!r}")
+        return item
+
+    def supports_value_union(self):
+        return False
+
+    def get_lower_bound(self):
+        # Coercing integers to strings only preserves their order if
+        # they are non-negative.
+        return 0
+
+    def getTwoExamples(self):
+        return 'a', 'b'
+
+    def coerce(self, item):
+        # To coerce an integer, as used in tests, zero-pad its decimal
+        # representation so that the strings sort like the integers.
+        try:
+            return self(item)
+        except TypeError:
+            item = operator.index(item)
+            if item < 0:
+                raise TypeError(f"can't coerce negative {item!r}")
+            return '%020d' % item
+
+
 class s(_AbstractBytes):
     """
     The value type for an ``fs`` tree.
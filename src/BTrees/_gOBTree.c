@@ -0,0 +1,34 @@
+/*############################################################################
+#
+# Copyright (c) 2004 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+############################################################################*/
+
+#define MASTER_ID "$Id$\n"
+
+/* gOBTree - 16-byte key, object value BTree
+
+   Implements a collection using keys that are bytes objects of exactly 16
+   bytes, such as the bytes of UUIDs, and object type values
+*/
+
+#define PERSISTENT
+
+#define MOD_NAME_PREFIX "gO"
+
+#define KEY_SIZE 16
+
+#include "Python.h"
+#include "byteskeymacros.h"
+#include "objectvaluemacros.h"
+
+#define INITMODULE PyInit__gOBTree
+#include "BTreeModuleTemplate.c"
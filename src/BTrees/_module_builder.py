@@ -87,6 +87,8 @@ def _create_classes(
 def _create_set_operations(module_name, key_type, value_type, set_type):
     from ._base import difference
     from ._base import intersection
+    from ._base import multidifference
+    from ._base import multiintersection
     from ._base import multiunion
     from ._base import set_operation
     from ._base import union
@@ -103,7 +105,7 @@ def _create_set_operations(module_name, key_type, value_type, set_type):
             if value_type.supports_value_union()
             else ()
         ) + (
-            (multiunion,)
+            (multiunion, multiintersection, multidifference)
             if key_type.supports_value_union()
             else ()
         )
@@ -154,6 +156,7 @@ def populate_module(mod_globals,
         'Bucket', 'Set', 'BTree', 'TreeSet',
         'union', 'intersection', 'difference',
         'weightedUnion', 'weightedIntersection', 'multiunion',
+        'multiintersection', 'multidifference',
     )
     prefix = key_datatype.prefix_code + value_datatype.prefix_code
 
@@ -174,7 +177,7 @@ def populate_module(mod_globals,
     directlyProvides(module or sys.modules[module_name], interface)
     for cls_name, iface in {
             'BTree': interfaces.IBTree,
-            'Bucket': interfaces.IMinimalDictionary,
+            'Bucket': interfaces.IBucket,
             'Set': interfaces.ISet,
             'TreeSet': interfaces.ITreeSet,
             'TreeItems': interfaces.IMinimalSequence,
@@ -209,6 +212,7 @@ def populate_module(mod_globals,
                 value_datatype
             )
             cls.max_internal_size = key_datatype.tree_size
+            cls.counted = False
 
 
 def create_module(prefix):
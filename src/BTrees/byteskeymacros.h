@@ -0,0 +1,31 @@
+#define KEYMACROS_H "$Id$\n"
+
+/* Keys are byte strings of exactly KEY_SIZE bytes, which the module must
+   define before including this file.  They are stored in the key arrays
+   themselves and ordered like the bytes objects they come from. */
+
+#include "Python.h"
+
+typedef unsigned char bytes_key[KEY_SIZE];
+
+#define KEY_TYPE bytes_key
+#undef KEY_TYPE_IS_PYOBJECT
+
+static int
+bytes_key_compare(const unsigned char *lhs, const unsigned char *rhs)
+{
+    int cmp = memcmp(lhs, rhs, KEY_SIZE);
+    return (cmp > 0) - (cmp < 0);
+}
+
+#define KEY_CHECK(K) (PyBytes_Check(K) && PyBytes_GET_SIZE(K) == KEY_SIZE)
+#define TEST_KEY_SET_OR(V, K, T) if ( ( (V) = bytes_key_compare((K), (T)) ), 0 )
+#define DECREF_KEY(KEY)
+#define INCREF_KEY(k)
+#define COPY_KEY(KEY, E) (memcpy((KEY), (E), KEY_SIZE))
+#define COPY_KEY_TO_OBJECT(O, K) \
+    O=PyBytes_FromStringAndSize((const char*)(K), KEY_SIZE)
+#define COPY_KEY_FROM_ARG(TARGET, ARG, STATUS) \
+  if (KEY_CHECK(ARG)) memcpy(TARGET, PyBytes_AS_STRING(ARG), KEY_SIZE); else { \
+      PyErr_Format(PyExc_TypeError, "expected %d-byte key", KEY_SIZE); \
+      (STATUS)=0; }
@@ -85,6 +85,29 @@ from BTrees.OUBTree import OUBTreePy, OUBucketPy, OUSetPy, OUTreeSetPy
 from BTrees.OQBTree import OQBTree, OQBucket, OQSet, OQTreeSet
 from BTrees.OQBTree import OQBTreePy, OQBucketPy, OQSetPy, OQTreeSetPy
 
+from BTrees.bOBTree import bOBTree, bOBucket, bOSet, bOTreeSet
+from BTrees.bOBTree import bOBTreePy, bOBucketPy, bOSetPy, bOTreeSetPy
+from BTrees.gOBTree import gOBTree, gOBucket, gOSet, gOTreeSet
+from BTrees.gOBTree import gOBTreePy, gOBucketPy, gOSetPy, gOTreeSetPy
+
+from BTrees.SOBTree import SOBTree, SOBucket, SOSet, SOTreeSet
+from BTrees.SOBTree import SOBTreePy, SOBucketPy, SOSetPy, SOTreeSetPy
+from BTrees.SIBTree import SIBTree, SIBucket, SISet, SITreeSet
+from BTrees.SIBTree import SIBTreePy, SIBucketPy, SISetPy, SITreeSetPy
+
+from BTrees.DOBTree import DOBTree, DOBucket, DOSet, DOTreeSet
+from BTrees.DOBTree import DOBTreePy, DOBucketPy, DOSetPy, DOTreeSetPy
+from BTrees.DDBTree import DDBTree, DDBucket, DDSet, DDTreeSet
+from BTrees.DDBTree import DDBTreePy, DDBucketPy, DDSetPy, DDTreeSetPy
+from BTrees.DIBTree import DIBTree, DIBucket, DISet, DITreeSet
+from BTrees.DIBTree import DIBTreePy, DIBucketPy, DISetPy, DITreeSetPy
+from BTrees.DLBTree import DLBTree, DLBucket, DLSet, DLTreeSet
+from BTrees.DLBTree import DLBTreePy, DLBucketPy, DLSetPy, DLTreeSetPy
+from BTrees.IDBTree import IDBTree, IDBucket, IDSet, IDTreeSet
+from BTrees.IDBTree import IDBTreePy, IDBucketPy, IDSetPy, IDTreeSetPy
+from BTrees.LDBTree import LDBTree, LDBucket, LDSet, LDTreeSet
+from BTrees.LDBTree import LDBTreePy, LDBucketPy, LDSetPy, LDTreeSetPy
+
 from BTrees.fsBTree import fsBTree, fsBucket, fsSet, fsTreeSet
 from BTrees.fsBTree import fsBTreePy, fsBucketPy, fsSetPy, fsTreeSetPy
 
@@ -101,6 +124,9 @@ _FAMILIES = (
     'LL', 'LO', 'LF', 'LQ',
     'UU', 'UO', 'UF', 'UI',
     'QQ', 'QO', 'QF', 'QL',
+    'bO', 'gO',
+    'SO', 'SI',
+    'DO', 'DD', 'DI', 'DL', 'ID', 'LD',
     'fs',
 )
 for kv in _FAMILIES:
@@ -164,6 +190,9 @@ BTREE_EMPTY, BTREE_ONE, BTREE_NORMAL = range(3)
 #                                       key[len-1], child[len-1]),
 #          self->firstbucket
 #     )
+#
+# If the BTree's class is counted, a third element follows: a tuple of the
+# number of elements under each child.
 
 _btree2bucket = {}
 for kv in _FAMILIES:
@@ -187,8 +216,8 @@ def crack_btree(t, is_mapping):
         state = state[0]
         return BTREE_ONE, state, None
 
-    assert len(state) == 2
-    data, firstbucket = state
+    assert len(state) in (2, 3)
+    data, firstbucket = state[:2]
     n = len(data)
     assert n & 1
     kids = []
@@ -229,11 +258,38 @@ def crack_btree(t, is_mapping):
 #                               keys[len-1], values[len-1]),
 #          <self->next iff non-NULL>
 #     )
+#
+# If the bucket's class has a state_format of 'packed', the keys (and
+# values) are instead bytes objects of little-endian native numbers:
+#
+#     (keys, <self->next iff non-NULL>)          # for a set
+#     (keys, values, <self->next iff non-NULL>)  # for a mapping
+#
+# If a set bucket's class has a state_format of 'delta', the keys are the
+# differences between consecutive keys as unsigned LEB128 varints:
+#
+#     (len, deltas, <self->next iff non-NULL>)
+#
+# If the bucket's class has a state_format of 'prefix' and its keys are all
+# bytes or all str, each key is replaced by what follows the prefix it shares
+# with the previous key, and the lengths of those prefixes follow as varints:
+#
+#     (suffixes, shared, <self->next iff non-NULL>)   # for a set
+#     (suffixes and values interleaved, shared, <self->next iff non-NULL>)
 
 
 def crack_bucket(b, is_mapping):
     state = b.__getstate__()
     assert isinstance(state, tuple)
+    if (isinstance(state[0], (bytes, int))
+            or len(state) > 1 and isinstance(state[1], bytes)):
+        # Packed, delta or prefix state; let a bucket of the same type
+        # unpack it.
+        copy = type(b)()
+        copy.__setstate__(state)
+        if not is_mapping:
+            return list(copy.keys()), []
+        return list(copy.keys()), list(copy.values())
     assert 1 <= len(state) <= 2
     data = state[0]
     if not is_mapping:
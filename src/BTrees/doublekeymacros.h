@@ -0,0 +1,25 @@
+#define KEYMACROS_H "$Id$\n"
+
+/* C double as key.  NaN is rejected because it doesn't compare
+   consistently with other keys. */
+
+#define KEY_TYPE double
+#define KEY_TYPECODE 'd'
+#undef KEY_TYPE_IS_PYOBJECT
+
+#define NEED_DOUBLE_CONVERT
+#define KEY_CHECK(K) (PyFloat_Check(K) || PyLong_Check(K))
+#define COPY_KEY_TO_OBJECT(O, K) O=PyFloat_FromDouble(K)
+#define COPY_KEY_FROM_ARG(TARGET, ARG, STATUS)                      \
+  if (!double_convert((ARG), &(TARGET), "key")) {                   \
+      (STATUS)=0; (TARGET)=0; }                                     \
+  else if (Py_IS_NAN(TARGET)) {                                     \
+      PyErr_SetString(PyExc_TypeError, "NaN is not a valid key");   \
+      (STATUS)=0; (TARGET)=0; }
+
+/* Keys read directly from buffers are checked with this. */
+#define KEY_IS_NAN(K) Py_IS_NAN(K)
+#define TEST_KEY_SET_OR(V, K, T) if ( ( (V) = (((K) < (T)) ? -1 : (((K) > (T)) ? 1: 0)) ) , 0 )
+#define DECREF_KEY(KEY)
+#define INCREF_KEY(k)
+#define COPY_KEY(KEY, E) (KEY=(E))
@@ -0,0 +1,26 @@
+#define VALUEMACROS_H "$Id$\n"
+
+#define VALUE_TYPE double
+#define VALUE_TYPECODE 'd'
+#undef VALUE_TYPE_IS_PYOBJECT
+#define TEST_VALUE(K, T) (((K) < (T)) ? -1 : (((K) > (T)) ? 1: 0))
+#define VALUE_SAME(VALUE, TARGET) ( (VALUE) == (TARGET) )
+/* NaN values can't be ranked, so byValue() and topk() skip them. */
+#define VALUE_IS_NAN(V) Py_IS_NAN(V)
+#define DECLARE_VALUE(NAME) VALUE_TYPE NAME
+#define VALUE_PARSE "d"
+#define DECREF_VALUE(k)
+#define INCREF_VALUE(k)
+#define COPY_VALUE(V, E) (V=(E))
+#define COPY_VALUE_TO_OBJECT(O, K) O=PyFloat_FromDouble(K)
+
+#define NEED_DOUBLE_CONVERT
+#define COPY_VALUE_FROM_ARG(TARGET, ARG, STATUS)                        \
+  if (!double_convert((ARG), &(TARGET), "value")) {                     \
+      (STATUS)=0; (TARGET)=0; }
+
+#define NORMALIZE_VALUE(V, MIN) ((MIN) > 0) ? ((V)/=(MIN)) : 0
+
+#define MERGE_DEFAULT 1.0
+#define MERGE(O1, w1, O2, w2) ((O1)*(w1)+(O2)*(w2))
+#define MERGE_WEIGHT(O, w) ((O)*(w))
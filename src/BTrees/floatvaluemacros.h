@@ -2,9 +2,12 @@
 #define VALUEMACROS_H "$Id$\n"
 
 #define VALUE_TYPE float
+#define VALUE_TYPECODE 'f'
 #undef VALUE_TYPE_IS_PYOBJECT
 #define TEST_VALUE(K, T) (((K) < (T)) ? -1 : (((K) > (T)) ? 1: 0))
 #define VALUE_SAME(VALUE, TARGET) ( (VALUE) == (TARGET) )
+/* NaN values can't be ranked, so byValue() and topk() skip them. */
+#define VALUE_IS_NAN(V) Py_IS_NAN(V)
 #define DECLARE_VALUE(NAME) VALUE_TYPE NAME
 #define VALUE_PARSE "f"
 #define DECREF_VALUE(k)
@@ -11,6 +11,7 @@
 
 #define NEED_LONG_LONG_KEYS
 #define KEY_TYPE PY_LONG_LONG
+#define KEY_TYPECODE 'q'
 
 #define NEED_LONG_LONG_CHECK
 #define KEY_CHECK longlong_check
@@ -29,6 +30,7 @@
 /* C int as key */
 
 #define KEY_TYPE int
+#define KEY_TYPECODE 'i'
 #define KEY_CHECK PyLong_Check
 #define COPY_KEY_TO_OBJECT(O, K) O=PyLong_FromLong(K)
 #define COPY_KEY_FROM_ARG(TARGET, ARG, STATUS)                    \
@@ -61,6 +63,7 @@
 #define NEED_LONG_LONG_SUPPORT
 #define NEED_LONG_LONG_KEYS
 #define KEY_TYPE unsigned PY_LONG_LONG
+#define KEY_TYPECODE 'Q'
 
 #define NEED_ULONG_LONG_CHECK
 #define KEY_CHECK ulonglong_check
@@ -79,6 +82,7 @@
 /* C int as key */
 
 #define KEY_TYPE unsigned int
+#define KEY_TYPECODE 'I'
 #define KEY_CHECK PyLong_Check
 #define COPY_KEY_TO_OBJECT(O, K) O=PyLong_FromUnsignedLongLong(K)
 
@@ -113,6 +117,7 @@
 #endif /* ZODB_SIGNED_KEY_INTS */
 
 #undef KEY_TYPE_IS_PYOBJECT
+#define KEY_TYPE_IS_INTEGER
 
 #define TEST_KEY_SET_OR(V, K, T) if ( ( (V) = (((K) < (T)) ? -1 : (((K) > (T)) ? 1: 0)) ) , 0 )
 #define DECREF_KEY(KEY)
@@ -14,6 +14,7 @@
 #ifdef ZODB_64BIT_INTS
 #define NEED_LONG_LONG_SUPPORT
 #define VALUE_TYPE PY_LONG_LONG
+#define VALUE_TYPECODE 'q'
 #define VALUE_PARSE "L"
 
 #define NEED_LONG_LONG_AS_OBJECT
@@ -27,6 +28,7 @@
     }
 #else
 #define VALUE_TYPE int
+#define VALUE_TYPECODE 'i'
 #define VALUE_PARSE "i"
 #define COPY_VALUE_TO_OBJECT(O, K) O=PyLong_FromLong(K)
 
@@ -56,6 +58,7 @@
 /* unsigned, 64-bit values */
 #define NEED_LONG_LONG_SUPPORT
 #define VALUE_TYPE unsigned PY_LONG_LONG
+#define VALUE_TYPECODE 'Q'
 #define VALUE_PARSE "K"
 
 #define NEED_ULONG_LONG_AS_OBJECT
@@ -70,6 +73,7 @@
 #else
 /* unsigned, 32-bit values */
 #define VALUE_TYPE unsigned int
+#define VALUE_TYPECODE 'I'
 #define VALUE_PARSE "I"
 #define COPY_VALUE_TO_OBJECT(O, K) O=PyLong_FromUnsignedLongLong(K)
 
@@ -16,6 +16,27 @@
 
 static PyObject *object_; /* initialized in BTreeModuleTemplate init */
 
+/* Compare keys like COMPARE, but compare exact bytes with memcmp and exact
+ * str with PyUnicode_Compare instead of two rich comparisons.
+ */
+static int
+object_key_compare(PyObject *lhs, PyObject *rhs)
+{
+    if (PyBytes_CheckExact(lhs) && PyBytes_CheckExact(rhs))
+    {
+        Py_ssize_t llen = PyBytes_GET_SIZE(lhs), rlen = PyBytes_GET_SIZE(rhs);
+        int cmp = memcmp(PyBytes_AS_STRING(lhs), PyBytes_AS_STRING(rhs),
+                         llen < rlen ? llen : rlen);
+
+        if (cmp == 0)
+            return (llen > rlen) - (llen < rlen);
+        return cmp < 0 ? -1 : 1;
+    }
+    if (PyUnicode_CheckExact(lhs) && PyUnicode_CheckExact(rhs))
+        return PyUnicode_Compare(lhs, rhs);
+    return COMPARE(lhs, rhs);
+}
+
 static int
 check_argument_cmp(PyObject *arg)
 {
@@ -40,7 +61,7 @@ check_argument_cmp(PyObject *arg)
 }
 
 #define TEST_KEY_SET_OR(V, KEY, TARGET) \
-if ( ( (V) = COMPARE((KEY),(TARGET)) ), PyErr_Occurred() )
+if ( ( (V) = object_key_compare((KEY),(TARGET)) ), PyErr_Occurred() )
 #define INCREF_KEY(k) Py_INCREF(k)
 #define DECREF_KEY(KEY) Py_DECREF(KEY)
 #define COPY_KEY(KEY, E) KEY=(E)
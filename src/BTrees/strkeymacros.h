@@ -0,0 +1,30 @@
+#define KEYMACROS_H "$Id$\n"
+#define KEY_TYPE PyObject *
+#define KEY_TYPE_IS_PYOBJECT
+
+#include "Python.h"
+
+/* Keys are str objects (or instances of subclasses, which are compared as
+   str).  Unlike object keys, they can be compared directly, without the
+   rich comparison protocol, and can't raise errors when compared. */
+
+static PyObject *object_; /* initialized in BTreeModuleTemplate init */
+
+static int
+str_key_compare(PyObject *lhs, PyObject *rhs)
+{
+    if (lhs == rhs)
+        return 0;
+    return PyUnicode_Compare(lhs, rhs);
+}
+
+#define TEST_KEY_SET_OR(V, KEY, TARGET) \
+if ( ( (V) = str_key_compare((KEY),(TARGET)) ), 0 )
+#define INCREF_KEY(k) Py_INCREF(k)
+#define DECREF_KEY(KEY) Py_DECREF(KEY)
+#define COPY_KEY(KEY, E) KEY=(E)
+#define COPY_KEY_TO_OBJECT(O, K) O=(K); Py_INCREF(O)
+#define COPY_KEY_FROM_ARG(TARGET, ARG, S) \
+  if (PyUnicode_Check(ARG)) { TARGET=(ARG); (S) = 1; } else { \
+      PyErr_SetString(PyExc_TypeError, "expected str key"); \
+      (S) = 0; }
@@ -22,11 +22,11 @@ from .common import MappingBase
 from .common import MappingConflictTestBase
 from .common import ModuleTest
 from .common import MultiUnion
-from .common import NormalSetTests
 from .common import SetConflictTestBase
 from .common import SetResult
 from .common import TestLongIntKeys
 from .common import TestLongIntValues
+from .common import TreeSetTests
 from .common import Weighted
 from .common import itemsToSet
 from .common import makeMapBuilder
@@ -181,6 +181,9 @@ class ClassBuilder:
             # These are specific to MultiUnion, and may not exist
             # in key types that don't support unions (``'O'``)
             multiunion = getattr(btree_module, 'multiunion', None)
+            multiintersection = getattr(
+                btree_module, 'multiintersection', None)
+            multidifference = getattr(btree_module, 'multidifference', None)
             mkset = btree_module.Set
             mktreeset = btree_module.TreeSet
             mkbtree = tree
@@ -245,7 +248,7 @@ class ClassBuilder:
         tree = getattr(btree_module, type_name)
         iface = {
             'BTree': interfaces.IBTree,
-            'Bucket': interfaces.IMinimalDictionary,
+            'Bucket': interfaces.IBucket,
             'Set': interfaces.ISet,
             'TreeSet': interfaces.ITreeSet
         }[type_name]
@@ -295,7 +298,7 @@ class ClassBuilder:
                              I_SetsBase,
                              SetConflictTestBase,)),
                     ('TreeSet', (I_SetsBase,
-                                 NormalSetTests,
+                                 TreeSetTests,
                                  SetConflictTestBase,))
             ):
                 self._create_type_tests(btree_module, type_name, test_bases)
@@ -25,6 +25,14 @@ class OOBTreeTest(BTreeTests):
         self.assertEqual(list(tree.byValue(22)),
                          [(y, x) for x, y in reversed(ITEMS[22:])])
 
+    def test_topk_uncomparable_values(self):
+        tree = self._makeOne()
+        for i in range(40):
+            tree[i] = i
+        tree[40] = 'forty'
+        self.assertRaises(TypeError, tree.topk, 5)
+        self.assertRaises(TypeError, tree.byValue, 0, 5)
+
     def testRejectDefaultComparisonOnSet(self):
         # Check that passing in keys w default comparison fails. Only
         # applies to new-style class instances if we're using the C
@@ -2973,22 +2973,72 @@ class Test_multiunion(unittest.TestCase, _SetObBase):
         from .._base import multiunion
         return multiunion(*args, **kw)
 
+    def _set_type(self):
+        from BTrees.IIBTree import IISetPy
+        return IISetPy
+
     def test_no_seqs(self):
-        result = self._callFUT(_Set, ())
+        result = self._callFUT(self._set_type(), ())
+        self.assertIsInstance(result, self._set_type())
         self.assertEqual(list(result), [])
 
     def test_w_non_iterable_seq(self):
-        result = self._callFUT(_Set, (1, 2))
+        result = self._callFUT(self._set_type(), (2, 1))
         self.assertEqual(list(result), [1, 2])
 
     def test_w_iterable_seqs(self):
-        result = self._callFUT(_Set, [(1,), (2,)])
+        result = self._callFUT(self._set_type(), [(2,), (1,)])
         self.assertEqual(list(result), [1, 2])
 
     def test_w_mix(self):
-        result = self._callFUT(_Set, [1, (2,)])
+        result = self._callFUT(self._set_type(), [1, (2,)])
         self.assertEqual(list(result), [1, 2])
 
+    def test_w_sets_and_trees(self):
+        from BTrees.IIBTree import IIBTreePy
+        from BTrees.IIBTree import IITreeSetPy
+        from BTrees.LLBTree import LLSetPy
+
+        class Tree(IIBTreePy):
+            max_leaf_size = 4
+
+        tree = Tree()
+        for i in range(0, 30, 3):
+            tree[i] = -i
+        self.assertIsNot(tree._firstbucket._next, None)
+        inputs = [
+            tree,
+            IITreeSetPy(range(0, 30, 2)),
+            self._set_type()([5, 1]),
+            LLSetPy([7, 31]),
+        ]
+        result = self._callFUT(self._set_type(), inputs)
+        expected = sorted(set(range(0, 30, 3)) | set(range(0, 30, 2))
+                          | {1, 5, 7, 31})
+        self.assertEqual(list(result), expected)
+        # Keys of other types are still checked.
+        with self.assertRaises(TypeError):
+            self._callFUT(self._set_type(), [LLSetPy([2 ** 40])])
+
+    def test_w_bad_keys(self):
+        def gen():
+            yield 1
+            yield 'a'
+        with self.assertRaises(TypeError):
+            self._callFUT(self._set_type(), [(1, 2), gen()])
+        with self.assertRaises(TypeError):
+            self._callFUT(self._set_type(), [[2 ** 40]])
+
+    def test_w_buffers(self):
+        from array import array
+        result = self._callFUT(
+            self._set_type(), [array('i', [9, 2]), b'\x05', array('q', [4])])
+        self.assertEqual(list(result), [2, 4, 5, 9])
+
+    def test_out_buffer(self):
+        result = self._callFUT(self._set_type(), [[3, 1], [1]], out='buffer')
+        self.assertEqual(result.tolist(), [1, 3])
+
 
 class Test_helpers(unittest.TestCase):
 
@@ -23,6 +23,10 @@ to_float = _datatypes.F()
 to_long = _datatypes.L()
 to_2_bytes = _datatypes.f()
 to_6_bytes = _datatypes.s()
+to_8_bytes = _datatypes.b()
+to_16_bytes = _datatypes.g()
+to_str = _datatypes.S()
+to_double = _datatypes.D()
 
 
 class TestDatatypes(unittest.TestCase):
@@ -83,3 +87,44 @@ class TestDatatypes(unittest.TestCase):
 
         # values outside the bigger than 64-bits are disallowed
         self.assertRaises(TypeError, to_6_bytes.coerce, 2 ** 64 + 1)
+
+    def test_to_8_bytes(self):
+        self.assertEqual(to_8_bytes(b'abcdefgh'), b'abcdefgh')
+        self.assertRaises(TypeError, to_8_bytes, b'abcdef')
+        self.assertRaises(TypeError, to_8_bytes, 'abcdefgh')
+
+    def test_coerce_to_16_bytes(self):
+        # correct input is passed through
+        self.assertEqual(to_16_bytes.coerce(b'a' * 16), b'a' * 16)
+
+        # integers are converted in big-endian order, preserving their order
+        self.assertEqual(to_16_bytes.coerce(258), b'\x00' * 14 + b'\x01\x02')
+        self.assertLess(to_16_bytes.coerce(255), to_16_bytes.coerce(256))
+
+        # negative and too large values are disallowed
+        self.assertRaises(TypeError, to_16_bytes.coerce, -1)
+        self.assertRaises(TypeError, to_16_bytes.coerce, 2 ** 128)
+
+    def test_coerce_to_str(self):
+        self.assertEqual(to_str('abc'), 'abc')
+        self.assertRaises(TypeError, to_str, b'abc')
+        self.assertRaises(TypeError, to_str, 1)
+
+        # integers are zero-padded, preserving their order
+        self.assertEqual(to_str.coerce(42), '0' * 18 + '42')
+        self.assertLess(to_str.coerce(9), to_str.coerce(10))
+        self.assertRaises(TypeError, to_str.coerce, -1)
+
+    def test_to_double(self):
+        # doubles keep precision that floats lose
+        self.assertEqual(to_double(0.1), 0.1)
+        self.assertEqual(to_double(3), 3.0)
+        self.assertIsInstance(to_double(3), float)
+        self.assertRaises(TypeError, to_double, 'abc')
+        self.assertRaises(TypeError, to_double, 10 ** 400)
+
+        # NaN is a valid value, but not a valid key
+        nan = float('nan')
+        self.assertRaises(TypeError, to_double, nan)
+        self.assertNotEqual(to_double.as_value_type()(nan), nan)
+        self.assertEqual(to_double.as_value_type().prefix_code, 'D')
@@ -77,3 +77,102 @@ class SubclassTest(unittest.TestCase):
         from BTrees.OOBTree import OOBTreePy
         from BTrees.OOBTree import OOBucketPy
         self._checkReplaceNodeSizes(OOBTreePy, OOBucketPy)
+
+    def _checkChangeNodeSizes(self, TreeKind):
+        # Changing the sizes of a class, or of a class it inherits them
+        # from, applies to its existing trees.
+        def bucket_lengths(t):
+            lengths = []
+            bucket = t._firstbucket
+            while bucket is not None:
+                lengths.append(len(bucket))
+                bucket = bucket._next
+            return lengths
+
+        class Base(TreeKind):
+            max_leaf_size = 10
+
+        class Sub(Base):
+            pass
+
+        base, sub = Base(), Sub()
+        for t in base, sub:
+            for i in range(11):
+                t[i] = i
+            self.assertEqual(bucket_lengths(t), [5, 6])
+
+        Base.max_leaf_size = 4
+        for t in base, sub:
+            t[11] = 11
+            self.assertEqual(bucket_lengths(t), [5, 3, 4])
+
+        Sub.max_leaf_size = 20
+        for i in range(12, 40):
+            sub[i] = i
+        self.assertEqual(bucket_lengths(sub), [5, 3, 10, 10, 12])
+
+        del Sub.max_leaf_size
+        sub[40] = 40
+        self.assertEqual(bucket_lengths(sub), [5, 3, 10, 10, 6, 7])
+
+    def _checkChangeMixinNodeSizes(self, TreeKind):
+        # The sizes can also come from a class that isn't a BTree, and
+        # changing them there applies too.
+        class Sizes:
+            max_leaf_size = 10
+
+        class Tree(Sizes, TreeKind):
+            pass
+
+        t = Tree()
+        for i in range(11):
+            t[i] = i
+        self.assertEqual(len(t.__getstate__()[0]), 3)
+        Sizes.max_leaf_size = 4
+        t[11] = 11
+        self.assertEqual(len(t.__getstate__()[0]), 5)
+
+    def testChangeMixinNodeSizesNative(self):
+        self._checkChangeMixinNodeSizes(OOBTree)
+
+    def testChangeMixinNodeSizesPython(self):
+        from BTrees.OOBTree import OOBTreePy
+        self._checkChangeMixinNodeSizes(OOBTreePy)
+
+    def testChangeNodeSizesNative(self):
+        self._checkChangeNodeSizes(OOBTree)
+
+    def testChangeNodeSizesPython(self):
+        from BTrees.OOBTree import OOBTreePy
+        self._checkChangeNodeSizes(OOBTreePy)
+
+    def _checkTightlyPackedBigKeys(self, TreeKind):
+        # Distinct 64-bit keys can be closer together than doubles can
+        # tell apart; searching the interior nodes must still find them.
+        import random
+
+        class Tree(TreeKind):
+            max_leaf_size = 4
+
+        keys = list(range(2 ** 62 + 512, 2 ** 62 + 1512))
+        random.Random(42).shuffle(keys)
+        t = Tree()
+        for k in keys:
+            t[k] = 1
+        t._check()
+        keys.sort()
+        self.assertEqual(list(t), keys)
+        for k in keys:
+            self.assertIn(k, t)
+        self.assertNotIn(2 ** 62, t)
+        self.assertNotIn(2 ** 62 + 2000, t)
+        self.assertEqual(t.minKey(2 ** 62 + 1000), 2 ** 62 + 1000)
+        self.assertEqual(t.maxKey(2 ** 62 + 2000), keys[-1])
+
+    def testTightlyPackedBigKeysL(self):
+        from BTrees.LLBTree import LLBTree
+        self._checkTightlyPackedBigKeys(LLBTree)
+
+    def testTightlyPackedBigKeysQ(self):
+        from BTrees.QQBTree import QQBTree
+        self._checkTightlyPackedBigKeys(QQBTree)
@@ -0,0 +1,142 @@
+##############################################################################
+#
+# Copyright (c) 2024 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE
+#
+##############################################################################
+import unittest
+
+
+class Test_measure_node_sizes(unittest.TestCase):
+
+    def _callFUT(self, *args, **kwargs):
+        from BTrees.tuning import measure_node_sizes
+        kwargs.setdefault('repeat', 1)
+        return measure_node_sizes(*args, **kwargs)
+
+    def _check_btree(self, tree_type):
+        items = [(i, str(i)) for i in range(1000)]
+        measurements = self._callFUT(tree_type, items,
+                                     leaf_sizes=(10, 100),
+                                     internal_sizes=(4, 50))
+        self.assertEqual(
+            [(m.max_leaf_size, m.max_internal_size) for m in measurements],
+            [(10, 4), (100, 4), (10, 50), (100, 50)])
+        for m in measurements:
+            self.assertGreater(m.insert_time, 0)
+            self.assertGreater(m.lookup_time, 0)
+            self.assertGreater(m.records, m.leaves)
+            self.assertGreater(m.state_size, m.leaves * m.leaf_state_size)
+        small, large = measurements[:2]
+        self.assertGreater(small.leaves, large.leaves)
+        self.assertLess(small.leaf_state_size, large.leaf_state_size)
+        # Larger internal nodes need fewer of them.
+        self.assertEqual(measurements[0].leaves, measurements[2].leaves)
+        self.assertGreater(measurements[0].records, measurements[2].records)
+
+    def test_btree(self):
+        from BTrees.IOBTree import IOBTree
+        self._check_btree(IOBTree)
+
+    def test_btree_py(self):
+        from BTrees.IOBTree import IOBTreePy
+        self._check_btree(IOBTreePy)
+
+    def test_counted_btree(self):
+        from BTrees.IOBTree import IOBTree
+
+        class Counted(IOBTree):
+            counted = True
+
+        self._check_btree(Counted)
+
+    def test_treeset(self):
+        from BTrees.OOBTree import OOTreeSet
+        keys = ['%04d' % i for i in range(500)]
+        measurements = self._callFUT(OOTreeSet, keys, leaf_sizes=(10, 1000),
+                                     internal_sizes=(10,))
+        small, large = measurements
+        self.assertGreater(small.records, 1)
+        # All the keys fit in one leaf, stored inline.
+        self.assertEqual(large.records, 1)
+        self.assertEqual(large.leaves, 1)
+        self.assertEqual(large.state_size, large.leaf_state_size)
+
+    def test_default_sizes(self):
+        from BTrees.OOBTree import OOBTree
+
+        class Small(OOBTree):
+            max_leaf_size = 4
+            max_internal_size = 6
+
+        measurements = self._callFUT(Small, [(1, 1)])
+        self.assertEqual(
+            sorted({m.max_leaf_size for m in measurements}),
+            [2, 4, 8, 16, 32])
+        self.assertEqual(
+            sorted({m.max_internal_size for m in measurements}),
+            [3, 6, 12])
+        # The class itself isn't changed.
+        self.assertEqual(Small.max_leaf_size, 4)
+
+    def test_lookups(self):
+        from BTrees.OOBTree import OOBTree
+        measurements = self._callFUT(OOBTree, [(1, 1)], lookups=[],
+                                     leaf_sizes=(2,), internal_sizes=(2,))
+        self.assertEqual(len(measurements), 1)
+        self.assertLess(measurements[0].lookup_time, 0.1)
+
+    def test_too_small(self):
+        from BTrees.OOBTree import OOBTree
+        self.assertRaises(ValueError, self._callFUT, OOBTree, [],
+                          leaf_sizes=(1,))
+        self.assertRaises(ValueError, self._callFUT, OOBTree, [],
+                          internal_sizes=(0,))
+
+    def test_repr(self):
+        from BTrees.OOBTree import OOBTree
+        m, = self._callFUT(OOBTree, [], leaf_sizes=(2,), internal_sizes=(3,))
+        self.assertTrue(repr(m).startswith(
+            '<NodeSizeMeasurement max_leaf_size=2 max_internal_size=3 '))
+
+
+class Test_suggest_node_sizes(unittest.TestCase):
+
+    def _callFUT(self, *args, **kwargs):
+        from BTrees.tuning import suggest_node_sizes
+        kwargs.setdefault('repeat', 1)
+        kwargs.setdefault('leaf_sizes', (10, 100))
+        kwargs.setdefault('internal_sizes', (10,))
+        return suggest_node_sizes(*args, **kwargs)
+
+    def _items(self):
+        return [(i, i) for i in range(1000)]
+
+    def test_fastest(self):
+        from BTrees.IIBTree import IIBTree
+        m = self._callFUT(IIBTree, self._items())
+        self.assertIn(m.max_leaf_size, (10, 100))
+
+    def test_max_records(self):
+        from BTrees.IIBTree import IIBTree
+        m = self._callFUT(IIBTree, self._items(), max_records=50)
+        self.assertEqual(m.max_leaf_size, 100)
+        self.assertLessEqual(m.records, 50)
+
+    def test_max_leaf_state_size(self):
+        from BTrees.IIBTree import IIBTree
+        m = self._callFUT(IIBTree, self._items(), max_leaf_state_size=100)
+        self.assertEqual(m.max_leaf_size, 10)
+        self.assertLessEqual(m.leaf_state_size, 100)
+
+    def test_no_candidate(self):
+        from BTrees.IIBTree import IIBTree
+        self.assertRaises(ValueError, self._callFUT, IIBTree, self._items(),
+                          max_records=50, max_leaf_state_size=100)
@@ -0,0 +1,225 @@
+##############################################################################
+#
+# Copyright (c) 2024 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE
+#
+##############################################################################
+"""
+Helpers for choosing BTree node sizes.
+
+The sizes of a BTree's (or TreeSet's) nodes are set by the
+``max_leaf_size`` and ``max_internal_size`` attributes of its class (see
+:ref:`node-sizes`).  The best sizes depend on the workload: large trees
+with sequential keys want big leaves, so that they are stored in fewer
+database records, while trees that are written concurrently want small
+leaves, so that each change rewrites less data and fewer changes
+conflict.
+
+:func:`measure_node_sizes` builds a tree from sample data with each of
+several candidate sizes, and reports how long the inserts and lookups
+took and how the tree would be stored.  :func:`suggest_node_sizes` picks
+the fastest candidate that meets limits on the storage.
+
+.. versionadded:: 6.2
+"""
+import pickle
+import time
+
+
+__all__ = [
+    'NodeSizeMeasurement',
+    'measure_node_sizes',
+    'suggest_node_sizes',
+]
+
+# A stand-in for the persistent reference that replaces a child node in
+# its parent's database record.
+_REFERENCE = b'\0' * 8
+
+
+class NodeSizeMeasurement:
+    """
+    The results of building a tree with one pair of node sizes.
+
+    The record sizes are the lengths of the pickled states of the tree's
+    nodes, with references to other nodes counted as 8 bytes.  They
+    approximate the sizes of the records a database stores.
+    """
+
+    def __init__(self, max_leaf_size, max_internal_size, insert_time,
+                 lookup_time, records, leaves, state_size, leaf_state_size):
+        #: The ``max_leaf_size`` measured.
+        self.max_leaf_size = max_leaf_size
+        #: The ``max_internal_size`` measured.
+        self.max_internal_size = max_internal_size
+        #: The seconds taken to insert the items into an empty tree.
+        self.insert_time = insert_time
+        #: The seconds taken to look up the keys.
+        self.lookup_time = lookup_time
+        #: The number of nodes, each stored as a database record.
+        self.records = records
+        #: How many of the records are leaves (Buckets or Sets).
+        self.leaves = leaves
+        #: The total size of the records, in bytes.
+        self.state_size = state_size
+        #: The average size of a leaf record, in bytes.  Changing a
+        #: key rewrites its leaf.
+        self.leaf_state_size = leaf_state_size
+
+    def __repr__(self):
+        return (
+            '<%s max_leaf_size=%d max_internal_size=%d insert_time=%.6f '
+            'lookup_time=%.6f records=%d state_size=%d>' % (
+                type(self).__name__, self.max_leaf_size,
+                self.max_internal_size, self.insert_time,
+                self.lookup_time, self.records, self.state_size))
+
+
+def _candidate_sizes(default, factors):
+    return sorted({max(2, int(default * factor)) for factor in factors})
+
+
+def _record_size(state):
+    return len(pickle.dumps(state, 3))
+
+
+def _measure_records(tree, tree_type):
+    # Return the number of records, the number of leaves, and the total
+    # size of all records and of the leaf records.
+    records = leaves = state_size = leaf_state_size = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        state = node.__getstate__()
+        records += 1
+        if not isinstance(node, tree_type):
+            # A leaf, whose state may end with the next leaf.
+            node_size = _record_size(state[:1] + (_REFERENCE,) * (
+                len(state) - 1))
+            leaves += 1
+            leaf_state_size += node_size
+        elif state is None or len(state) == 1:
+            # Empty, or holding a single leaf inline.
+            node_size = _record_size(state)
+            leaves += 1
+            leaf_state_size += node_size
+        else:
+            data = state[0]
+            children = data[::2]
+            stack.extend(children)
+            data = tuple(_REFERENCE if i % 2 == 0 else item
+                         for i, item in enumerate(data))
+            node_size = _record_size((data, _REFERENCE) + state[2:])
+        state_size += node_size
+    return records, leaves, state_size, leaf_state_size
+
+
+def measure_node_sizes(tree_type, items, lookups=None, leaf_sizes=None,
+                       internal_sizes=None, repeat=3):
+    """
+    Measure building and searching a tree with each pair of node sizes.
+
+    :param tree_type: A BTree or TreeSet class, such as
+        ``BTrees.OOBTree.BTree``, or a subclass of one.
+    :param items: The sample data, inserted in the order given.  An
+        iterable of ``(key, value)`` pairs for BTrees, or of keys for
+        TreeSets.
+    :param lookups: The keys to look up, by default the inserted keys.
+    :param leaf_sizes: The ``max_leaf_size`` values to try.  By default,
+        from a quarter to eight times the class's.
+    :param internal_sizes: The ``max_internal_size`` values to try.  By
+        default, half, one and two times the class's.
+    :param int repeat: How many times to build the tree and search it;
+        the fastest times are reported.
+    :return: A list of :class:`NodeSizeMeasurement`, one for each pair of
+        sizes.
+    """
+    if leaf_sizes is None:
+        leaf_sizes = _candidate_sizes(tree_type.max_leaf_size,
+                                      (0.25, 0.5, 1, 2, 4, 8))
+    if internal_sizes is None:
+        internal_sizes = _candidate_sizes(tree_type.max_internal_size,
+                                          (0.5, 1, 2))
+    for size in list(leaf_sizes) + list(internal_sizes):
+        if size < 2:
+            raise ValueError("node sizes must be at least 2")
+    items = list(items)
+    is_mapping = hasattr(tree_type, 'items')
+    if lookups is None:
+        lookups = [item[0] for item in items] if is_mapping else items
+    lookups = list(lookups)
+
+    measurements = []
+    for internal_size in internal_sizes:
+        for leaf_size in leaf_sizes:
+            sized_type = type(tree_type.__name__, (tree_type,), {
+                'max_leaf_size': leaf_size,
+                'max_internal_size': internal_size,
+            })
+            insert_time = lookup_time = None
+            for _ in range(repeat):
+                tree = sized_type()
+                start = time.perf_counter()
+                if is_mapping:
+                    for key, value in items:
+                        tree[key] = value
+                else:
+                    for key in items:
+                        tree.add(key)
+                elapsed = time.perf_counter() - start
+                if insert_time is None or elapsed < insert_time:
+                    insert_time = elapsed
+
+                contains = tree.__contains__
+                start = time.perf_counter()
+                for key in lookups:
+                    contains(key)
+                elapsed = time.perf_counter() - start
+                if lookup_time is None or elapsed < lookup_time:
+                    lookup_time = elapsed
+
+            records, leaves, state_size, leaf_state_size = (
+                _measure_records(tree, sized_type))
+            measurements.append(NodeSizeMeasurement(
+                leaf_size, internal_size, insert_time, lookup_time,
+                records, leaves, state_size, leaf_state_size / leaves))
+    return measurements
+
+
+def suggest_node_sizes(tree_type, items, lookups=None, max_records=None,
+                       max_leaf_state_size=None, **kwargs):
+    """
+    Suggest node sizes for a tree holding data like *items*.
+
+    Each candidate is measured with :func:`measure_node_sizes`, which
+    accepts the same *tree_type*, *items*, *lookups* and *kwargs*.  Of
+    the candidates whose trees meet the limits, the one whose inserts and
+    lookups took the least total time is returned.
+
+    :param int max_records: If given, the most records the tree may be
+        stored in.  Set this for large trees to keep down the number of
+        database objects.
+    :param int max_leaf_state_size: If given, the largest average size
+        of a leaf record, in bytes.  Set this for trees that are written
+        often, to bound how much each change rewrites and how likely
+        concurrent changes are to conflict.
+    :return: The :class:`NodeSizeMeasurement` of the suggested sizes.
+    :raises ValueError: If no candidate meets the limits.
+    """
+    measurements = measure_node_sizes(tree_type, items, lookups, **kwargs)
+    acceptable = [
+        m for m in measurements
+        if (max_records is None or m.records <= max_records)
+        and (max_leaf_state_size is None
+             or m.leaf_state_size <= max_leaf_state_size)
+    ]
+    if not acceptable:
+        raise ValueError("no node sizes meet the limits")
+    return min(acceptable, key=lambda m: m.insert_time + m.lookup_time)